@@ -1,8 +1,8 @@
 import sys
 from setuptools import setup, find_packages
 
-if sys.version_info < (3, 0):
-    sys.exit('Sorry, Python < 3.0 is not supported')
+if sys.version_info < (3, 7):
+    sys.exit('Sorry, Python < 3.7 is not supported')
 
 REQUIRED_PACKAGES = ['numpy', 'pywavelets', 'numba', 'tqdm']
 
@@ -19,6 +19,7 @@ setup(name='sigpy',
       author_email='frankong@berkeley.edu',
       license='BSD',
       packages=find_packages(),
+      python_requires='>=3.7',
       install_requires=REQUIRED_PACKAGES,
       scripts=['bin/sigpy_plot'],
       classifiers=(
@@ -1,4 +1,4 @@
-from sigpy import alg, app, dataset, comm, config, conv, fft, index, interp, linop, prox, nufft, thresh, util
+import importlib
 
 __all__ = [
     'alg',
@@ -8,9 +8,29 @@ __all__ = [
     'fft',
     'index',
     'interp',
+    'jit',
     'linop',
+    'profiler',
     'prox',
     'nufft',
     'thresh',
     'util',
 ]
+
+_submodules = __all__ + ['conv', 'dataset', 'learn', 'mri', 'plot', 'wavelet']
+
+
+def __getattr__(name):
+    # Submodules are imported on first access to reduce startup time.
+    if name in _submodules:
+        return importlib.import_module('sigpy.' + name)
+
+    if name == 'warmup':
+        return importlib.import_module('sigpy.jit').warmup
+
+    raise AttributeError(
+        "module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_submodules) | {'warmup'})
@@ -2,7 +2,7 @@
 """Algorithms.
 """
 import numpy as np
-from sigpy import util, config
+from sigpy import util, config, profiler
 
 if config.cupy_enabled:
     import cupy as cp
@@ -39,7 +39,9 @@ class Alg(object):
 
     def update(self):
         with self.device:
-            self._update()
+            with profiler.record(self, 'update'):
+                self._update()
+
             self.iter += 1
 
     def done(self):
@@ -3,7 +3,6 @@
 """
 import numpy as np
 
-from tqdm import tqdm
 from sigpy import linop, prox, util, config
 from sigpy.alg import PowerMethod, GradientMethod, \
     ConjugateGradient, PrimalDualHybridGradient
@@ -50,6 +49,7 @@ class App(object):
         self._init()
         self.alg.init()
         if self.show_pbar:
+            from tqdm import tqdm
             self.pbar = tqdm(total=self.alg.max_iter,
                              desc=self.__class__.__name__)
 
@@ -76,6 +76,9 @@ class MaxEig(App):
         A (Linop): Hermitian linear operator.
         dtype (Dtype): Data type.
         device (Device): Device.
+        comm (None or Communicator): If specified, the initial vector
+            of rank 0 is used on all ranks, so that A must give
+            the same output on all ranks for the same input.
 
     Attributes:
         x (int): Eigenvector with largest eigenvalue.
@@ -85,13 +88,21 @@ class MaxEig(App):
 
     """
     def __init__(self, A, dtype=np.complex, device=util.cpu_device,
-                 max_iter=30, show_pbar=True):
+                 max_iter=30, comm=None, show_pbar=True):
         self.x = util.empty(A.ishape, dtype=dtype, device=device)
+        self.comm = comm
         alg = PowerMethod(A, self.x, max_iter=max_iter)
         super().__init__(alg, show_pbar=show_pbar)
 
     def _init(self):
         util.move_to(self.x, util.randn_like(self.x))
+        if self.comm is not None:
+            # Broadcast from rank 0 by summing with zeros from other ranks.
+            if self.comm.rank != 0:
+                with util.get_device(self.x):
+                    self.x.fill(0)
+
+            self.comm.allreduce(self.x)
 
     def _summarize(self):
         if self.show_pbar:
@@ -144,6 +155,11 @@ class LinearLeastSquares(App):
         tau (float): Primal step-size for `PrimalDualHybridGradient`.
         sigma (float): Dual step-size for `PrimalDualHybridGradient`.
         save_objective_values (bool): Toggle saving objective value.
+        comm (None or Communicator): If specified, A, y and weights are
+            this rank's part of the data consistency term, and the term is
+            summed over all ranks. AllReduceAdjoint is composed with A, so
+            A.H sums over ranks, and every rank holds the same x.
+            All other arguments must be the same on all ranks.
 
     """
     def __init__(self, A, y, x, proxg=None,
@@ -151,7 +167,11 @@ class LinearLeastSquares(App):
                  alg_name=None, max_iter=100,
                  P=None, alpha=None, max_power_iter=10, accelerate=True,
                  tau=None, sigma=None,
-                 save_objective_values=False, show_pbar=True):
+                 save_objective_values=False, comm=None, show_pbar=True):
+        if comm is not None:
+            A = A * linop.AllReduceAdjoint(A.ishape, comm)
+            show_pbar = show_pbar and comm.rank == 0
+
         self.A = A
         self.y = y
         self.x = x
@@ -172,11 +192,15 @@ class LinearLeastSquares(App):
         self.tau = tau
         self.sigma = sigma
         self.save_objective_values = save_objective_values
+        self.comm = comm
         self.show_pbar = show_pbar
         
         self._get_alg()
 
     def _init(self):
+        # Arrays held by A may have been modified in place since the last run,
+        # as in alternating minimization.
+        self.A.refresh()
         if isinstance(self.alg, ConjugateGradient):
             if self.weights is not None:
                 with util.get_device(self.y):
@@ -278,16 +302,23 @@ class LinearLeastSquares(App):
                     r *= self.weights
                 
             with util.get_device(self.x):
-                gradf_x = self.A.H(r)
+                # Reductions in A.H overlap with the regularization terms.
+                gradf_x, request = self.A.H.apply_async(r)
+                if self.lamda != 0 and self.R is not None:
+                    RHRx = self.R.H(self.R(x))
+
+                if self.mu != 0:
+                    x_z = x - self.z
 
+                request.wait()
                 if self.lamda != 0:
                     if self.R is None:
                         util.axpy(gradf_x, self.lamda, x)
                     else:
-                        util.axpy(gradf_x, self.lamda, self.R.H(self.R(x)))
+                        util.axpy(gradf_x, self.lamda, RHRx)
 
                 if self.mu != 0:
-                    util.axpy(gradf_x, self.mu, x - self.z)
+                    util.axpy(gradf_x, self.mu, x_z)
 
                 return gradf_x
 
@@ -375,7 +406,7 @@ class LinearLeastSquares(App):
         device = util.get_device(self.x)
         max_eig_app = MaxEig(AHA, dtype=self.x.dtype,
                              device=device, max_iter=self.max_power_iter,
-                             show_pbar=self.show_pbar)
+                             comm=self.comm, show_pbar=self.show_pbar)
 
         with device:
             self.alg.alpha = 1 / max_eig_app.run()
@@ -399,7 +430,7 @@ class LinearLeastSquares(App):
         device = util.get_device(self.x)
         max_eig_app = MaxEig(AHA, dtype=self.x.dtype,
                              device=device, max_iter=self.max_power_iter,
-                             show_pbar=self.show_pbar)
+                             comm=self.comm, show_pbar=self.show_pbar)
 
         with device:
             self.alg.tau = 1 / (max_eig_app.run() + self.lamda + self.mu)
@@ -417,13 +448,21 @@ class LinearLeastSquares(App):
         if self.G is not None:
             A = linop.Vstack([A, self.G])
             
-        T = linop.Multiply(A.ishape, self.alg.tau)
-        AAH = A * T * A.H
+        if self.comm is None:
+            T = linop.Multiply(A.ishape, self.alg.tau)
+            AAH = A * T * A.H
+        else:
+            # A T A^H is split across ranks,
+            # but has the same largest eigenvalue as T^(1/2) A^H A T^(1/2).
+            with util.get_device(self.x):
+                T_half = linop.Multiply(A.ishape, self.alg.tau**0.5)
+
+            AAH = T_half * A.H * A * T_half
 
         device = util.get_device(self.x)
         max_eig_app = MaxEig(AAH, dtype=self.x.dtype,
                              device=device, max_iter=self.max_power_iter,
-                             show_pbar=self.show_pbar)
+                             comm=self.comm, show_pbar=self.show_pbar)
 
         with device:
             self.alg.sigma = 1 / max_eig_app.run()
@@ -437,6 +476,11 @@ class LinearLeastSquares(App):
                 r *= self.weights**0.5
 
             obj = 1 / 2 * util.norm2(r)
+            if self.comm is not None:
+                obj = xp.array([obj])
+                self.comm.allreduce(obj)
+                obj = obj[0]
+
             if self.lamda > 0:
                 if self.R is None:
                     obj += self.lamda / 2 * util.norm2(self.x)
@@ -4,28 +4,58 @@
 This module contains communicators to transfer arrays between devices.
 
 """
+import mmap
+import multiprocessing
+import os
+import tempfile
 import numpy as np
+from concurrent import futures
 from sigpy import config, util
 if config.cupy_enabled:
     import cupy as cp
-    
-if config.mpi4py_enabled:
-    from mpi4py import MPI
 
-    if config.nccl_enabled:
-        from cupy.cuda import nccl
-    
+
+class Request(object):
+    """Handle of a non-blocking reduction.
+
+    Args:
+        wait (None or function): Function that blocks until the reduction
+            is done. If None, the reduction is already done.
+
+    """
+
+    def __init__(self, wait=None):
+        self._wait = wait
+
+    @property
+    def done(self):
+        return self._wait is None
+
+    def wait(self):
+        """Blocks until the reduction is done. Can be called more than once."""
+        if self._wait is not None:
+            wait = self._wait
+            self._wait = None
+            wait()
+
 
 class Communicator(object):
     """General communicator for distributed computing using MPI.
 
-    All arrays are moved to CPU, then communicated through MPI, and moved back
-    to original device.
+    CPU arrays are reduced in place. GPU arrays are moved to CPU in chunks
+    and reduced with non-blocking MPI calls, so copying one chunk overlaps
+    with reducing the previous one.
+
+    Args:
+        chunk_size (int): Chunk size in bytes for GPU arrays.
 
     """
 
-    def __init__(self):
+    def __init__(self, chunk_size=2**24):
+        self.chunk_size = chunk_size
         if config.mpi4py_enabled:
+            # Imported here, as importing MPI initializes it.
+            from mpi4py import MPI
             self.mpi_comm = MPI.COMM_WORLD
             self.size = self.mpi_comm.Get_size()
             self.rank = self.mpi_comm.Get_rank()
@@ -34,35 +64,258 @@ class Communicator(object):
             self.rank = 0
 
     def allreduce(self, input):
+        self.iallreduce(input).wait()
+
+    def iallreduce(self, input):
+        """Starts summing input in place across ranks.
+
+        Input must not be used until the returned request is waited on.
+
+        Args:
+            input (array): Input array.
+
+        Returns:
+            Request: Request to wait on.
+
+        """
+        if self.size == 1 or not config.mpi4py_enabled:
+            return Request()
+
+        if util.get_device(input) == util.cpu_device:
+            return self._iallreduce_cpu(input)
+        else:
+            return self._iallreduce_gpu(input)
+
+    def _iallreduce_cpu(self, input):
+        from mpi4py import MPI
+        if input.flags.c_contiguous:
+            mpi_buffer = input
+        else:
+            mpi_buffer = np.ascontiguousarray(input)
+
+        mpi_request = self.mpi_comm.Iallreduce(MPI.IN_PLACE, mpi_buffer)
+
+        def wait():
+            mpi_request.Wait()
+            if mpi_buffer is not input:
+                input[...] = mpi_buffer
+
+        return Request(wait)
+
+    def _iallreduce_gpu(self, input):
+        from mpi4py import MPI
+        device = util.get_device(input)
+        with device:
+            buffer = cp.ascontiguousarray(input)
+            buffer_flat = buffer.reshape(-1)
+            chunk_size = max(self.chunk_size // buffer.itemsize, 1)
+            chunks = []
+            for start in range(0, buffer.size, chunk_size):
+                end = min(start + chunk_size, buffer.size)
+                mpi_buffer = buffer_flat[start:end].get()
+                mpi_request = self.mpi_comm.Iallreduce(MPI.IN_PLACE, mpi_buffer)
+                chunks.append((start, end, mpi_buffer, mpi_request))
+
+        def wait():
+            with device:
+                for start, end, mpi_buffer, mpi_request in chunks:
+                    mpi_request.Wait()
+                    buffer_flat[start:end].set(mpi_buffer)
+
+                if buffer is not input:
+                    input[...] = buffer
+
+        return Request(wait)
+
+
+def _check_buffer_size(buffer_size):
+    itemsize = np.dtype(np.complex128).itemsize
+    if buffer_size < itemsize:
+        raise ValueError('buffer_size must be at least {}, got {}.'.format(
+            itemsize, buffer_size))
+
+
+class SharedMemoryCommunicator(object):
+    """Communicator for processes on a single host using shared memory.
+
+    Does not require MPI. Each process copies its array into its own slot
+    of a shared memory file, which lives in /dev/shm when available.
+    A reduce-scatter follows, where each rank sums one segment over all
+    slots, and then an allgather, where each rank copies the reduced
+    segments. Arrays larger than the slots are reduced in chunks.
+    Two sets of slots are used alternately, so each chunk takes two
+    barriers.
+
+    Communicators should be created in the parent process with
+    :func:`SharedMemoryCommunicator.create` and passed to child processes.
+
+    Args:
+        size (int): Number of processes.
+        rank (int): Rank of the process.
+        path (str): Shared memory file path.
+        barrier (multiprocessing.Barrier): Barrier for size processes.
+        buffer_size (int): Slot size in bytes. Must be at least
+            the item size of complex128.
+
+    Examples:
+        >>> def worker(comm):
+        ...     x = np.ones(10)
+        ...     comm.allreduce(x)
+        >>> comms = SharedMemoryCommunicator.create(4)
+        >>> procs = [multiprocessing.Process(target=worker, args=(comm, ))
+        ...          for comm in comms]
+
+    """
+
+    def __init__(self, size, rank, path, barrier, buffer_size=2**22):
+        _check_buffer_size(buffer_size)
+        self.size = size
+        self.rank = rank
+        self.path = path
+        self.barrier = barrier
+        self.buffer_size = buffer_size
+        self._mmap = None
+        self._slots = {}
+        self._parity = 0
+        self._executor = None
+
+    @classmethod
+    def create(cls, size, buffer_size=2**22, context=multiprocessing):
+        """Creates communicators for all ranks.
+
+        Args:
+            size (int): Number of processes.
+            buffer_size (int): Slot size in bytes.
+            context (multiprocessing context): Context used to start processes.
+
+        Returns:
+            list of SharedMemoryCommunicator: Communicators for each rank.
+
+        """
+        _check_buffer_size(buffer_size)
+        dirpath = '/dev/shm' if os.path.isdir('/dev/shm') else None
+        fd, path = tempfile.mkstemp(prefix='sigpy_comm_', dir=dirpath)
+        os.ftruncate(fd, 2 * size * buffer_size)
+        os.close(fd)
+
+        barrier = context.Barrier(size)
+        return [cls(size, rank, path, barrier, buffer_size=buffer_size)
+                for rank in range(size)]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_mmap'] = None
+        state['_slots'] = {}
+        state['_executor'] = None
+        return state
+
+    def _get_slots(self, dtype):
+        if self._mmap is None:
+            with open(self.path, 'r+b') as f:
+                self._mmap = mmap.mmap(f.fileno(), 2 * self.size * self.buffer_size)
+
+        if dtype not in self._slots:
+            n = self.buffer_size // dtype.itemsize
+            self._slots[dtype] = np.frombuffer(
+                self._mmap, dtype, 2 * self.size * n).reshape([2, self.size, n])
+
+        return self._slots[dtype]
+
+    def _allreduce_chunk(self, input):
+        slots = self._get_slots(input.dtype)[self._parity]
+        self._parity = 1 - self._parity
+        size = input.size
+        bounds = [size * r // self.size for r in range(self.size + 1)]
+
+        slots[self.rank, :size] = input
+        self.barrier.wait()
+
+        start, end = bounds[self.rank], bounds[self.rank + 1]
+        slots[self.rank, start:end] = np.sum(slots[:, start:end], axis=0)
+        self.barrier.wait()
+
+        for r in range(self.size):
+            start, end = bounds[r], bounds[r + 1]
+            input[start:end] = slots[r, start:end]
+
+    def allreduce(self, input):
+        self.iallreduce(input).wait()
+
+    def iallreduce(self, input):
+        """Starts summing input in place across ranks on a background thread.
+
+        Input must not be used until the returned request is waited on.
+
+        Args:
+            input (array): Input array.
+
+        Returns:
+            Request: Request to wait on.
+
+        """
         if self.size == 1:
-            return
+            return Request()
 
-        if config.mpi4py_enabled:
-            mpi_buffer = util.move(input)
-            self.mpi_comm.Allreduce(MPI.IN_PLACE, mpi_buffer)
-            util.move_to(input, mpi_buffer)
+        # A single thread keeps reductions in the same order on all ranks.
+        if self._executor is None:
+            self._executor = futures.ThreadPoolExecutor(1)
+
+        future = self._executor.submit(self._allreduce, input)
+        return Request(future.result)
+
+    def _allreduce(self, input):
+        if util.get_device(input) == util.cpu_device and input.flags.c_contiguous:
+            buffer = input
+        else:
+            buffer = np.ascontiguousarray(util.move(input))
+
+        buffer_flat = buffer.reshape(-1)
+        chunk_size = self.buffer_size // buffer.itemsize
+        if chunk_size == 0:
+            raise ValueError('buffer_size must be at least the item size {}, '
+                             'got {}.'.format(buffer.itemsize, self.buffer_size))
+        for start in range(0, buffer.size, chunk_size):
+            self._allreduce_chunk(buffer_flat[start:start + chunk_size])
+
+        if buffer is not input:
+            util.move_to(input, buffer)
+
+    def close(self):
+        """Unmaps the shared memory file."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
 
+        self._slots = {}
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
 
-class MultiGpuCommunicator(object):
+    def unlink(self):
+        """Removes the shared memory file.
+
+        Should be called once, after all processes are done.
+
+        """
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class MultiGpuCommunicator(Communicator):
     """Communicator for distributed computing between multiple GPU.
 
-    If nccl is installed with cupy, then nccl will be used. Otherwise,
-    reduces to Communicator.
+    If nccl is installed with cupy, then nccl will be used, on a separate
+    stream for non-blocking reductions. Otherwise, reduces to Communicator.
 
     """
 
-    def __init__(self):
-        if config.mpi4py_enabled:
-            self.mpi_comm = MPI.COMM_WORLD
-            self.size = self.mpi_comm.Get_size()
-            self.rank = self.mpi_comm.Get_rank()
-        else:
-            self.size = 1
-            self.rank = 0
-            
+    def __init__(self, chunk_size=2**24):
+        super().__init__(chunk_size=chunk_size)
         self.device = util.Device(self.rank % cp.cuda.runtime.getDeviceCount())
 
         if config.nccl_enabled:
+            from cupy.cuda import nccl
             if self.rank == 0:
                 nccl_comm_id = nccl.get_unique_id()
             else:
@@ -73,33 +326,45 @@ class MultiGpuCommunicator(object):
             with self.device:
                 self.nccl_comm = nccl.NcclCommunicator(
                     self.size, nccl_comm_id, self.rank)
+                self.stream = cp.cuda.Stream(non_blocking=True)
 
-    def allreduce(self, input):
+    def iallreduce(self, input):
         if self.device != util.get_device(input):
             raise ValueError('Input device is different from communicator device.')
 
         if self.size == 1:
-            return
+            return Request()
 
-        if config.nccl_enabled:
-            if input.dtype == np.float32:
-                nccl_dtype = nccl.NCCL_FLOAT32
-                nccl_size = input.size
-            elif input.dtype == np.float64:
-                nccl_dtype = nccl.NCCL_FLOAT64
-                nccl_size = input.size
-            elif input.dtype == np.complex64:
-                nccl_dtype = nccl.NCCL_FLOAT32
-                nccl_size = input.size * 2
-            elif input.dtype == np.complex128:
-                nccl_dtype = nccl.NCCL_FLOAT64
-                nccl_size = input.size * 2
-            else:
-                raise ValueError('dtype not supported, got {dtype}.'.format(dtype=input.dtype))
+        if not config.nccl_enabled:
+            return super().iallreduce(input)
 
-            with self.device:
-                self.nccl_comm.allReduce(
-                    input.data.ptr, input.data.ptr, nccl_size, nccl_dtype,
-                    nccl.NCCL_SUM, cp.cuda.Stream.null.ptr)
+        from cupy.cuda import nccl
+
+        if input.dtype == np.float32:
+            nccl_dtype = nccl.NCCL_FLOAT32
+            nccl_size = input.size
+        elif input.dtype == np.float64:
+            nccl_dtype = nccl.NCCL_FLOAT64
+            nccl_size = input.size
+        elif input.dtype == np.complex64:
+            nccl_dtype = nccl.NCCL_FLOAT32
+            nccl_size = input.size * 2
+        elif input.dtype == np.complex128:
+            nccl_dtype = nccl.NCCL_FLOAT64
+            nccl_size = input.size * 2
         else:
-            super().allreduce(input)
+            raise ValueError('dtype not supported, got {dtype}.'.format(dtype=input.dtype))
+
+        with self.device:
+            current_stream = cp.cuda.get_current_stream()
+            self.stream.wait_event(current_stream.record())
+            self.nccl_comm.allReduce(
+                input.data.ptr, input.data.ptr, nccl_size, nccl_dtype,
+                nccl.NCCL_SUM, self.stream.ptr)
+            event = self.stream.record()
+
+        def wait():
+            with self.device:
+                cp.cuda.get_current_stream().wait_event(event)
+
+        return Request(wait)
@@ -0,0 +1,62 @@
+import multiprocessing
+import unittest
+import numpy as np
+import numpy.testing as npt
+from sigpy import comm, linop
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+def _allreduce_worker(c, shape, queue):
+    x = np.full(shape, c.rank + 1j, dtype=np.complex64)
+    c.allreduce(x)
+
+    y = np.full(shape, c.rank, dtype=np.float64)[..., ::2]
+    A = linop.AllReduce(y.shape, c)
+    y = A(y)
+
+    z = np.full(shape, c.rank, dtype=np.float64)
+    request = c.iallreduce(z)
+    request.wait()
+
+    I = linop.Identity(shape)
+    A = linop.AllReduce(shape, c) * (2 * I)
+    B = A + 3 * I
+    w = B(np.full(shape, c.rank + 1, dtype=np.float64))
+    w_async, request = A.apply_async(np.ones(shape))
+    request.wait()
+    queue.put((c.rank, x, y, z, w, w_async))
+    c.close()
+
+
+class TestComm(unittest.TestCase):
+
+    def test_SharedMemoryCommunicator(self):
+        size = 3
+        shape = [5, 6]
+        for buffer_size in [16, 2**10]:
+            comms = comm.SharedMemoryCommunicator.create(size, buffer_size=buffer_size)
+            queue = multiprocessing.Queue()
+            procs = [multiprocessing.Process(target=_allreduce_worker,
+                                             args=(c, shape, queue)) for c in comms]
+            try:
+                for p in procs:
+                    p.start()
+
+                results = [queue.get(timeout=60) for _ in range(size)]
+                for p in procs:
+                    p.join()
+            finally:
+                comms[0].unlink()
+
+            for rank, x, y, z, w, w_async in results:
+                npt.assert_allclose(x, np.full(shape, 3 + 3j))
+                npt.assert_allclose(y, np.full([5, 3], 3))
+                npt.assert_allclose(z, np.full(shape, 3))
+                npt.assert_allclose(w, np.full(shape, 12 + 3 * (rank + 1)))
+                npt.assert_allclose(w_async, np.full(shape, 6))
+
+    def test_SharedMemoryCommunicator_buffer_size(self):
+        with self.assertRaises(ValueError):
+            comm.SharedMemoryCommunicator.create(2, buffer_size=8)
@@ -3,33 +3,61 @@
 
 This module contains flags to turn on and off optional modules.
 
+Flags are evaluated on first access, so that optional modules
+are only imported when needed.
+
 """
-try:
-    import cupy
-    cupy_enabled = True
-except ImportError:
-    cupy_enabled = False
-    cudnn_enabled = False
-    nccl_enabled = False
-
-if cupy_enabled:
+_flags = ['cupy_enabled', 'cudnn_enabled', 'nccl_enabled', 'mpi4py_enabled']
+
+
+def _cupy_enabled():
+    try:
+        import cupy
+        return True
+    except ImportError:
+        return False
+
+
+def _cudnn_enabled():
+    if not _cupy_enabled():
+        return False
+
     try:
         from cupy import cudnn
         from cupy.cuda import cudnn
-        cudnn_enabled = True
+        return True
     except ImportError:
-        cudnn_enabled = False
+        return False
+
+
+def _nccl_enabled():
+    if not _cupy_enabled():
+        return False
 
     try:
-        from cupy import cudnn
         from cupy.cuda import nccl
-        nccl_enabled = True
+        return True
     except ImportError:
-        nccl_enabled = False
+        return False
+
+
+def _mpi4py_enabled():
+    try:
+        import mpi4py
+        return True
+    except ImportError:
+        return False
+
+
+def __getattr__(name):
+    if name not in _flags:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name))
+
+    value = globals()['_' + name]()
+    globals()[name] = value
+    return value
 
 
-try:
-    import mpi4py
-    mpi4py_enabled = True
-except ImportError:
-    mpi4py_enabled = False
+def __dir__():
+    return sorted(set(globals()) | set(_flags))
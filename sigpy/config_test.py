@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from sigpy import config
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(code):
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=_root)
+    return output.decode().split()
+
+
+class TestConfig(unittest.TestCase):
+
+    def test_flags(self):
+        for name in ['cupy_enabled', 'cudnn_enabled',
+                     'nccl_enabled', 'mpi4py_enabled']:
+            self.assertIsInstance(getattr(config, name), bool)
+
+        if not config.cupy_enabled:
+            self.assertFalse(config.cudnn_enabled)
+            self.assertFalse(config.nccl_enabled)
+
+    def test_import_is_lazy(self):
+        heavy = ['cupy', 'matplotlib', 'mpi4py', 'numba',
+                 'pywt', 'scipy', 'tqdm']
+        loaded = _run('import sys, sigpy, sigpy.mri, sigpy.learn, sigpy.plot; '
+                      'print(*[m for m in {} if m in sys.modules])'.format(heavy))
+
+        self.assertEqual(loaded, [])
+
+    @unittest.skipUnless(os.environ.get('SIGPY_BENCHMARK'),
+                         'set SIGPY_BENCHMARK=1 to run benchmarks')
+    def test_import_time(self):
+        # Startup regression benchmark: best of several runs,
+        # relative to importing numpy alone.
+        code = ('import time; start = time.perf_counter(); import {}; '
+                'print(time.perf_counter() - start)')
+        numpy_time = min(float(_run(code.format('numpy'))[0]) for _ in range(3))
+        sigpy_time = min(float(_run(code.format('sigpy'))[0]) for _ in range(3))
+
+        self.assertLess(sigpy_time - numpy_time, 0.05)
@@ -5,13 +5,15 @@ This module contains convolution functions that support multi-dimension, and mul
 
 """
 import numpy as np
+import numba as nb
 from sigpy import fft, util, config
 
 if config.cudnn_enabled:
     from cupy import cudnn
 
 
-def convolve(x, W, input_multi_channel=False, output_multi_channel=False, mode='full'):
+def convolve(x, W, input_multi_channel=False, output_multi_channel=False, mode='full',
+             x_cache=None, W_cache=None):
     """Convolution that supports multi-dimensional and multi-channel inputs.
 
     Args:
@@ -24,6 +26,12 @@ def convolve(x, W, input_multi_channel=False, output_multi_channel=False, mode='
         input_multi_channel (bool): Specify whether input has multiple channels.
         output_multi_channel (bool): Specify whether output has multiple channels.
         mode (str): {'full', 'valid'}.
+        x_cache (None or dict): Cache of Fourier spectra of x.
+            Only use when x is fixed across calls,
+            and clear it after modifying x.
+        W_cache (None or dict): Cache of Fourier spectra of W.
+            Only use when W is fixed across calls,
+            and clear it after modifying W.
 
     Returns:
         array: output array with shape batch_shape + output_shape, 
@@ -46,7 +54,16 @@ def convolve(x, W, input_multi_channel=False, output_multi_channel=False, mode='
     if device != util.cpu_device and config.cudnn_enabled:
         y = _cudnn_convolve(x, W, mode=mode)
     else:
-        y = _fft_convolve(x, W, mode=mode)
+        engine = _get_convolve_engine(device, input_shape, filter_shape, batch_size,
+                                      input_channel, output_channel, mode,
+                                      input_cached=x_cache is not None,
+                                      filter_cached=W_cache is not None)
+        if engine == 'direct':
+            y = _direct_convolve(x, W, mode=mode)
+        elif engine == 'ola':
+            y = _ola_convolve(x, W, mode=mode, x_cache=x_cache, W_cache=W_cache)
+        else:
+            y = _fft_convolve(x, W, mode=mode, x_cache=x_cache, W_cache=W_cache)
 
     output_shape = y.shape[-ndim:]
     with device:
@@ -57,7 +74,7 @@ def convolve(x, W, input_multi_channel=False, output_multi_channel=False, mode='
 
 
 def convolve_adjoint_input(W, y, input_multi_channel=False,
-                          output_multi_channel=False, mode='full'):
+                           output_multi_channel=False, mode='full', W_cache=None):
     """Convolution adjoint.
 
     Args:
@@ -70,6 +87,9 @@ def convolve_adjoint_input(W, y, input_multi_channel=False,
         input_multi_channel (bool): Specify whether input has multiple channels.
         output_multi_channel (bool): Specify whether output has multiple channels.
         mode (str): {'full', 'valid'}.
+        W_cache (None or dict): Cache of Fourier spectra of W.
+            Only use when W is fixed across calls,
+            and clear it after modifying W.
 
     Returns:
         array: output array with shape batch_shape + output_shape, 
@@ -92,7 +112,20 @@ def convolve_adjoint_input(W, y, input_multi_channel=False,
     if device != util.cpu_device and config.cudnn_enabled:
         x = _cudnn_convolve_adjoint_input(W, y, mode=mode)
     else:
-        x = _fft_convolve_adjoint_input(W, y, mode=mode)
+        if mode == 'full':
+            input_shape = tuple(p - n + 1 for p, n in zip(output_shape, filter_shape))
+        elif mode == 'valid':
+            input_shape = tuple(p + n - 1 for p, n in zip(output_shape, filter_shape))
+
+        engine = _get_convolve_engine(device, input_shape, filter_shape, batch_size,
+                                      input_channel, output_channel, mode,
+                                      filter_cached=W_cache is not None)
+        if engine == 'direct':
+            x = _direct_convolve_adjoint_input(W, y, mode=mode)
+        elif engine == 'ola':
+            x = _ola_convolve_adjoint_input(W, y, mode=mode, W_cache=W_cache)
+        else:
+            x = _fft_convolve_adjoint_input(W, y, mode=mode, W_cache=W_cache)
 
     input_shape = x.shape[-ndim:]
     with device:
@@ -103,7 +136,7 @@ def convolve_adjoint_input(W, y, input_multi_channel=False,
 
 
 def convolve_adjoint_filter(x, y, ndim, input_multi_channel=False,
-                            output_multi_channel=False, mode='full'):
+                            output_multi_channel=False, mode='full', x_cache=None):
     """Convolution adjoint.
 
     Args:
@@ -117,6 +150,9 @@ def convolve_adjoint_filter(x, y, ndim, input_multi_channel=False,
         input_multi_channel (bool): Specify whether input has multiple channels.
         output_multi_channel (bool): Specify whether output has multiple channels.
         mode (str): {'full', 'valid'}.
+        x_cache (None or dict): Cache of Fourier spectra of x.
+            Only use when x is fixed across calls,
+            and clear it after modifying x.
 
     Returns:
         array: filter array of shape filter_shape, 
@@ -136,7 +172,20 @@ def convolve_adjoint_filter(x, y, ndim, input_multi_channel=False,
     if device != util.cpu_device and config.cudnn_enabled:
         W = _cudnn_convolve_adjoint_filter(x, y, mode=mode)
     else:
-        W = _fft_convolve_adjoint_filter(x, y, mode=mode)
+        if mode == 'full':
+            filter_shape = tuple(p - m + 1 for m, p in zip(input_shape, output_shape))
+        elif mode == 'valid':
+            filter_shape = tuple(m - p + 1 for m, p in zip(input_shape, output_shape))
+
+        engine = _get_convolve_engine(device, input_shape, filter_shape, batch_size,
+                                      input_channel, output_channel, mode,
+                                      input_cached=x_cache is not None)
+        if engine == 'direct':
+            W = _direct_convolve_adjoint_filter(x, y, mode=mode)
+        elif engine == 'ola':
+            W = _ola_convolve_adjoint_filter(x, y, mode=mode, x_cache=x_cache)
+        else:
+            W = _fft_convolve_adjoint_filter(x, y, mode=mode, x_cache=x_cache)
 
     with device:
         W_shape = W.shape[-ndim:]
@@ -212,7 +261,465 @@ def _get_convolve_adjoint_filter_params(x, y, ndim,
         batch_size, input_channel, output_channel
 
 
-def _fft_convolve(x, W, mode='full'):
+def _get_convolve_engine(device, input_shape, filter_shape, batch_size,
+                         input_channel, output_channel, mode,
+                         input_cached=False, filter_cached=False):
+    """Choose between direct, overlap-add and FFT convolution.
+
+    Uses a rough operation count for each engine. Direct convolution is only
+    available on CPU for up to three dimensions. Transforms of cached input
+    or filter spectra are not counted.
+
+    """
+    ndim = len(input_shape)
+    if mode == 'full':
+        output_shape = tuple(m + n - 1 for m, n in zip(input_shape, filter_shape))
+        pad_shape = output_shape
+    elif mode == 'valid':
+        output_shape = tuple(m - n + 1 for m, n in zip(input_shape, filter_shape))
+        pad_shape = input_shape
+
+    channel_size = batch_size * output_channel * input_channel
+    num_input_ffts = 0 if input_cached else batch_size * input_channel
+    num_filter_ffts = 0 if filter_cached else output_channel * input_channel
+    num_ffts = num_input_ffts + batch_size * output_channel + num_filter_ffts
+
+    costs = {'fft': num_ffts * _fft_cost(pad_shape) +
+             channel_size * util.prod(pad_shape)}
+
+    block_shape = _get_ola_block_shape(input_shape, filter_shape)
+    if tuple(block_shape) != tuple(input_shape):
+        num_blocks = util.prod([(m + b - 1) // b
+                                for m, b in zip(input_shape, block_shape)])
+        fft_shape = [b + n - 1 for b, n in zip(block_shape, filter_shape)]
+        costs['ola'] = num_blocks * (
+            (num_ffts - num_filter_ffts) * _fft_cost(fft_shape) +
+            channel_size * util.prod(fft_shape)) + \
+            num_filter_ffts * _fft_cost(fft_shape)
+
+    if device == util.cpu_device and ndim <= 3:
+        costs['direct'] = 1.5 * channel_size * util.prod(output_shape) * \
+            util.prod(filter_shape)
+
+    return min(costs, key=costs.get)
+
+
+def _fft_cost(shape):
+    """Approximate FFT cost, penalizing lengths with large prime factors."""
+    cost = 0
+    for n in shape:
+        cost += np.log2(max(n, 2))
+        p = _max_prime_factor(n)
+        if p > 7:
+            cost += p
+
+    return 5 * util.prod(shape) * cost
+
+
+def _max_prime_factor(n):
+    p = 1
+    d = 2
+    while d * d <= n:
+        while n % d == 0:
+            p = d
+            n //= d
+
+        d += 1
+
+    return max(p, n)
+
+
+def _get_ola_block_shape(input_shape, filter_shape):
+    block_shape = []
+    for m, n in zip(input_shape, filter_shape):
+        if n == 1:
+            block_shape.append(m)
+        else:
+            fft_size = 2**int(np.ceil(np.log2(8 * n)))
+            block_shape.append(max(min(m, fft_size - n + 1), n - 1))
+
+    return block_shape
+
+
+def _expand_to_3d(input):
+    ndim = input.ndim - 2
+    return input.reshape(input.shape[:2] + (1, ) * (3 - ndim) + input.shape[2:])
+
+
+def _pad_filter_shape(x, filter_shape):
+    ndim = len(filter_shape)
+    pad_shape = tuple(m + 2 * (n - 1) for m, n in zip(x.shape[-ndim:], filter_shape))
+    return util.resize(x, x.shape[:2] + pad_shape,
+                       oshift=[0, 0] + [n - 1 for n in filter_shape])
+
+
+def _adjoint_filter(W):
+    ndim = W.ndim - 2
+    device = util.get_device(W)
+    xp = device.xp
+    with device:
+        W = xp.conj(util.flip(W, axes=range(-ndim, 0)))
+        return xp.ascontiguousarray(W.swapaxes(0, 1))
+
+
+def _direct_convolve(x, W, mode='full'):
+    ndim = x.ndim - 2
+    filter_shape = W.shape[-ndim:]
+    if mode == 'full':
+        x = _pad_filter_shape(x, filter_shape)
+
+    batch_size = len(x)
+    output_channel = W.shape[0]
+    input_shape = x.shape[-ndim:]
+    output_shape = tuple(m - n + 1 for m, n in zip(input_shape, filter_shape))
+
+    y = util.zeros((batch_size, output_channel) + output_shape, dtype=x.dtype)
+    _direct_convolve_valid(_expand_to_3d(y), _expand_to_3d(x),
+                           _expand_to_3d(W.astype(x.dtype, copy=False)))
+    return y
+
+
+def _direct_convolve_adjoint_input(W, y, mode='full'):
+    W = _adjoint_filter(W)
+    if mode == 'full':
+        return _direct_convolve(y, W, mode='valid')
+    elif mode == 'valid':
+        return _direct_convolve(y, W, mode='full')
+
+
+def _direct_convolve_adjoint_filter(x, y, mode='full'):
+    ndim = x.ndim - 2
+    output_channel = y.shape[1]
+    input_channel = x.shape[1]
+    output_shape = y.shape[-ndim:]
+    input_shape = x.shape[-ndim:]
+    if mode == 'full':
+        filter_shape = tuple(p - m + 1 for m, p in zip(input_shape, output_shape))
+        x = _pad_filter_shape(x, filter_shape)
+    elif mode == 'valid':
+        filter_shape = tuple(m - p + 1 for m, p in zip(input_shape, output_shape))
+
+    W = util.zeros((output_channel, input_channel) + filter_shape, dtype=x.dtype)
+    _direct_convolve_adjoint_filter_valid(_expand_to_3d(W), _expand_to_3d(np.conj(x)),
+                                          _expand_to_3d(y.astype(x.dtype, copy=False)))
+    return W
+
+
+@nb.jit(nopython=True, cache=True)
+def _direct_convolve_valid(output, input, filt):
+    batch_size, output_channel, nx, ny, nz = output.shape
+    input_channel, kx, ky, kz = filt.shape[1:]
+
+    for b in range(batch_size):
+        for o in range(output_channel):
+            for i in range(input_channel):
+                for a in range(kx):
+                    for c in range(ky):
+                        for d in range(kz):
+                            w = filt[o, i, a, c, d]
+                            sx = kx - 1 - a
+                            sy = ky - 1 - c
+                            sz = kz - 1 - d
+                            for p in range(nx):
+                                for q in range(ny):
+                                    for r in range(nz):
+                                        output[b, o, p, q, r] += w * \
+                                            input[b, i, p + sx, q + sy, r + sz]
+
+    return output
+
+
+@nb.jit(nopython=True, cache=True)
+def _direct_convolve_adjoint_filter_valid(filt, input, output):
+    batch_size, output_channel, nx, ny, nz = output.shape
+    input_channel, kx, ky, kz = filt.shape[1:]
+
+    for b in range(batch_size):
+        for o in range(output_channel):
+            for i in range(input_channel):
+                for a in range(kx):
+                    for c in range(ky):
+                        for d in range(kz):
+                            sx = kx - 1 - a
+                            sy = ky - 1 - c
+                            sz = kz - 1 - d
+                            w = filt[o, i, a, c, d]
+                            for p in range(nx):
+                                for q in range(ny):
+                                    for r in range(nz):
+                                        w += output[b, o, p, q, r] * \
+                                            input[b, i, p + sx, q + sy, r + sz]
+
+                            filt[o, i, a, c, d] = w
+
+    return filt
+
+
+def _to_blocks(x, block_shape, num_blocks):
+    """Reshape [batch, channel] + shape to [batch, channel] + interleaved
+    (num_blocks, block_shape) axes."""
+    ndim = len(block_shape)
+    batch_size, channel = x.shape[:2]
+    device = util.get_device(x)
+    with device:
+        x = util.resize(x, (batch_size, channel) +
+                        tuple(nb * b for nb, b in zip(num_blocks, block_shape)),
+                        oshift=[0] * x.ndim)
+        blocks_shape = []
+        for nb, b in zip(num_blocks, block_shape):
+            blocks_shape += [nb, b]
+
+        return x.reshape([batch_size, channel] + blocks_shape)
+
+
+def _blocks_to_batch(x, ndim):
+    """Move interleaved block axes into the batch axis."""
+    batch_size, channel = x.shape[:2]
+    device = util.get_device(x)
+    with device:
+        x = x.transpose([0] + [2 + 2 * d for d in range(ndim)] +
+                        [1] + [3 + 2 * d for d in range(ndim)])
+        num_blocks = util.prod(x.shape[1:ndim + 1])
+        return x.reshape((batch_size * num_blocks, channel) + x.shape[-ndim:])
+
+
+def _batch_to_blocks(x, batch_size, num_blocks):
+    """Inverse of _blocks_to_batch."""
+    ndim = len(num_blocks)
+    channel = x.shape[1]
+    block_shape = x.shape[-ndim:]
+    device = util.get_device(x)
+    with device:
+        x = x.reshape((batch_size, ) + tuple(num_blocks) + (channel, ) + block_shape)
+        axes = [0, ndim + 1]
+        for d in range(ndim):
+            axes += [1 + d, ndim + 2 + d]
+
+        return x.transpose(axes)
+
+
+def _overlap_add(y, axis, block_length):
+    """Overlap-add blocks along interleaved block axis and in-block axis + 1."""
+    device = util.get_device(y)
+    xp = device.xp
+    num_blocks, length = y.shape[axis], y.shape[axis + 1]
+    tail_length = length - block_length
+    with device:
+        oshape = list(y.shape)
+        oshape[axis] = num_blocks + 1
+        oshape[axis + 1] = block_length
+        output = xp.zeros(oshape, dtype=y.dtype)
+
+        head = [slice(None)] * y.ndim
+        head[axis + 1] = slice(0, block_length)
+        output_head = [slice(None)] * y.ndim
+        output_head[axis] = slice(0, num_blocks)
+        output[tuple(output_head)] += y[tuple(head)]
+
+        tail = [slice(None)] * y.ndim
+        tail[axis + 1] = slice(block_length, length)
+        output_tail = [slice(None)] * y.ndim
+        output_tail[axis] = slice(1, num_blocks + 1)
+        output_tail[axis + 1] = slice(0, tail_length)
+        output[tuple(output_tail)] += y[tuple(tail)]
+
+        return output
+
+
+def _overlap_blocks(x, axis, tail_length):
+    """Extend each block along axis + 1 with the first tail_length samples
+    of the following block, dropping the last block."""
+    device = util.get_device(x)
+    xp = device.xp
+    num_blocks = x.shape[axis] - 1
+    with device:
+        head = [slice(None)] * x.ndim
+        head[axis] = slice(0, num_blocks)
+        tail = [slice(None)] * x.ndim
+        tail[axis] = slice(1, num_blocks + 1)
+        tail[axis + 1] = slice(0, tail_length)
+
+        return xp.concatenate([x[tuple(head)], x[tuple(tail)]], axis=axis + 1)
+
+
+def _ola_full(x, filter_shape, block_shape, convolve_blocks):
+    """Full convolution by overlap-add.
+
+    Splits x into blocks, applies convolve_blocks for full convolution
+    of each block, and overlap-adds the results.
+
+    """
+    ndim = x.ndim - 2
+    batch_size = len(x)
+    input_shape = x.shape[-ndim:]
+    if block_shape is None:
+        block_shape = _get_ola_block_shape(input_shape, filter_shape)
+
+    num_blocks = [(m + b - 1) // b for m, b in zip(input_shape, block_shape)]
+
+    device = util.get_device(x)
+    with device:
+        x = _to_blocks(x, block_shape, num_blocks)
+        x = _blocks_to_batch(x, ndim)
+        y = convolve_blocks(x)
+        output_channel = y.shape[1]
+        y = _batch_to_blocks(y, batch_size, num_blocks)
+        for d in range(ndim):
+            y = _overlap_add(y, 2 + 2 * d, block_shape[d])
+
+        return y.reshape((batch_size, output_channel) +
+                         tuple((nb + 1) * b for nb, b in zip(num_blocks, block_shape)))
+
+
+def _ola_convolve(x, W, mode='full', block_shape=None, x_cache=None, W_cache=None):
+    ndim = x.ndim - 2
+    batch_size = len(x)
+    output_channel = W.shape[0]
+    input_shape = x.shape[-ndim:]
+    filter_shape = W.shape[-ndim:]
+
+    def convolve_blocks(x):
+        return _fft_convolve(x, W, mode='full', x_cache=x_cache, W_cache=W_cache)
+
+    device = util.get_device(x)
+    with device:
+        y = _ola_full(x, filter_shape, block_shape, convolve_blocks)
+
+        if mode == 'full':
+            output_shape = tuple(m + n - 1 for m, n in zip(input_shape, filter_shape))
+            shift = [0] * y.ndim
+        elif mode == 'valid':
+            output_shape = tuple(m - n + 1 for m, n in zip(input_shape, filter_shape))
+            shift = [0, 0] + [n - 1 for n in filter_shape]
+
+        return util.resize(y, (batch_size, output_channel) + output_shape, ishift=shift)
+
+
+def _ola_convolve_adjoint_input(W, y, mode='full', block_shape=None, W_cache=None):
+    ndim = y.ndim - 2
+    batch_size = len(y)
+    input_channel = W.shape[1]
+    output_shape = y.shape[-ndim:]
+    filter_shape = W.shape[-ndim:]
+
+    def convolve_blocks(y):
+        return _fft_convolve_adjoint_input(W, y, mode='valid', W_cache=W_cache)
+
+    device = util.get_device(y)
+    with device:
+        x = _ola_full(y, filter_shape, block_shape, convolve_blocks)
+
+        if mode == 'full':
+            input_shape = tuple(p - n + 1 for p, n in zip(output_shape, filter_shape))
+            shift = [0, 0] + [n - 1 for n in filter_shape]
+        elif mode == 'valid':
+            input_shape = tuple(p + n - 1 for p, n in zip(output_shape, filter_shape))
+            shift = [0] * x.ndim
+
+        return util.resize(x, (batch_size, input_channel) + input_shape, ishift=shift)
+
+
+def _ola_convolve_adjoint_filter(x, y, mode='full', block_shape=None, x_cache=None):
+    ndim = x.ndim - 2
+    batch_size = len(x)
+    output_shape = y.shape[-ndim:]
+    input_shape = x.shape[-ndim:]
+    if mode == 'full':
+        filter_shape = tuple(p - m + 1 for m, p in zip(input_shape, output_shape))
+        x = _pad_filter_shape(x, filter_shape)
+    elif mode == 'valid':
+        filter_shape = tuple(m - p + 1 for m, p in zip(input_shape, output_shape))
+
+    if block_shape is None:
+        block_shape = _get_ola_block_shape(output_shape, filter_shape)
+
+    num_blocks = [(p + b - 1) // b for p, b in zip(output_shape, block_shape)]
+
+    device = util.get_device(x)
+    with device:
+        y = _to_blocks(y, block_shape, num_blocks)
+        y = _blocks_to_batch(y, ndim)
+
+        x = _to_blocks(x, block_shape, [nb + 1 for nb in num_blocks])
+        for d in range(ndim):
+            x = _overlap_blocks(x, 2 + 2 * d, filter_shape[d] - 1)
+
+        x = _blocks_to_batch(x, ndim)
+
+        return _fft_convolve_adjoint_filter(x, y, mode='valid', x_cache=x_cache)
+
+
+def _contract_channels(a, b, chunk_size=2**22):
+    """Channel contraction for each frequency.
+
+    Computes output[m, n, ...] = sum_k a[m, k, ...] * b[k, n, ...],
+    without forming the [m, k, n, ...] product. Frequencies are processed
+    in chunks so that temporaries have about chunk_size elements.
+
+    """
+    m, k = a.shape[:2]
+    n = b.shape[1]
+    freq_shape = a.shape[2:]
+    freq_size = util.prod(freq_shape)
+
+    device = util.get_device(a)
+    xp = device.xp
+    with device:
+        if k == 1:
+            return a * b
+
+        a = a.reshape((m, k, freq_size))
+        b = b.reshape((k, n, freq_size))
+        output = xp.empty((m, n, freq_size), dtype=xp.result_type(a, b))
+
+        chunk = max(chunk_size // (m * k + k * n + m * n), 1)
+        for start in range(0, freq_size, chunk):
+            stop = min(start + chunk, freq_size)
+            a_c = a[:, :, start:stop]
+            b_c = b[:, :, start:stop]
+            if min(m, k, n) >= 4:
+                # Batched matrix multiply with frequency as the batch axis.
+                a_c = xp.ascontiguousarray(a_c.transpose(2, 0, 1))
+                b_c = xp.ascontiguousarray(b_c.transpose(2, 0, 1))
+                output[:, :, start:stop] = xp.matmul(a_c, b_c).transpose(1, 2, 0)
+            else:
+                output[:, :, start:stop] = xp.einsum('mkf,knf->mnf', a_c, b_c)
+
+        return output.reshape((m, n) + freq_shape)
+
+
+def _get_spectrum(input, pad_shape, real, flip=False, cache=None):
+    """Fourier spectrum of zero-padded input over the last len(pad_shape) axes.
+
+    If flip is True, the spectrum of the conjugated and flipped input is
+    returned instead. Spectra are looked up in and stored to cache if given.
+
+    """
+    ndim = len(pad_shape)
+    device = util.get_device(input)
+    key = (input.shape, pad_shape, real, flip, device.id)
+    if cache is not None and key in cache:
+        return cache[key]
+
+    xp = device.xp
+    with device:
+        if flip:
+            input = xp.conj(util.flip(input, axes=range(-ndim, 0)))
+
+        input_pad = util.resize(input, input.shape[:-ndim] + pad_shape,
+                                oshift=[0] * input.ndim)
+        if real:
+            output = xp.fft.rfftn(input_pad, axes=range(-ndim, 0), norm='ortho')
+        else:
+            output = fft.fft(input_pad, axes=range(-ndim, 0), center=False)
+
+    if cache is not None:
+        cache[key] = output
+
+    return output
+
+
+def _fft_convolve(x, W, mode='full', x_cache=None, W_cache=None):
     ndim = x.ndim - 2
     batch_size = len(x)
     output_channel, input_channel = W.shape[:2]
@@ -226,25 +733,17 @@ def _fft_convolve(x, W, mode='full'):
         pad_shape = input_shape
 
     dtype = x.dtype
+    real = np.issubdtype(dtype, np.floating)
     device = util.get_device(x)
     xp = device.xp
     with device:
-        x = x.reshape((batch_size, 1, input_channel) + input_shape)
-        x_pad = util.resize(x, (batch_size, 1, input_channel) + pad_shape,
-                            oshift=[0] * x.ndim)
-        W_pad = util.resize(W, (output_channel, input_channel) + pad_shape,
-                            oshift=[0] * W.ndim)
-
-        if np.issubdtype(dtype, np.floating):
-            x_fft = xp.fft.rfftn(x_pad, axes=range(-ndim, 0), norm='ortho')
-            W_fft = xp.fft.rfftn(W_pad, axes=range(-ndim, 0), norm='ortho')
-            y_fft = xp.sum(x_fft * W_fft, axis=-ndim - 1)
+        x_fft = _get_spectrum(x, pad_shape, real, cache=x_cache)
+        W_fft = _get_spectrum(W, pad_shape, real, cache=W_cache)
+        y_fft = _contract_channels(x_fft, W_fft.swapaxes(0, 1))
+        if real:
             y = xp.fft.irfftn(y_fft, pad_shape,
                               axes=range(-ndim, 0), norm='ortho').astype(dtype)
         else:
-            x_fft = fft.fft(x_pad, axes=range(-ndim, 0), center=False)
-            W_fft = fft.fft(W_pad, axes=range(-ndim, 0), center=False)
-            y_fft = xp.sum(x_fft * W_fft, axis=-ndim - 1)
             y = fft.ifft(y_fft, axes=range(-ndim, 0), center=False)
 
         if mode == 'full':
@@ -257,7 +756,7 @@ def _fft_convolve(x, W, mode='full'):
         return y
 
 
-def _fft_convolve_adjoint_input(W, y, mode='full'):
+def _fft_convolve_adjoint_input(W, y, mode='full', W_cache=None):
     ndim = y.ndim - 2
     batch_size = len(y)
     output_channel, input_channel = W.shape[:2]
@@ -271,26 +770,16 @@ def _fft_convolve_adjoint_input(W, y, mode='full'):
         pad_shape = input_shape
 
     dtype = y.dtype
+    real = np.issubdtype(dtype, np.floating)
     device = util.get_device(y)
     xp = device.xp
     with device:
-        y = y.reshape((batch_size, output_channel, 1) + output_shape)
-        W = xp.conj(util.flip(W, axes=range(-ndim, 0)))
-        
-        y_pad = util.resize(y, (batch_size, output_channel, 1) + pad_shape,
-                            oshift=[0] * y.ndim)
-        W_pad = util.resize(W, (output_channel, input_channel) + pad_shape,
-                            oshift=[0] * W.ndim)
-
-        if np.issubdtype(dtype, np.floating):
-            y_fft = xp.fft.rfftn(y_pad, axes=range(-ndim, 0), norm='ortho')
-            W_fft = xp.fft.rfftn(W_pad, axes=range(-ndim, 0), norm='ortho')
-            x_fft = xp.sum(y_fft * W_fft, axis=-ndim - 2)
+        y_fft = _get_spectrum(y, pad_shape, real)
+        W_fft = _get_spectrum(W, pad_shape, real, flip=True, cache=W_cache)
+        x_fft = _contract_channels(y_fft, W_fft)
+        if real:
             x = xp.fft.irfftn(x_fft, pad_shape, axes=range(-ndim, 0), norm='ortho').astype(dtype)
         else:
-            y_fft = fft.fft(y_pad, axes=range(-ndim, 0), center=False)
-            W_fft = fft.fft(W_pad, axes=range(-ndim, 0), center=False)
-            x_fft = xp.sum(y_fft * W_fft, axis=-ndim - 2)
             x = fft.ifft(x_fft, axes=range(-ndim, 0), center=False)
 
         if mode == 'full':
@@ -303,7 +792,7 @@ def _fft_convolve_adjoint_input(W, y, mode='full'):
         return x
 
 
-def _fft_convolve_adjoint_filter(x, y, mode='full'):
+def _fft_convolve_adjoint_filter(x, y, mode='full', x_cache=None):
     ndim = x.ndim - 2
     batch_size = len(x)
     output_channel = y.shape[1]
@@ -318,28 +807,17 @@ def _fft_convolve_adjoint_filter(x, y, mode='full'):
         pad_shape = input_shape
 
     dtype = x.dtype
+    real = np.issubdtype(dtype, np.floating)
     device = util.get_device(x)
     xp = device.xp
     with device:
-        x = xp.conj(util.flip(x, axes=range(-ndim, 0)))
-        x = x.reshape((batch_size, 1, input_channel) + input_shape)
-        y = y.reshape((batch_size, output_channel, 1) + output_shape)
-        
-        x_pad = util.resize(x, (batch_size, 1, input_channel) + pad_shape,
-                            oshift=[0] * x.ndim)
-        y_pad = util.resize(y, (batch_size, output_channel, 1) + pad_shape,
-                            oshift=[0] * y.ndim)
-
-        if np.issubdtype(dtype, np.floating):
-            x_fft = xp.fft.rfftn(x_pad, axes=range(-ndim, 0), norm='ortho')
-            y_fft = xp.fft.rfftn(y_pad, axes=range(-ndim, 0), norm='ortho')
-            W_fft = xp.sum(x_fft * y_fft, axis=0)
+        x_fft = _get_spectrum(x, pad_shape, real, flip=True, cache=x_cache)
+        y_fft = _get_spectrum(y, pad_shape, real)
+        W_fft = _contract_channels(y_fft.swapaxes(0, 1), x_fft)
+        if real:
             W = xp.fft.irfftn(W_fft, pad_shape,
                               axes=range(-ndim, 0), norm='ortho').astype(dtype)
         else:
-            x_fft = fft.fft(x_pad, axes=range(-ndim, 0), center=False)
-            y_fft = fft.fft(y_pad, axes=range(-ndim, 0), center=False)
-            W_fft = xp.sum(x_fft * y_fft, axis=0)
             W = fft.ifft(W_fft, axes=range(-ndim, 0), center=False)
 
         if mode == 'full':
@@ -163,3 +163,45 @@ class TestConv(unittest.TestCase):
                                                            output_multi_channel=True))
                 npt.assert_allclose(W, [[[3, 3, 3]],
                                         [[3, 3, 3]]], atol=1e-5)
+
+    def test_convolve_engines(self):
+        batch_size = 2
+        input_channel = 3
+        output_channel = 4
+        for ndim in [1, 2, 3]:
+            input_shape = (9, ) * ndim
+            filter_shape = (3, ) * ndim
+            block_shape = (4, ) * ndim
+            for mode in ['full', 'valid']:
+                for dtype in [np.float32, np.complex128]:
+                    x = util.randn((batch_size, input_channel) + input_shape, dtype=dtype)
+                    W = util.randn((output_channel, input_channel) + filter_shape, dtype=dtype)
+                    y = conv._fft_convolve(x, W, mode=mode)
+                    npt.assert_allclose(conv._direct_convolve(x, W, mode=mode),
+                                        y, atol=1e-5, rtol=1e-5)
+                    npt.assert_allclose(conv._ola_convolve(
+                        x, W, mode=mode, block_shape=block_shape),
+                                        y, atol=1e-5, rtol=1e-5)
+
+                    y = util.randn(y.shape, dtype=dtype)
+                    x = conv._fft_convolve_adjoint_input(W, y, mode=mode)
+                    npt.assert_allclose(conv._direct_convolve_adjoint_input(W, y, mode=mode),
+                                        x, atol=1e-5, rtol=1e-5)
+                    npt.assert_allclose(conv._ola_convolve_adjoint_input(
+                        W, y, mode=mode, block_shape=block_shape),
+                                        x, atol=1e-5, rtol=1e-5)
+
+                    W = conv._fft_convolve_adjoint_filter(x, y, mode=mode)
+                    atol = 1e-4 * np.abs(W).max()
+                    npt.assert_allclose(conv._direct_convolve_adjoint_filter(x, y, mode=mode),
+                                        W, atol=atol, rtol=1e-4)
+                    npt.assert_allclose(conv._ola_convolve_adjoint_filter(
+                        x, y, mode=mode, block_shape=block_shape),
+                                        W, atol=atol, rtol=1e-4)
+
+    def test_contract_channels(self):
+        for m, k, n in [(1, 1, 3), (2, 3, 4), (4, 5, 6)]:
+            a = util.randn((m, k, 7, 8))
+            b = util.randn((k, n, 7, 8))
+            c = np.sum(a[:, :, None] * b[None], axis=1)
+            npt.assert_allclose(conv._contract_channels(a, b, chunk_size=10), c)
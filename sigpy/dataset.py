@@ -4,53 +4,434 @@
 This module contains custom classes to provide numpy array like interfaces.
 
 """
+import itertools
+import json
+import os
 import numpy as np
 import pickle
-from sigpy import util
+import queue
+import threading
+from concurrent import futures
+from sigpy import config, util
+
+if config.cupy_enabled:
+    import cupy as cp
+
+
+def _read_npy_header(filepath):
+    """Reads shape and dtype of a .npy file from its header only."""
+    with open(filepath, 'rb') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+            return shape, dtype
+        elif version == (2, 0):
+            shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+            return shape, dtype
+
+    arr = np.load(filepath, mmap_mode='r')
+    return arr.shape, arr.dtype
+
+
+def _pinned_empty(shape, dtype):
+    size = util.prod(shape)
+    mem = cp.cuda.alloc_pinned_memory(size * np.dtype(dtype).itemsize)
+    return np.frombuffer(mem, dtype, size).reshape(shape)
 
 
 class NpyFiles(object):
+    """Stack of .npy files as an array, zero-padded to a common shape.
 
+    Files are read with memory mapping, so indexing a single file only reads
+    the requested part when its shape matches.
+
+    Args:
+        filepaths (list of str): .npy file paths.
+
+    """
     def __init__(self, filepaths):
         self.filepaths = [str(f) for f in filepaths]
         self.ndim = None
         for f in self.filepaths:
-            arr = np.load(f, mmap_mode='r')
+            shape, dtype = _read_npy_header(f)
             if self.ndim:
-                if self.ndim != arr.ndim + 1:
+                if self.ndim != len(shape) + 1:
                     raise ValueError('Datasets must have the same number of dimensions.')
 
-                if self.dtype != arr.dtype:
+                if self.dtype != dtype:
                     raise ValueError('Datasets must have the same dtype.')
-                
+
                 self.shape = tuple([len(self.filepaths)] +
-                                   [max(s1, s2) for s1, s2 in zip(self.shape[1:], arr.shape)])
+                                   [max(s1, s2) for s1, s2 in zip(self.shape[1:], shape)])
             else:
-                self.shape = (len(self.filepaths), ) + arr.shape
-                self.ndim = arr.ndim + 1
-                self.dtype = arr.dtype
+                self.shape = (len(self.filepaths), ) + shape
+                self.ndim = len(shape) + 1
+                self.dtype = dtype
 
     def __len__(self):
         return len(self.filepaths)
 
-    def _get_dataset(self, i):
-        return util.resize(np.load(self.filepaths[i]), self.shape[1:])
+    def _get_dataset(self, i, output=None):
+        input = np.load(self.filepaths[i], mmap_mode='r')
+        if output is None:
+            output = np.empty(self.shape[1:], dtype=self.dtype)
+
+        if input.shape == output.shape:
+            output[...] = input
+        else:
+            # Zero-pad to center, as in util.resize.
+            output.fill(0)
+            oslice = tuple(slice(o // 2 - m // 2, o // 2 - m // 2 + m)
+                           for m, o in zip(input.shape, output.shape))
+            output[oslice] = input
+
+        return output
+
+    def _get_dataset_index(self, i, index):
+        input = np.load(self.filepaths[i], mmap_mode='r')
+        if input.shape == self.shape[1:]:
+            return np.array(input[index])
+        else:
+            return self._get_dataset(i)[index]
 
     def save(self, filepath):
         with open(filepath, "wb") as f:
             pickle.dump(self, f)
 
+    def iter_batches(self, batch_size, num_prefetch=2, device=util.cpu_device):
+        """Iterates over batches, which are loaded by a background thread.
+
+        Batches are read into a pool of num_prefetch + 1 reused buffers,
+        allocated in pinned memory if device is a GPU. On CPU, each batch
+        is a buffer that is only valid until the next iteration.
+
+        Args:
+            batch_size (int): Batch size. The last batch can be smaller.
+            num_prefetch (int): Number of batches to load ahead.
+            device (Device): Device of batches.
+
+        Yields:
+            array: Batch of shape [batch_size] + shape[1:].
+
+        """
+        device = util.Device(device)
+        buffer_shape = (batch_size, ) + self.shape[1:]
+        free = queue.Queue()
+        ready = queue.Queue()
+        for _ in range(num_prefetch + 1):
+            if device == util.cpu_device:
+                free.put(np.empty(buffer_shape, dtype=self.dtype))
+            else:
+                free.put(_pinned_empty(buffer_shape, self.dtype))
+
+        stop_event = threading.Event()
+
+        def load():
+            try:
+                for start in range(0, len(self), batch_size):
+                    output = free.get()
+                    if stop_event.is_set():
+                        return
+
+                    stop = min(start + batch_size, len(self))
+                    for k, i in enumerate(range(start, stop)):
+                        self._get_dataset(i, output=output[k])
+
+                    ready.put((output, stop - start))
+
+                ready.put(None)
+            except Exception as e:
+                ready.put(e)
+
+        thread = threading.Thread(target=load, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = ready.get()
+                if item is None:
+                    return
+                elif isinstance(item, Exception):
+                    raise item
+
+                output, n = item
+                if device == util.cpu_device:
+                    yield output[:n]
+                    free.put(output)
+                else:
+                    batch = util.move(output[:n], device)
+                    free.put(output)
+                    yield batch
+        finally:
+            stop_event.set()
+            free.put(None)
+            thread.join()
+
     def __getitem__(self, index):
         if isinstance(index, int):
             return self._get_dataset(index)
         elif isinstance(index, slice):
             start, stop, step = index.indices(len(self.filepaths))
-            return np.stack(self._get_dataset(i) for i in range(start, stop, step))
-        
+            idx = range(start, stop, step)
+            output = np.empty((len(idx), ) + self.shape[1:], dtype=self.dtype)
+            for k, i in enumerate(idx):
+                self._get_dataset(i, output=output[k])
+
+            return output
+
         elif isinstance(index, tuple) or isinstance(index, list):
             if isinstance(index[0], int):
-                return self._get_dataset(index[0])[index[1:]]
+                return self._get_dataset_index(index[0], tuple(index[1:]))
             elif isinstance(index[0], slice):
                 start, stop, step = index[0].indices(len(self.filepaths))
-                return np.stack(self._get_dataset(i)[index[1:]] for i in range(start, stop, step))
-            
+                return np.stack([self._get_dataset_index(i, tuple(index[1:]))
+                                 for i in range(start, stop, step)])
+
+
+class ChunkedArray(object):
+    """Chunked array stored on disk as a directory of chunks and a JSON index.
+
+    Each chunk is a .npy file, or a .npz file if compress is True, named by
+    its chunk index. Chunks that were never written read as zeros.
+    Supports basic indexing with integers, slices and Ellipsis for reading
+    and writing, so it can be passed wherever an array-like input is read
+    in batches, for example learn.app.ConvSparseCoding.
+
+    Args:
+        dirpath (str): Directory path. Opens an existing array if shape is
+            None, and creates a new one otherwise.
+        shape (None or tuple of ints): Array shape.
+        dtype (Dtype): Data type.
+        chunks (None or tuple of ints): Chunk shape. By default, chunks
+            split the first axis only, into about 16 MB each.
+        compress (bool): Compress chunks with zlib.
+        num_workers (int): Number of threads to read and write chunks.
+
+    """
+    def __init__(self, dirpath, shape=None, dtype=np.complex, chunks=None,
+                 compress=False, num_workers=1):
+        self.dirpath = str(dirpath)
+        self.num_workers = num_workers
+        if shape is None:
+            with open(self._index_path, 'r') as f:
+                index = json.load(f)
+
+            self.shape = tuple(index['shape'])
+            self.dtype = np.dtype(index['dtype'])
+            self.chunks = tuple(index['chunks'])
+            self.compress = index['compress']
+        else:
+            if os.path.exists(self._index_path):
+                raise ValueError('{} already exists.'.format(self._index_path))
+
+            self.shape = tuple(shape)
+            self.dtype = np.dtype(dtype)
+            if chunks is None:
+                chunks = _get_default_chunks(self.shape, self.dtype)
+
+            if len(chunks) != len(self.shape):
+                raise ValueError('chunks must have the same length as shape, '
+                                 'got {} and {}.'.format(chunks, self.shape))
+
+            self.chunks = tuple(chunks)
+            self.compress = compress
+            os.makedirs(self.dirpath, exist_ok=True)
+            self._write_index()
+
+        self.ndim = len(self.shape)
+
+    @property
+    def _index_path(self):
+        return os.path.join(self.dirpath, 'index.json')
+
+    def _write_index(self):
+        index = {'shape': list(self.shape),
+                 'dtype': self.dtype.str,
+                 'chunks': list(self.chunks),
+                 'compress': self.compress}
+
+        tmp_path = self._index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+
+        os.replace(tmp_path, self._index_path)
+
+    def _chunk_path(self, c):
+        ext = '.npz' if self.compress else '.npy'
+        return os.path.join(self.dirpath, '.'.join(str(i) for i in c) + ext)
+
+    def _read_chunk(self, c, chunk_index):
+        path = self._chunk_path(c)
+        if not os.path.exists(path):
+            return None
+
+        if self.compress:
+            with np.load(path) as f:
+                return f['arr'][chunk_index]
+        else:
+            return np.load(path, mmap_mode='r')[chunk_index]
+
+    def _write_chunk(self, c, chunk_index, input, full):
+        path = self._chunk_path(c)
+        if full:
+            chunk = np.ascontiguousarray(input, dtype=self.dtype)
+        else:
+            shape = [min(s - i * cs, cs)
+                     for i, s, cs in zip(c, self.shape, self.chunks)]
+            chunk = self._read_chunk(c, Ellipsis)
+            if chunk is None:
+                chunk = np.zeros(shape, dtype=self.dtype)
+            else:
+                # Chunks at the end of an appended axis can grow.
+                old_chunk = chunk
+                chunk = np.zeros(shape, dtype=self.dtype)
+                chunk[tuple(slice(s) for s in old_chunk.shape)] = old_chunk
+
+            chunk[chunk_index] = input
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            if self.compress:
+                np.savez_compressed(f, arr=chunk)
+            else:
+                np.save(f, chunk)
+
+        os.replace(tmp_path, path)
+
+    def _normalize_index(self, index):
+        if not isinstance(index, tuple):
+            index = (index, )
+
+        if any(i is Ellipsis for i in index):
+            e = index.index(Ellipsis)
+            index = (index[:e] + (slice(None), ) * (self.ndim - len(index) + 1) +
+                     index[e + 1:])
+
+        if len(index) > self.ndim:
+            raise IndexError('Too many indices for array.')
+
+        index = index + (slice(None), ) * (self.ndim - len(index))
+
+        ranges = []
+        int_axes = []
+        for a, (i, s) in enumerate(zip(index, self.shape)):
+            if isinstance(i, slice):
+                ranges.append(range(*i.indices(s)))
+            elif isinstance(i, (int, np.integer)):
+                if i < -s or i >= s:
+                    raise IndexError('Index {} is out of bounds for axis {} '
+                                     'with size {}.'.format(i, a, s))
+
+                i = int(i) % s
+                ranges.append(range(i, i + 1))
+                int_axes.append(a)
+            else:
+                raise TypeError('Only integers, slices and Ellipsis are '
+                                'supported, got {}.'.format(i))
+
+        return ranges, tuple(int_axes)
+
+    def _get_chunk_slices(self, ranges):
+        """Splits an indexed region into chunks.
+
+        Returns:
+            list of tuples: chunk index, slice within chunk,
+                slice within region, and whether the chunk is fully covered.
+
+        """
+        axis_slices = []
+        for r, s, cs in zip(ranges, self.shape, self.chunks):
+            idx = np.arange(r.start, r.stop, r.step)
+            cidx = idx // cs
+            slices = []
+            for c in np.unique(cidx):
+                pos = np.nonzero(cidx == c)[0]
+                local = idx[pos] - c * cs
+                if r.step > 0:
+                    chunk_slice = slice(local[0], local[-1] + 1, r.step)
+                else:
+                    stop = local[-1] - 1
+                    chunk_slice = slice(local[0], stop if stop >= 0 else None, r.step)
+
+                full = r.step == 1 and len(pos) == min(s - c * cs, cs)
+                slices.append((int(c), chunk_slice, slice(pos[0], pos[-1] + 1), full))
+
+            axis_slices.append(slices)
+
+        chunk_slices = []
+        for item in itertools.product(*axis_slices):
+            c, chunk_index, output_index, full = zip(*item)
+            chunk_slices.append((c, chunk_index, output_index, all(full)))
+
+        return chunk_slices
+
+    def _map(self, func, args):
+        if self.num_workers > 1 and len(args) > 1:
+            with futures.ThreadPoolExecutor(self.num_workers) as executor:
+                return list(executor.map(lambda a: func(*a), args))
+        else:
+            return [func(*a) for a in args]
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def size(self):
+        return util.prod(self.shape)
+
+    def __getitem__(self, index):
+        ranges, int_axes = self._normalize_index(index)
+        output = np.zeros([len(r) for r in ranges], dtype=self.dtype)
+        if output.size > 0:
+            def read(c, chunk_index, output_index, full):
+                chunk = self._read_chunk(c, chunk_index)
+                if chunk is not None:
+                    output[output_index] = chunk
+
+            self._map(read, self._get_chunk_slices(ranges))
+
+        return output.reshape([len(r) for a, r in enumerate(ranges)
+                               if a not in int_axes])
+
+    def __setitem__(self, index, input):
+        ranges, int_axes = self._normalize_index(index)
+        shape = [len(r) for r in ranges]
+        input = np.broadcast_to(np.asarray(input, dtype=self.dtype),
+                                [s for a, s in enumerate(shape) if a not in int_axes])
+        input = input.reshape(shape)
+        if input.size > 0:
+            def write(c, chunk_index, input_index, full):
+                self._write_chunk(c, chunk_index, input[input_index], full)
+
+            self._map(write, self._get_chunk_slices(ranges))
+
+    def __array__(self, dtype=None):
+        output = self[...]
+        if dtype is not None:
+            output = output.astype(dtype, copy=False)
+
+        return output
+
+    def append(self, input):
+        """Appends input along the first axis.
+
+        Args:
+            input (array): Input array of shape [n] + shape[1:].
+
+        """
+        input = np.asarray(input)
+        if input.shape[1:] != self.shape[1:]:
+            raise ValueError('Input shape must be [n] + {}, got {}.'.format(
+                list(self.shape[1:]), input.shape))
+
+        start = self.shape[0]
+        self.shape = (start + len(input), ) + self.shape[1:]
+        self[start:] = input
+        self._write_index()
+
+
+def _get_default_chunks(shape, dtype, chunk_bytes=2**24):
+    if len(shape) == 0:
+        return ()
+
+    item_bytes = util.prod(shape[1:]) * np.dtype(dtype).itemsize
+    return (max(chunk_bytes // max(item_bytes, 1), 1), ) + tuple(shape[1:])
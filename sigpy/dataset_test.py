@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import numpy.testing as npt
+from sigpy import dataset, util
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class TestDataset(unittest.TestCase):
+
+    def test_NpyFiles(self):
+        shapes = [[3, 4], [2, 5], [3, 5], [1, 1], [3, 2]]
+        arrs = [util.randn(shape) for shape in shapes]
+        with tempfile.TemporaryDirectory() as dirname:
+            filepaths = []
+            for i, arr in enumerate(arrs):
+                filepath = os.path.join(dirname, '{}.npy'.format(i))
+                np.save(filepath, arr)
+                filepaths.append(filepath)
+
+            data = dataset.NpyFiles(filepaths)
+            expected = np.stack([util.resize(arr, [3, 5]) for arr in arrs])
+            assert data.shape == expected.shape
+            assert data.dtype == expected.dtype
+
+            npt.assert_allclose(data[2], expected[2])
+            npt.assert_allclose(data[1:4], expected[1:4])
+            npt.assert_allclose(data[2, 1:], expected[2, 1:])
+            npt.assert_allclose(data[0, 1:], expected[0, 1:])
+            npt.assert_allclose(data[::2, 1], expected[::2, 1])
+
+            for num_prefetch in [0, 2]:
+                batches = [batch.copy() for batch in
+                           data.iter_batches(2, num_prefetch=num_prefetch)]
+                npt.assert_allclose(np.concatenate(batches), expected)
+
+            for batch in data.iter_batches(2):
+                break
+
+    def test_ChunkedArray(self):
+        shape = [7, 5, 6]
+        arr = util.randn(shape)
+        for compress in [False, True]:
+            for num_workers in [1, 3]:
+                with tempfile.TemporaryDirectory() as dirname:
+                    data = dataset.ChunkedArray(dirname, shape=[0, 5, 6],
+                                                dtype=arr.dtype, chunks=[2, 3, 6],
+                                                compress=compress,
+                                                num_workers=num_workers)
+                    data.append(arr[:3])
+                    data.append(arr[3:])
+                    assert data.shape == arr.shape
+
+                    data = dataset.ChunkedArray(dirname, num_workers=num_workers)
+                    assert data.shape == arr.shape
+                    assert data.dtype == arr.dtype
+                    npt.assert_allclose(data[...], arr)
+                    npt.assert_allclose(data[2], arr[2])
+                    npt.assert_allclose(data[1:6:2, -1], arr[1:6:2, -1])
+                    npt.assert_allclose(data[::-2, 1:4, 3], arr[::-2, 1:4, 3])
+                    npt.assert_allclose(data[..., 2], arr[..., 2])
+                    npt.assert_allclose(np.asarray(data), arr)
+
+                    arr = arr.copy()
+                    arr[1:5, 2] = 0
+                    data[1:5, 2] = 0
+                    npt.assert_allclose(data[...], arr)
+
+    def test_ChunkedArray_missing_chunks(self):
+        with tempfile.TemporaryDirectory() as dirname:
+            data = dataset.ChunkedArray(dirname, shape=[4, 4], chunks=[2, 2])
+            data[0, 0] = 1
+            expected = np.zeros([4, 4], dtype=np.complex)
+            expected[0, 0] = 1
+            npt.assert_allclose(data[:], expected)
+            assert len(os.listdir(dirname)) == 2
@@ -12,14 +12,19 @@ class ShuffledIndex(object):
 
     Args:
         n (int): Upper bound on indices.
+        random_state (None or RandomState): Random state used to shuffle.
+            Default: the global numpy random state.
     
     """
 
-    def __init__(self, *args):
+    def __init__(self, *args, random_state=None):
         self.stream = np.arange(*args)
         self.next_stream = np.arange(*args)
-        
-        np.random.shuffle(self.stream)
+        if random_state is None:
+            random_state = np.random
+
+        self.random_state = random_state
+        self.random_state.shuffle(self.stream)
         self.idx = -1
 
     def current(self):
@@ -31,7 +36,7 @@ class ShuffledIndex(object):
     def next(self):
         self.idx += 1
         if self.idx == len(self.stream):
-            np.random.shuffle(self.stream)
+            self.random_state.shuffle(self.stream)
             self.idx = 0
 
         return self.current()
@@ -18,6 +18,17 @@ class TestIndex(unittest.TestCase):
 
         npt.assert_allclose(x, [0, 0, 1, 1, 2, 2, 3, 3, 4, 4])
 
+    def test_ShuffledIndex_random_state(self):
+
+        n = 5
+        idx1 = index.ShuffledIndex(n, random_state=np.random.RandomState(0))
+        idx2 = index.ShuffledIndex(n, random_state=np.random.RandomState(0))
+
+        x1 = [idx1.next() for _ in range(2 * n)]
+        x2 = [idx2.next() for _ in range(2 * n)]
+
+        npt.assert_allclose(x1, x2)
+
     def test_PingPongIndex(self):
 
         n = 5
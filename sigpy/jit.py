@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""Compilation of numba kernels ahead of the first reconstruction.
+
+Numba kernels in sigpy are compiled on first call for each dtype signature,
+and cached on disk. The elementwise kernels have explicit signatures
+for float32, float64, complex64 and complex128, and int32 and int64
+where meaningful, and are compiled or loaded from the cache on import.
+The remaining kernels are compiled lazily, as their signatures
+depend on the combination of input dtypes.
+
+warmup calls each kernel on small arrays of the supported dtypes,
+so that later calls, including calls from other processes,
+load the compiled code from the cache.
+
+To ship the cache in a container, populate it at build time,
+after sigpy is installed at its final location::
+
+    NUMBA_CACHE_DIR=/opt/sigpy/numba_cache python -m sigpy.jit
+
+and at run time, before any other use of sigpy::
+
+    sigpy.jit.set_cache_dir('/opt/sigpy/numba_cache')
+
+Numba requires the cache directory to be writable,
+so a read-only cache directory is first copied to a writable directory.
+
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+__all__ = ['set_cache_dir', 'warmup']
+
+
+_kernel_modules = ['sigpy.conv', 'sigpy.interp', 'sigpy.thresh', 'sigpy.util',
+                   'sigpy.mri.samp', 'sigpy.mri.sim']
+
+
+def set_cache_dir(cache_dir, copy_dir=None):
+    """Sets the numba cache directory of sigpy kernels.
+
+    Must be called before any sigpy module with numba kernels is imported.
+    If cache_dir is not writable, its content is copied to copy_dir,
+    which is used instead.
+
+    Args:
+        cache_dir (str): Cache directory.
+        copy_dir (None or str): Writable directory to copy a read-only
+            cache_dir to. If it already exists, it is used as is.
+            If None, a temporary directory is used,
+            and removed when the process exits.
+
+    Returns:
+        str: Cache directory in use.
+
+    """
+    imported = [name for name in _kernel_modules if name in sys.modules]
+    if imported:
+        raise RuntimeError(
+            'set_cache_dir must be called before importing {}.'.format(
+                ', '.join(imported)))
+
+    cache_dir = os.path.abspath(cache_dir)
+    if os.path.isdir(cache_dir) and not os.access(cache_dir, os.W_OK | os.X_OK):
+        if copy_dir is None:
+            temp_dir = tempfile.mkdtemp(prefix='sigpy_numba_')
+            atexit.register(shutil.rmtree, temp_dir, ignore_errors=True)
+            copy_dir = os.path.join(temp_dir, 'cache')
+
+        copy_dir = os.path.abspath(copy_dir)
+        if not os.path.exists(copy_dir):
+            shutil.copytree(cache_dir, copy_dir, copy_function=shutil.copyfile)
+            for path, _, _ in os.walk(copy_dir):
+                os.chmod(path, 0o700)
+
+        cache_dir = copy_dir
+
+    os.environ['NUMBA_CACHE_DIR'] = cache_dir
+    if 'numba' in sys.modules:
+        from numba import config
+        config.CACHE_DIR = cache_dir
+
+    return cache_dir
+
+
+def warmup(dtypes=(np.float32, np.float64, np.complex64, np.complex128),
+           ndims=(1, 2, 3)):
+    """Compiles numba kernels for the given dtypes and populates the cache.
+
+    Coordinates and interpolation tables are of the same precision as dtype.
+    Other combinations of dtypes are compiled on first use.
+
+    Args:
+        dtypes (tuple of Dtypes): Data types to compile for.
+        ndims (tuple of ints): Number of dimensions to compile
+            interpolation kernels for.
+
+    """
+    from sigpy import conv, interp, thresh, util
+    from sigpy.mri import samp, sim
+
+    for dtype in dtypes:
+        dtype = np.dtype(dtype)
+        real_dtype = np.empty(0, dtype=dtype).real.dtype
+        x = np.ones([2, 4], dtype=dtype)
+
+        util.axpy(x.copy(), 1, x)
+        util.xpay(x.copy(), 1, x)
+        util.finite_difference_adjoint(util.finite_difference(x))
+
+        thresh.soft_thresh(0.5, x)
+        thresh.hard_thresh(0.5, x)
+        thresh.l1_proj(1, x, axes=[-1])
+        thresh.elitist_thresh(0.5, x, axes=[-1])
+        if not np.iscomplexobj(x):
+            thresh.tv1d_denoise(0.5, x)
+
+        x = np.ones([1, 1, 4], dtype=dtype)
+        W = np.ones([1, 1, 2], dtype=dtype)
+        y = conv._direct_convolve(x, W)
+        conv._direct_convolve_adjoint_filter(x, y)
+
+        width = 2.0
+        table = np.ones(4, dtype=real_dtype)
+        for ndim in ndims:
+            coord = np.ones([3, ndim], dtype=real_dtype)
+            shape = [4] * ndim
+            y = interp.interp(np.ones(shape, dtype=dtype), width, table, coord)
+            interp.gridding(y, shape, width, table, coord)
+
+        sim.shepp_logan([2, 2], dtype=dtype)
+
+    samp.poisson([8, 8], 2, calib=[2, 2], max_iter=1)
+
+
+if __name__ == '__main__':
+    warmup()
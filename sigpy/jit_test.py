@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import numpy as np
+
+from sigpy import jit, util
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestJit(unittest.TestCase):
+
+    def test_warmup(self):
+        jit.warmup(dtypes=[np.complex64], ndims=[2])
+
+    def test_set_cache_dir(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            code = ('import sigpy.jit; sigpy.jit.set_cache_dir({!r}); '
+                    'sigpy.jit.warmup(dtypes=["float32"], ndims=[1])').format(cache_dir)
+            subprocess.check_call([sys.executable, '-c', code], cwd=_root)
+            self.assertTrue(os.listdir(cache_dir))
+
+    def test_set_cache_dir_read_only(self):
+        # Simulates a read-only cache, as tests may run as root.
+        code = ('import os, sigpy.jit; os.access = lambda path, mode: False; '
+                'print(sigpy.jit.set_cache_dir({!r}, copy_dir={!r}))')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache_dir = os.path.join(temp_dir, 'cache')
+            os.makedirs(os.path.join(cache_dir, 'sigpy'))
+            for copy_dir in [os.path.join(temp_dir, 'copy'), None]:
+                output = subprocess.check_output(
+                    [sys.executable, '-c', code.format(cache_dir, copy_dir)], cwd=_root)
+                path = output.decode().strip()
+                if copy_dir is None:
+                    self.assertFalse(os.path.exists(path))
+                else:
+                    self.assertEqual(path, copy_dir)
+                    self.assertEqual(os.listdir(path), ['sigpy'])
+
+    def test_set_cache_dir_after_import(self):
+        with self.assertRaisesRegex(RuntimeError, util.__name__):
+            jit.set_cache_dir(tempfile.gettempdir())
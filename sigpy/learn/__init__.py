@@ -1 +1,19 @@
-from sigpy.learn import app, util
+import importlib
+
+__all__ = [
+    'app',
+    'util',
+]
+
+
+def __getattr__(name):
+    # Submodules are imported on first access to reduce startup time.
+    if name in __all__:
+        return importlib.import_module('sigpy.learn.' + name)
+
+    raise AttributeError(
+        "module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -2,6 +2,7 @@
 """Machine learning applications.
 """
 import pickle
+import numpy as np
 import sigpy as sp
         
 
@@ -110,6 +111,12 @@ class ConvSparseCoding(sp.app.App):
         max_power_iter (int): maximum number of iteration for power method.
         mode (str): convolution mode in forward model. {'full', 'valid'}.
         multi_channel (bool): whether data is multi-channel or not.
+        comm (None or Communicator): communicator for data-parallel learning.
+            Each rank solves for coefficients of a disjoint sub-batch of size
+            batch_size // comm.size, and filter gradients are summed
+            with comm.allreduce. Initial filters and batch order are drawn
+            from a random state seeded by rank 0, so that all ranks
+            keep the same filters.
         **kwargs: other LinearLeastSquares arguments.
 
     Returns:
@@ -131,7 +138,7 @@ class ConvSparseCoding(sp.app.App):
                  mode='full', multi_channel=False,
                  elitist=False, init_scale=1e-3,
                  device=sp.util.cpu_device,
-                 checkpoint_path=None, show_pbar=True):
+                 checkpoint_path=None, comm=None, show_pbar=True):
         self.y = y
         self.num_filters = num_filters
         self.filt_width = filt_width
@@ -148,8 +155,12 @@ class ConvSparseCoding(sp.app.App):
         self.init_scale = init_scale
         self.device = device
         self.checkpoint_path = checkpoint_path
+        self.comm = comm
+        if comm is not None:
+            show_pbar = show_pbar and comm.rank == 0
 
         self._get_params()
+        self._get_random_state()
         self._get_batch_vars()
         self.l = sp.util.empty(self.l_shape, dtype=self.dtype, device=self.device)
         self.l_old = sp.util.empty(self.l_shape, dtype=self.dtype, device=self.device)
@@ -157,7 +168,11 @@ class ConvSparseCoding(sp.app.App):
         super().__init__(self.alg, show_pbar=show_pbar)
 
     def _init(self):
-        sp.util.move_to(self.l, sp.util.randn_like(self.l))
+        l = self.random_state.standard_normal(self.l_shape)
+        if np.issubdtype(self.dtype, np.complexfloating):
+            l = (l + 1j * self.random_state.standard_normal(self.l_shape)) / 2**0.5
+
+        sp.util.move_to(self.l, l.astype(self.dtype))
         xp = self.device.xp
         with self.device:
             if self.multi_channel:
@@ -173,8 +188,8 @@ class ConvSparseCoding(sp.app.App):
 
     def _pre_update(self):
         j = self.j_idx.next()
-        j_start = j * self.batch_size
-        j_end = (j + 1) * self.batch_size
+        j_start = j * self.batch_size + self.rank * self.sub_batch_size
+        j_end = j_start + self.sub_batch_size
 
         sp.util.move_to(self.y_j, self.y[j_start:j_end])
         sp.util.move_to(self.l_old, self.l)
@@ -182,7 +197,7 @@ class ConvSparseCoding(sp.app.App):
     def _summarize(self):
         xp = self.device.xp
         with self.device:
-            if self.checkpoint_path is not None:
+            if self.checkpoint_path is not None and self.rank == 0:
                 if self.elitist:
                     l_norm2 = sp.util.norm2(self.l, axes=range(-self.data_ndim, 0))
                     idx = xp.argsort(l_norm2)
@@ -214,6 +229,17 @@ class ConvSparseCoding(sp.app.App):
         self.device = sp.util.Device(self.device)
         self.dtype = self.y.dtype
         self.num_batches = len(self.y) // self.batch_size
+        if self.comm is None:
+            self.rank = 0
+            self.sub_batch_size = self.batch_size
+        else:
+            if self.batch_size % self.comm.size != 0:
+                raise ValueError('batch_size must be divisible by comm.size, '
+                                 'got {} and {}.'.format(self.batch_size, self.comm.size))
+
+            self.rank = self.comm.rank
+            self.sub_batch_size = self.batch_size // self.comm.size
+
         self.data_ndim = self.y.ndim - self.multi_channel - 1
 
         self.l_shape = ([self.num_filters] +
@@ -224,9 +250,20 @@ class ConvSparseCoding(sp.app.App):
 
         self.l_shape = tuple(self.l_shape)
 
+    def _get_random_state(self):
+        seed = np.random.randint(2**31) if self.rank == 0 else 0
+        if self.comm is not None and self.comm.size > 1:
+            # Broadcast the seed from rank 0 by summing with zeros from other ranks.
+            seed = sp.util.array([seed], dtype=np.float64, device=self.device)
+            self.comm.allreduce(seed)
+            seed = int(sp.util.asscalar(seed))
+
+        self.random_state = np.random.RandomState(seed)
+
     def _get_batch_vars(self):
-        self.j_idx = sp.index.ShuffledIndex(self.num_batches)
-        self.y_j = sp.util.empty((self.batch_size, ) + self.y.shape[1:],
+        self.j_idx = sp.index.ShuffledIndex(self.num_batches,
+                                            random_state=self.random_state)
+        self.y_j = sp.util.empty((self.sub_batch_size, ) + self.y.shape[1:],
                                  dtype=self.dtype, device=self.device)
 
     def _get_alg(self):
@@ -240,6 +277,8 @@ class ConvSparseCoding(sp.app.App):
         self.A_l = sp.linop.ConvolveFilter(self.l_shape, self.r_j, mode=self.mode,
                                            input_multi_channel=True,
                                            output_multi_channel=self.multi_channel)
+        if self.comm is not None:
+            self.A_l = self.A_l * sp.linop.AllReduceAdjoint(self.l_shape, self.comm)
 
         if self.elitist:
             min_l_app = sp.app.LinearLeastSquares(
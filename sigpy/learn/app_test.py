@@ -1,12 +1,22 @@
+import multiprocessing
 import unittest
 import numpy as np
 import numpy.testing as npt
+import sigpy as sp
 from sigpy.learn import app
 
 if __name__ == '__main__':
     unittest.main()
 
 
+def _conv_sparse_coding_worker(c, y, batch_size, queue):
+    np.random.seed(c.rank)
+    l, r = app.ConvSparseCoding(y, 1, 2, batch_size, alpha=1, lamda=1e-3,
+                                max_epoch=10, comm=c, show_pbar=False).run()
+    queue.put((c.rank, (l, np.random.randint(2**31))))
+    c.close()
+
+
 class TestApp(unittest.TestCase):
 
     def test_ConvSparseDecom(self):
@@ -47,6 +57,38 @@ class TestApp(unittest.TestCase):
 
         npt.assert_allclose(np.abs(l), [[1 / 2**0.5, 1 / 2**0.5]])
 
+    def test_ConvSparseCoding_comm(self):
+        size = 2
+        batch_size = 4
+        random_state = np.random.RandomState(0)
+        scales = random_state.uniform(0.5, 1.5, size=[8, 1])
+        y = scales * np.array([[1, 1]], dtype=np.float) / 2**0.5
+
+        comms = sp.comm.SharedMemoryCommunicator.create(size)
+        queue = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=_conv_sparse_coding_worker,
+                                         args=(c, y, batch_size, queue)) for c in comms]
+        try:
+            for p in procs:
+                p.start()
+
+            results = dict(queue.get(timeout=60) for _ in range(size))
+        finally:
+            for p in procs:
+                p.terminate()
+                p.join()
+
+            comms[0].unlink()
+
+        l, r = app.ConvSparseCoding(y, 1, 2, batch_size, alpha=1, lamda=1e-3,
+                                    max_epoch=10, show_pbar=False).run()
+
+        # The global random state of each rank is left alone.
+        self.assertNotEqual(results[0][1], results[1][1])
+        npt.assert_array_equal(results[0][0], results[1][0])
+        npt.assert_allclose(np.abs(results[0][0]), np.abs(l), atol=1e-3, rtol=1e-3)
+        npt.assert_allclose(np.abs(l), [[1 / 2**0.5, 1 / 2**0.5]], atol=1e-3, rtol=1e-3)
+
     def test_LinearRegression(self):
         n = 2
         k = 5
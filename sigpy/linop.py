@@ -4,7 +4,7 @@
 import numpy as np
 
 from itertools import product
-from sigpy import config, comm, fft, nufft, util, interp, conv, wavelet
+from sigpy import config, comm, fft, nufft, util, interp, conv, profiler, wavelet
 
 if config.cupy_enabled:
     import cupy as cp
@@ -67,14 +67,92 @@ class Linop(object):
     def apply(self, input):
         self._check_domain(input)
         with util.get_device(input):
-            output = self._apply(input)
+            output = self._profiled_apply(input)
         self._check_codomain(output)
 
         return output
 
+    def _profiled_apply(self, input):
+        with profiler.record(self, 'apply', input) as record:
+            output = self._apply(input)
+            record.set_output(output)
+
+        return output
+
+    def _profiled_apply_async(self, input):
+        with profiler.record(self, 'apply', input) as record:
+            output, request = self._apply_async(input)
+            record.set_output(output)
+
+        return output, request
+
+    def _apply_async(self, input):
+        return self._apply(input), comm.Request()
+
+    def apply_async(self, input):
+        """Starts applying the linear operator.
+
+        Communication at the end of the operator, as in AllReduce,
+        is not waited on, so that it can overlap with other computation.
+
+        Args:
+            input (array): Input array.
+
+        Returns:
+            tuple of array and Request: Output, which can be used after
+                the request is waited on.
+
+        """
+        self._check_domain(input)
+        with util.get_device(input):
+            output, request = self._profiled_apply_async(input)
+
+        self._check_codomain(output)
+        return output, request
+
     def _adjoint_linop(self):
         raise NotImplementedError
 
+    def _flops(self):
+        return util.prod(self.oshape)
+
+    def _workspace_size(self):
+        return util.prod(self.oshape)
+
+    def flops(self):
+        """Estimates floating-point operations of one application.
+
+        Estimates are analytic and assume complex arrays.
+        Composite Linops sum the estimates of their Linops.
+
+        Returns:
+            int: Number of real floating-point operations.
+
+        """
+        return int(self._flops())
+
+    def workspace_bytes(self, dtype=np.complex):
+        """Estimates peak memory of arrays allocated in one application.
+
+        The output is included, but the input is not.
+
+        Args:
+            dtype (Dtype): Data type of arrays.
+
+        Returns:
+            int: Number of bytes.
+
+        """
+        return int(self._workspace_size() * np.dtype(dtype).itemsize)
+
+    def refresh(self):
+        """Clears values cached from arrays held by the Linop.
+
+        Must be called after modifying these arrays in place.
+
+        """
+        return
+
     @property
     def H(self):
         return self._adjoint_linop()
@@ -138,6 +216,12 @@ class Identity(Linop):
     def _adjoint_linop(self):
         return self
 
+    def _flops(self):
+        return 0
+
+    def _workspace_size(self):
+        return 0
+
 
 class Move(Linop):
     """Move input between devices.
@@ -176,14 +260,21 @@ class AllReduce(Linop):
         super().__init__(shape, shape)
 
     def _apply(self, input):
+        output, request = self._apply_async(input)
+        request.wait()
+        return output
+
+    def _apply_async(self, input):
         with util.get_device(input):
             output = input
-            self.comm.allreduce(output)
-            return output
+            return output, self.comm.iallreduce(output)
 
     def _adjoint_linop(self):
         return AllReduceAdjoint(self.ishape, self.comm)
 
+    def _workspace_size(self):
+        return 0
+
 
 class AllReduceAdjoint(Linop):
     """All reduce adjoint operator. Equivalant to identity.
@@ -204,6 +295,12 @@ class AllReduceAdjoint(Linop):
     def _adjoint_linop(self):
         return AllReduce(self.ishape, self.comm)
 
+    def _flops(self):
+        return 0
+
+    def _workspace_size(self):
+        return 0
+
 
 
 class Conj(Linop):
@@ -224,7 +321,7 @@ class Conj(Linop):
         with device:
             input = device.xp.conj(input)
 
-        output = self.A._apply(input)
+        output = self.A._profiled_apply(input)
 
         device = util.get_device(output)
         with device:
@@ -233,6 +330,16 @@ class Conj(Linop):
     def _adjoint_linop(self):
         return Conj(self.A.H)
 
+    def _flops(self):
+        return util.prod(self.ishape) + self.A._flops() + util.prod(self.oshape)
+
+    def _workspace_size(self):
+        return (util.prod(self.ishape) + self.A._workspace_size() +
+                util.prod(self.oshape))
+
+    def refresh(self):
+        self.A.refresh()
+
 
 class Add(Linop):
     """Addition of linear operators.
@@ -258,19 +365,65 @@ class Add(Linop):
                          repr_str=' + '.join([linop.repr_str for linop in linops]))
 
     def _apply(self, input):
-        output = self.linops[0]._apply(input)
+        output, request = self.linops[0]._profiled_apply_async(input)
+        if (request.done or len(self.linops) == 1 or
+            _may_share_memory(output, input)):
+            request.wait()
+            with util.get_device(output):
+                if len(self.linops) > 1 and _may_share_memory(output, input):
+                    output = output.copy()
+
+            self._accumulate(output, input)
+        else:
+            # Overlap communication of the first term with the other terms.
+            rest = self.linops[1]._profiled_apply(input)
+            with util.get_device(rest):
+                if _may_share_memory(rest, input):
+                    rest = rest.copy()
+
+                self._accumulate(rest, input, start=2)
+
+            request.wait()
+            with util.get_device(output):
+                output += rest
+
+        return output
+
+    def _accumulate(self, output, input, start=1):
         with util.get_device(output):
-            for linop in self.linops[1:]:
+            for linop in self.linops[start:]:
                 if isinstance(linop, Multiply) and np.isscalar(linop.mult):
                     util.axpy(output, linop.mult, input)
                 else:
-                    output += linop._apply(input)
-
-        return output
+                    output += linop._profiled_apply(input)
 
     def _adjoint_linop(self):
         return Add([linop.H for linop in self.linops])
 
+    def _flops(self):
+        return (sum(linop._flops() for linop in self.linops) +
+                2 * (len(self.linops) - 1) * util.prod(self.oshape))
+
+    def _workspace_size(self):
+        size = self.linops[0]._workspace_size()
+        if len(self.linops) > 1:
+            size = max(size, util.prod(self.oshape) + max(
+                linop._workspace_size() for linop in self.linops[1:]))
+
+        return size
+
+    def refresh(self):
+        for linop in self.linops:
+            linop.refresh()
+
+
+def _may_share_memory(a, b):
+    xp = util.get_xp(a)
+    if hasattr(xp, 'may_share_memory'):
+        return xp.may_share_memory(a, b)
+
+    return True
+
 
 def _check_compose_linops(linops):
     for linop1, linop2 in zip(linops[:-1], linops[1:]):
@@ -312,14 +465,37 @@ class Compose(Linop):
     def _apply(self, input):
         output = input
         for linop in self.linops[::-1]:
-            output = linop._apply(output)
+            output = linop._profiled_apply(output)
             linop._check_codomain(output)
 
         return output
 
+    def _apply_async(self, input):
+        output = input
+        for linop in self.linops[:0:-1]:
+            output = linop._profiled_apply(output)
+            linop._check_codomain(output)
+
+        return self.linops[0]._profiled_apply_async(output)
+
     def _adjoint_linop(self):
         return Compose([linop.H for linop in self.linops[::-1]])
 
+    def _flops(self):
+        return sum(linop._flops() for linop in self.linops)
+
+    def _workspace_size(self):
+        # Only the input of the current Linop is kept alive.
+        size = self.linops[-1]._workspace_size()
+        for linop in self.linops[-2::-1]:
+            size = max(size, util.prod(linop.ishape) + linop._workspace_size())
+
+        return size
+
+    def refresh(self):
+        for linop in self.linops:
+            linop.refresh()
+
 
 def _check_linops_same_ishape(linops):
     for linop in linops:
@@ -418,6 +594,22 @@ class Hstack(Linop):
     def _adjoint_linop(self):
         return Vstack([op.H for op in self.linops], axis=self.axis)
 
+    def _flops(self):
+        return (sum(linop._flops() for linop in self.linops) +
+                2 * (self.nops - 1) * util.prod(self.oshape))
+
+    def _workspace_size(self):
+        return _stack_workspace_size(self)
+
+    def refresh(self):
+        for linop in self.linops:
+            linop.refresh()
+
+
+def _stack_workspace_size(linop):
+    return util.prod(linop.oshape) + max(
+        op._workspace_size() for op in linop.linops)
+
 
 def _vstack_params(shapes, axis):
     if axis is None:
@@ -501,6 +693,16 @@ class Vstack(Linop):
 
         return Hstack([op.H for op in self.linops], axis=self.axis)
 
+    def _flops(self):
+        return sum(linop._flops() for linop in self.linops)
+
+    def _workspace_size(self):
+        return _stack_workspace_size(self)
+
+    def refresh(self):
+        for linop in self.linops:
+            linop.refresh()
+
 
 class Diag(Linop):
     """Diagonally stack linear operators.
@@ -566,6 +768,16 @@ class Diag(Linop):
     def _adjoint_linop(self):
         return Diag([op.H for op in self.linops], axis=self.axis)
 
+    def _flops(self):
+        return sum(linop._flops() for linop in self.linops)
+
+    def _workspace_size(self):
+        return _stack_workspace_size(self)
+
+    def refresh(self):
+        for linop in self.linops:
+            linop.refresh()
+
 
 class Reshape(Linop):
     """Linear operator that reshapes input to given output shape.
@@ -584,6 +796,12 @@ class Reshape(Linop):
     def _adjoint_linop(self):
         return Reshape(self.ishape, self.oshape)
 
+    def _flops(self):
+        return 0
+
+    def _workspace_size(self):
+        return 0
+
 
 class Transpose(Linop):
     """Linear operator that transposes input with the given axes.
@@ -642,6 +860,12 @@ class FFT(Linop):
     def _adjoint_linop(self):
         return IFFT(self.ishape, axes=self.axes, center=self.center)
 
+    def _flops(self):
+        return _fft_flops(self.ishape, self.axes)
+
+    def _workspace_size(self):
+        return _fft_workspace_size(self.oshape)
+
 
 class IFFT(Linop):
     """IFFT linear operator.
@@ -666,6 +890,25 @@ class IFFT(Linop):
     def _adjoint_linop(self):
         return FFT(self.ishape, axes=self.axes, center=self.center)
 
+    def _flops(self):
+        return _fft_flops(self.ishape, self.axes)
+
+    def _workspace_size(self):
+        return _fft_workspace_size(self.oshape)
+
+
+def _fft_flops(shape, axes):
+    if axes is None:
+        axes = range(len(shape))
+
+    n = util.prod([shape[a] for a in axes])
+    return 5 * util.prod(shape) * np.log2(max(n, 2))
+
+
+def _fft_workspace_size(shape):
+    # Centering shifts and normalization may each create a temporary.
+    return 4 * util.prod(shape)
+
 
 def _get_matmul_oshape(ishape, mshape, adjoint):
     ishape_exp, mshape_exp = util._expand_shapes(ishape, mshape)
@@ -877,6 +1120,12 @@ class Multiply(Linop):
         R = Reshape(self.ishape, S.oshape)
         return R * S * M
 
+    def _flops(self):
+        if np.isscalar(self.mult) and self.mult == 1:
+            return 0
+
+        return 6 * util.prod(self.oshape)
+
 
 class Interp(Linop):
     """Interpolation linear operator.
@@ -921,6 +1170,9 @@ class Interp(Linop):
         return Gridding(self.ishape, self.coord, self.width, self.table,
                         scale=self.scale, shift=self.shift)
 
+    def _flops(self):
+        return _interp_flops(self.oshape, self.coord, self.width)
+
 
 class Gridding(Linop):
     """Gridding linear operator.
@@ -965,6 +1217,15 @@ class Gridding(Linop):
         return Interp(self.oshape, self.coord, self.width, self.table,
                       scale=self.scale, shift=self.shift)
 
+    def _flops(self):
+        return _interp_flops(self.ishape, self.coord, self.width)
+
+
+def _interp_flops(pts_shape, coord, width):
+    # Complex multiply-accumulate over width^ndim grid points per sample.
+    ndim = coord.shape[-1]
+    return 8 * util.prod(pts_shape) * width**ndim
+
 
 class Resize(Linop):
     """Resize linear operator.
@@ -989,6 +1250,9 @@ class Resize(Linop):
 
         return Resize(self.ishape, self.oshape, ishift=self.oshift, oshift=self.ishift)
 
+    def _flops(self):
+        return 0
+
 
 class Flip(Linop):
     """Flip linear operator.
@@ -1175,6 +1439,9 @@ class Sum(Linop):
 
         return Tile(self.ishape, self.axes)
 
+    def _flops(self):
+        return 2 * util.prod(self.ishape)
+
 
 class Tile(Linop):
     """Tile linear operator.
@@ -1291,23 +1558,75 @@ class BlocksToArray(Linop):
         return ArrayToBlocks(self.oshape, self.blk_shape)
 
 
-def Gradient(ishape, axes=None):
+def Gradient(ishape, axes=None, boundary='periodic'):
     """Linear operator that computes numerical gradient.
 
     Args:
        ishape (tuple of ints): Input shape.
+       axes (None or tuple of ints): Axes to compute gradient along.
+       boundary (str): {'periodic', 'neumann'}.
+
+    See Also:
+        FiniteDifference
 
     """
-    I = Identity(ishape)
-    axes = util._normalize_axes(axes, len(ishape))
-    ndim = len(ishape)
-    G = Vstack([I - Circshift(ishape, [0] * i + [1] + [0] * (ndim - i - 1))
-                for i in range(ndim)])
+    G = FiniteDifference(ishape, axes=axes, boundary=boundary)
     G.repr_str = 'Gradient'
 
     return G
 
 
+class FiniteDifference(Linop):
+    """Finite difference linear operator.
+
+    Computes backward differences x[n] - x[n - 1] along each axis,
+    stacked along a new first axis. The adjoint is a negative divergence.
+
+    Args:
+        ishape (tuple of ints): Input shape.
+        axes (None or tuple of ints): Axes to take differences along.
+        boundary (str): {'periodic', 'neumann'}. With periodic boundaries,
+            the first difference wraps around. With Neumann boundaries,
+            the first difference is zero.
+
+    """
+    def __init__(self, ishape, axes=None, boundary='periodic'):
+        self.axes = util._normalize_axes(axes, len(ishape))
+        self.boundary = boundary
+        oshape = [len(self.axes)] + list(ishape)
+
+        super().__init__(oshape, ishape)
+
+    def _apply(self, input):
+        return util.finite_difference(input, axes=self.axes, boundary=self.boundary)
+
+    def _adjoint_linop(self):
+        return FiniteDifferenceAdjoint(self.ishape, axes=self.axes, boundary=self.boundary)
+
+
+class FiniteDifferenceAdjoint(Linop):
+    """Adjoint of finite difference linear operator.
+
+    Args:
+        oshape (tuple of ints): Output shape.
+        axes (None or tuple of ints): Axes to take differences along.
+        boundary (str): {'periodic', 'neumann'}.
+
+    """
+    def __init__(self, oshape, axes=None, boundary='periodic'):
+        self.axes = util._normalize_axes(axes, len(oshape))
+        self.boundary = boundary
+        ishape = [len(self.axes)] + list(oshape)
+
+        super().__init__(oshape, ishape)
+
+    def _apply(self, input):
+        return util.finite_difference_adjoint(input, axes=self.axes, boundary=self.boundary)
+
+    def _adjoint_linop(self):
+        return FiniteDifference(self.oshape, axes=self.axes, boundary=self.boundary)
+
+
 class NUFFT(Linop):
     """NUFFT linear operator.
 
@@ -1340,6 +1659,14 @@ class NUFFT(Linop):
         return NUFFTAdjoint(self.ishape, self.coord,
                             oversamp=self.oversamp, width=self.width, n=self.n)
 
+    def _flops(self):
+        return _nufft_flops(self.ishape, self.oshape, self.coord,
+                            self.oversamp, self.width)
+
+    def _workspace_size(self):
+        return _nufft_workspace_size(self.ishape, self.oshape, self.coord,
+                                     self.oversamp)
+
 
 class NUFFTAdjoint(Linop):
     """NUFFT adjoint linear operator.
@@ -1374,12 +1701,54 @@ class NUFFTAdjoint(Linop):
         return NUFFTAdjoint(self.ishape, self.coord,
                             oversamp=self.oversamp, width=self.width, n=self.n)
 
+    def _flops(self):
+        return _nufft_flops(self.oshape, self.ishape, self.coord,
+                            self.oversamp, self.width)
+
+    def _workspace_size(self):
+        return _nufft_workspace_size(self.oshape, self.ishape, self.coord,
+                                     self.oversamp)
+
+
+def _get_nufft_grid_shape(img_shape, coord, oversamp):
+    ndim = coord.shape[-1]
+    return (list(img_shape[:-ndim]) +
+            [nufft._get_ugly_number(oversamp * i) for i in img_shape[-ndim:]])
+
+
+def _nufft_flops(img_shape, pts_shape, coord, oversamp, width):
+    ndim = coord.shape[-1]
+    grd_shape = _get_nufft_grid_shape(img_shape, coord, oversamp)
+    axes = range(-ndim, 0)
+    return (6 * util.prod(img_shape) + _fft_flops(grd_shape, axes) +
+            _interp_flops(pts_shape, coord, width))
+
+
+def _nufft_workspace_size(img_shape, pts_shape, coord, oversamp):
+    # Image copy, oversampled grid and its FFT, and non-uniform samples.
+    grd_shape = _get_nufft_grid_shape(img_shape, coord, oversamp)
+    return (util.prod(img_shape) + _fft_workspace_size(grd_shape) +
+            util.prod(pts_shape))
+
 
 class ConvolveInput(Linop):
+    """Convolution linear operator with input as the variable.
+
+    Fourier spectra of W are cached across applications, and shared with
+    the adjoint. Call refresh() after modifying W in place.
+
+    Args:
+        x_shape (tuple of ints): Input shape.
+        W (array): Filter.
+        mode (str): {'full', 'valid'}.
+        input_multi_channel (bool): Specify whether input has multiple channels.
+        output_multi_channel (bool): Specify whether output has multiple channels.
 
+    """
     def __init__(self, x_shape, W, mode='full',
                  input_multi_channel=False, output_multi_channel=False):
         self.W = W
+        self.W_cache = {}
         self.mode = mode
         self.input_multi_channel = input_multi_channel
         self.output_multi_channel = output_multi_channel
@@ -1401,19 +1770,38 @@ class ConvolveInput(Linop):
     def _apply(self, input):
         return conv.convolve(input, self.W, mode=self.mode,
                              input_multi_channel=self.input_multi_channel,
-                             output_multi_channel=self.output_multi_channel)
+                             output_multi_channel=self.output_multi_channel,
+                             W_cache=self.W_cache)
 
     def _adjoint_linop(self):
-        return ConvolveAdjointInput(self.oshape, self.W, mode=self.mode,
-                                    input_multi_channel=self.input_multi_channel,
-                                    output_multi_channel=self.output_multi_channel)
+        A = ConvolveAdjointInput(self.oshape, self.W, mode=self.mode,
+                                 input_multi_channel=self.input_multi_channel,
+                                 output_multi_channel=self.output_multi_channel)
+        A.W_cache = self.W_cache
+        return A
+
+    def refresh(self):
+        self.W_cache.clear()
 
 
 class ConvolveAdjointInput(Linop):
+    """Adjoint of convolution linear operator with input as the variable.
+
+    Fourier spectra of W are cached across applications, and shared with
+    the adjoint. Call refresh() after modifying W in place.
+
+    Args:
+        y_shape (tuple of ints): Output shape of the convolution.
+        W (array): Filter.
+        mode (str): {'full', 'valid'}.
+        input_multi_channel (bool): Specify whether input has multiple channels.
+        output_multi_channel (bool): Specify whether output has multiple channels.
 
+    """
     def __init__(self, y_shape, W, mode='full',
                  input_multi_channel=False, output_multi_channel=False):
         self.W = W
+        self.W_cache = {}
         self.mode = mode
         self.input_multi_channel = input_multi_channel
         self.output_multi_channel = output_multi_channel
@@ -1435,19 +1823,38 @@ class ConvolveAdjointInput(Linop):
     def _apply(self, input):
         return conv.convolve_adjoint_input(self.W, input, mode=self.mode,
             input_multi_channel=self.input_multi_channel,
-            output_multi_channel=self.output_multi_channel)
+            output_multi_channel=self.output_multi_channel,
+            W_cache=self.W_cache)
 
     def _adjoint_linop(self):
-        return ConvolveInput(self.oshape, self.W, mode=self.mode,
+        A = ConvolveInput(self.oshape, self.W, mode=self.mode,
             input_multi_channel=self.input_multi_channel,
             output_multi_channel=self.output_multi_channel)
+        A.W_cache = self.W_cache
+        return A
+
+    def refresh(self):
+        self.W_cache.clear()
 
 
 class ConvolveFilter(Linop):
+    """Convolution linear operator with filter as the variable.
+
+    Fourier spectra of x are cached across applications, and shared with
+    the adjoint. Call refresh() after modifying x in place.
 
+    Args:
+        W_shape (tuple of ints): Filter shape.
+        x (array): Input.
+        mode (str): {'full', 'valid'}.
+        input_multi_channel (bool): Specify whether input has multiple channels.
+        output_multi_channel (bool): Specify whether output has multiple channels.
+
+    """
     def __init__(self, W_shape, x, mode='full',
                  input_multi_channel=False, output_multi_channel=False):
         self.x = x
+        self.x_cache = {}
         self.mode = mode
         self.input_multi_channel = input_multi_channel
         self.output_multi_channel = output_multi_channel
@@ -1470,19 +1877,39 @@ class ConvolveFilter(Linop):
     def _apply(self, input):
         return conv.convolve(self.x, input, mode=self.mode,
                              input_multi_channel=self.input_multi_channel,
-                             output_multi_channel=self.output_multi_channel)
+                             output_multi_channel=self.output_multi_channel,
+                             x_cache=self.x_cache)
 
     def _adjoint_linop(self):
-        return ConvolveAdjointFilter(self.oshape, self.x, self.ndim, mode=self.mode,
-                                     input_multi_channel=self.input_multi_channel,
-                                     output_multi_channel=self.output_multi_channel)
+        A = ConvolveAdjointFilter(self.oshape, self.x, self.ndim, mode=self.mode,
+                                  input_multi_channel=self.input_multi_channel,
+                                  output_multi_channel=self.output_multi_channel)
+        A.x_cache = self.x_cache
+        return A
+
+    def refresh(self):
+        self.x_cache.clear()
 
 
 class ConvolveAdjointFilter(Linop):
+    """Adjoint of convolution linear operator with filter as the variable.
+
+    Fourier spectra of x are cached across applications, and shared with
+    the adjoint. Call refresh() after modifying x in place.
 
+    Args:
+        y_shape (tuple of ints): Output shape of the convolution.
+        x (array): Input.
+        ndim (int): Number of convolution dimensions.
+        mode (str): {'full', 'valid'}.
+        input_multi_channel (bool): Specify whether input has multiple channels.
+        output_multi_channel (bool): Specify whether output has multiple channels.
+
+    """
     def __init__(self, y_shape, x, ndim, mode='full',
                  input_multi_channel=False, output_multi_channel=False):
         self.x = x
+        self.x_cache = {}
         self.mode = mode
         self.input_multi_channel = input_multi_channel
         self.output_multi_channel = output_multi_channel
@@ -1505,9 +1932,15 @@ class ConvolveAdjointFilter(Linop):
         return conv.convolve_adjoint_filter(
             self.x, input, self.ndim, mode=self.mode,
             input_multi_channel=self.input_multi_channel,
-            output_multi_channel=self.output_multi_channel)
+            output_multi_channel=self.output_multi_channel,
+            x_cache=self.x_cache)
 
     def _adjoint_linop(self):
-        return ConvolveFilter(self.oshape, self.x, mode=self.mode,
-                              input_multi_channel=self.input_multi_channel,
-                              output_multi_channel=self.output_multi_channel)
+        A = ConvolveFilter(self.oshape, self.x, mode=self.mode,
+                           input_multi_channel=self.input_multi_channel,
+                           output_multi_channel=self.output_multi_channel)
+        A.x_cache = self.x_cache
+        return A
+
+    def refresh(self):
+        self.x_cache.clear()
@@ -2,12 +2,24 @@ import unittest
 import pickle
 import numpy as np
 import numpy.testing as npt
-from sigpy import linop, util, config
+from sigpy import comm, linop, util, config, conv
 
 if __name__ == '__main__':
     unittest.main()
 
 
+class _PendingCommunicator(object):
+    """Communicator of size 1 whose reductions are reported as pending."""
+    rank = 0
+    size = 1
+
+    def allreduce(self, input):
+        return
+
+    def iallreduce(self, input):
+        return comm.Request(lambda: None)
+
+
 def check_linop_unitary(A, dtype=np.complex, device=util.cpu_device):
 
     device = util.Device(device)
@@ -101,6 +113,17 @@ class TestLinop(unittest.TestCase):
         check_linop_adjoint(A)
         check_linop_pickleable(A)
 
+    def test_Add_input_unchanged(self):
+        shape = [4, 5]
+        R = linop.Reshape(shape, shape)
+        A = linop.AllReduce(shape, _PendingCommunicator()) * 2
+        x = util.randn(shape)
+        x_copy = x.copy()
+
+        for B, scale in [(linop.Add([A, R, R]), 4), (linop.Add([R, R, R]), 3)]:
+            npt.assert_allclose(B(x), scale * x_copy)
+            npt.assert_array_equal(x, x_copy)
+
     def test_Compose(self):
 
         shape = [5]
@@ -400,6 +423,19 @@ class TestLinop(unittest.TestCase):
         check_linop_linear(A)
         check_linop_pickleable(A)
 
+    def test_FiniteDifference(self):
+        shape = [3, 1, 4]
+        for boundary in ['periodic', 'neumann']:
+            for axes in [None, [-1], [0, 2]]:
+                A = linop.FiniteDifference(shape, axes=axes, boundary=boundary)
+                check_linop_adjoint(A)
+                check_linop_linear(A)
+                check_linop_pickleable(A)
+
+        x = util.randn(shape)
+        A = linop.FiniteDifference(shape)
+        npt.assert_allclose(A(x), [x - np.roll(x, 1, axis=a) for a in range(len(shape))])
+
     def test_Transpose(self):
 
         shape = [3, 4]
@@ -469,6 +505,31 @@ class TestLinop(unittest.TestCase):
                 check_linop_adjoint(A, device=device)
                 check_linop_pickleable(A)
 
+    def test_ConvolveInput_refresh(self):
+        x = util.randn([128, 128], dtype=np.complex)
+        W = util.randn([32, 32], dtype=np.complex)
+        y = util.randn([159, 159], dtype=np.complex)
+        A = linop.ConvolveInput(x.shape, W)
+        npt.assert_allclose(A(x), conv.convolve(x, W), atol=1e-6, rtol=1e-6)
+        npt.assert_allclose(A.H(y), conv.convolve_adjoint_input(W, y),
+                            atol=1e-6, rtol=1e-6)
+        assert A.W_cache is A.H.W_cache
+        assert len(A.W_cache) > 0
+
+        W *= 2
+        A.refresh()
+        assert len(A.W_cache) == 0
+        npt.assert_allclose(A(x), conv.convolve(x, W), atol=1e-6, rtol=1e-6)
+        npt.assert_allclose(A.H(y), conv.convolve_adjoint_input(W, y),
+                            atol=1e-6, rtol=1e-6)
+
+        B = A.H * A
+        W *= 2
+        B.refresh()
+        npt.assert_allclose(
+            B(x), conv.convolve_adjoint_input(W, conv.convolve(x, W)),
+            atol=1e-6, rtol=1e-6)
+
     def test_ConvolveFilter(self):
         devices = [util.cpu_device]
         if config.cupy_enabled:
@@ -503,3 +564,31 @@ class TestLinop(unittest.TestCase):
                 check_linop_linear(A, device=device)
                 check_linop_adjoint(A, device=device)
                 check_linop_pickleable(A)
+
+    def test_flops_workspace_bytes(self):
+        shape = [4, 8]
+        F = linop.FFT(shape)
+        M = linop.Multiply(shape, util.randn(shape))
+        R = linop.Resize([6, 8], shape)
+        self.assertEqual(F.flops(), int(5 * 32 * np.log2(32)))
+        self.assertEqual(M.flops(), 6 * 32)
+        self.assertEqual(R.flops(), 0)
+        self.assertEqual(M.workspace_bytes(np.complex64), 32 * 8)
+
+        A = R * F * M
+        self.assertEqual(A.flops(), R.flops() + F.flops() + M.flops())
+        self.assertEqual(A.workspace_bytes(),
+                         max(M.workspace_bytes(),
+                             32 * 16 + F.workspace_bytes(),
+                             32 * 16 + R.workspace_bytes()))
+
+        B = F + M
+        self.assertEqual(B.flops(), F.flops() + M.flops() + 2 * 32)
+        self.assertEqual(B.workspace_bytes(),
+                         max(F.workspace_bytes(), 32 * 16 + M.workspace_bytes()))
+
+        C = linop.Vstack([F, M])
+        self.assertEqual(C.flops(), F.flops() + M.flops())
+        self.assertEqual(C.workspace_bytes(), 64 * 16 + F.workspace_bytes())
+        self.assertEqual(C.H.workspace_bytes(),
+                         32 * 16 + max(F.H.workspace_bytes(), M.H.workspace_bytes()))
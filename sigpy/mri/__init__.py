@@ -1,5 +1,4 @@
-from sigpy.mri import app, linop, precond, sim, samp, util
-
+import importlib
 
 __all__ = [
     'app',
@@ -9,3 +8,16 @@ __all__ = [
     'samp',
     'util',
 ]
+
+
+def __getattr__(name):
+    # Submodules are imported on first access to reduce startup time.
+    if name in __all__:
+        return importlib.import_module('sigpy.mri.' + name)
+
+    raise AttributeError(
+        "module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,14 +1,12 @@
 # -*- coding: utf-8 -*-
 """MRI applications.
 """
+import multiprocessing
 import numpy as np
 import sigpy as sp
 
-from sigpy.mri import linop
-
-
-if sp.config.mpi4py_enabled:
-    from mpi4py import MPI
+from concurrent import futures
+from sigpy.mri import linop, util
 
 
 def _estimate_weights(y, weights, coord):
@@ -19,6 +17,88 @@ def _estimate_weights(y, weights, coord):
     return weights
 
 
+def _compress_weights(y, weights):
+    # Virtual coils mix all coils, so only weights shared by all coils apply.
+    if weights is None or np.ndim(weights) < y.ndim:
+        return weights
+
+    device = sp.util.get_device(weights)
+    with device:
+        if not device.xp.all(weights == weights[:1]):
+            raise ValueError('weights must be the same for all coils '
+                             'when num_virtual_coils is specified.')
+
+        return weights[0]
+
+
+def _compress_coils(y, mps, weights, num_virtual_coils):
+    if num_virtual_coils is None:
+        return y, mps, weights
+
+    weights = _compress_weights(y, weights)
+    cc_mat = util.get_cc_mat(y, num_virtual_coils)
+    y = util.coil_compress(y, cc_mat)
+    mps = util.coil_compress(mps, cc_mat, kspace=False)
+    return y, mps, weights
+
+
+def partition(comm, y, mps, coord=None, weights=None, split='coils'):
+    """Partitions k-space data across communicator ranks.
+
+    Each rank gets a contiguous range of coils or readouts. The outputs can be
+    passed to SenseRecon with comm, which sums data consistency over ranks.
+    Array-likes that read lazily when sliced, such as memory-mapped arrays or
+    dataset.ChunkedArray, are only read for the local range.
+
+    Args:
+        comm (Communicator): Communicator.
+        y (array): k-space measurements.
+        mps (array): sensitivity maps.
+        coord (None or array): coordinates.
+        weights (None or float or array): weights of shape y.shape,
+            or y.shape[1:].
+        split (str): {'coils', 'readouts'}. Readouts are split along
+            the first axis of coord, and require non-Cartesian data.
+            Time frames sharing one image, with coord of shape
+            (num_frames, ...), are split with 'readouts'. Frames with
+            separate images are independent reconstructions, and need
+            no communicator.
+
+    Returns:
+        tuple: local y, mps, coord and weights.
+
+    """
+    if split == 'coils':
+        axis = 0
+    elif split == 'readouts':
+        if coord is None:
+            raise ValueError('Splitting readouts requires coord.')
+
+        axis = 1
+    else:
+        raise ValueError('Invalid split: {split}.'.format(split=split))
+
+    n = y.shape[axis]
+    if comm.size > n:
+        raise ValueError('Cannot split {} {} across {} ranks.'.format(n, split, comm.size))
+
+    start = n * comm.rank // comm.size
+    end = n * (comm.rank + 1) // comm.size
+    y_index = (slice(None), ) * axis + (slice(start, end), )
+    y = y[y_index]
+    if split == 'coils':
+        mps = mps[start:end]
+    else:
+        coord = coord[start:end]
+
+    if weights is not None and np.ndim(weights) == np.ndim(y):
+        weights = weights[y_index]
+    elif weights is not None and np.ndim(weights) > 0 and split == 'readouts':
+        weights = weights[start:end]
+
+    return y, mps, coord, weights
+
+
 class SenseRecon(sp.app.LinearLeastSquares):
     r"""SENSE Reconstruction.
 
@@ -35,6 +115,14 @@ class SenseRecon(sp.app.LinearLeastSquares):
         weights (float or array): weights for data consistency.
         coord (None or array): coordinates.
         device (Device): device to perform reconstruction.
+        num_virtual_coils (None or int): If specified, y and mps are compressed
+            to num_virtual_coils virtual coils with SVD coil compression.
+            Weights of shape y.shape must then be the same for all coils.
+        comm (None or Communicator): If specified, y, mps, coord and weights
+            are this rank's part of the data, as given by partition.
+        max_memory (None or int): If specified, coils are processed in batches,
+            whose size is chosen from the Sense workspace estimates
+            so that temporary arrays use about max_memory bytes.
         **kwargs: Other optional arguments.
 
     References:
@@ -48,16 +136,18 @@ class SenseRecon(sp.app.LinearLeastSquares):
        
     """
     def __init__(self, y, mps, lamda=0, weights=None,
-                 coord=None, device=sp.util.cpu_device, **kwargs):
+                 coord=None, device=sp.util.cpu_device,
+                 num_virtual_coils=None, comm=None, max_memory=None, **kwargs):
         y = sp.util.move(y, device=device)
         if weights is not None:
             weights = sp.util.move(weights, device=device)
 
         weights = _estimate_weights(y, weights, coord)
-        A = linop.Sense(mps, coord=coord)
+        y, mps, weights = _compress_coils(y, mps, weights, num_virtual_coils)
+        A = linop.Sense(mps, coord=coord, max_memory=max_memory)
         x = sp.util.zeros(mps.shape[1:], dtype=y.dtype, device=device)
 
-        super().__init__(A, y, x, lamda=lamda, weights=weights, **kwargs)
+        super().__init__(A, y, x, lamda=lamda, weights=weights, comm=comm, **kwargs)
 
 
 class SenseConstrainedRecon(sp.app.L2ConstrainedMinimization):
@@ -118,6 +208,9 @@ class L1WaveletRecon(sp.app.LinearLeastSquares):
         coord (None or array): coordinates.
         wave_name (str): wavelet name.
         device (Device): device to perform reconstruction.
+        num_virtual_coils (None or int): If specified, y and mps are compressed
+            to num_virtual_coils virtual coils with SVD coil compression.
+            Weights of shape y.shape must then be the same for all coils.
         **kwargs: Other optional arguments.
 
     References:
@@ -128,12 +221,14 @@ class L1WaveletRecon(sp.app.LinearLeastSquares):
     """
     def __init__(self, y, mps, lamda,
                  weights=None, coord=None,
-                 wave_name='db4', device=sp.util.cpu_device, **kwargs):
+                 wave_name='db4', device=sp.util.cpu_device,
+                 num_virtual_coils=None, **kwargs):
         y = sp.util.move(y, device=device)
         if weights is not None:
             weights = sp.util.move(weights, device=device)
 
         weights = _estimate_weights(y, weights, coord)
+        y, mps, weights = _compress_coils(y, mps, weights, num_virtual_coils)
 
         A = linop.Sense(mps, coord=coord)
         img_shape = mps.shape[1:]
@@ -212,7 +307,11 @@ class TotalVariationRecon(sp.app.LinearLeastSquares):
         weights (float or array): weights for data consistency.
         coord (None or array): coordinates.
         device (Device): device to perform reconstruction.
-        **kwargs: Other optional arguments.
+        num_virtual_coils (None or int): If specified, y and mps are compressed
+            to num_virtual_coils virtual coils with SVD coil compression.
+            Weights of shape y.shape must then be the same for all coils.
+        **kwargs: Other optional arguments. If alg_name is 'GradientMethod',
+            the TV proximal operator is used directly, without dual variables.
 
     References:
         Block, K. T., Uecker, M., & Frahm, J. (2007).
@@ -222,24 +321,38 @@ class TotalVariationRecon(sp.app.LinearLeastSquares):
 
     """
     def __init__(self, y, mps, lamda,
-                 weights=None, coord=None, device=sp.util.cpu_device, **kwargs):
+                 weights=None, coord=None, device=sp.util.cpu_device,
+                 num_virtual_coils=None, **kwargs):
         y = sp.util.move(y, device=device)
         if weights is not None:
             weights = sp.util.move(weights, device=device)
 
         weights = _estimate_weights(y, weights, coord)
+        y, mps, weights = _compress_coils(y, mps, weights, num_virtual_coils)
 
         A = linop.Sense(mps, coord=coord)
         x = sp.util.zeros(mps.shape[1:], dtype=y.dtype, device=device)
 
         G = sp.linop.Gradient(A.ishape)
-        proxg = sp.prox.L1Reg(G.oshape, lamda)
+        if kwargs.get('alg_name') == 'GradientMethod':
+            proxg = sp.prox.TotalVariation(A.ishape, lamda, boundary='periodic')
+            D = G
 
-        def g(x):
-            device = sp.util.get_device(x)
-            xp = device.xp
-            with device:
-                return lamda * xp.sum(xp.abs(x))
+            def g(x):
+                device = sp.util.get_device(x)
+                xp = device.xp
+                with device:
+                    return lamda * xp.sum(xp.abs(D(x)))
+
+            G = None
+        else:
+            proxg = sp.prox.L1Reg(G.oshape, lamda)
+
+            def g(x):
+                device = sp.util.get_device(x)
+                xp = device.xp
+                with device:
+                    return lamda * xp.sum(xp.abs(x))
 
         super().__init__(A, y, x, proxg=proxg, g=g, G=G, weights=weights, **kwargs)
 
@@ -286,6 +399,142 @@ class TotalVariationConstrainedRecon(sp.app.L2ConstrainedMinimization):
         super().__init__(A, y, x, proxg, eps, G=G, weights=weights, **kwargs)
 
 
+def _slice_recon(recon_app, y, mps, args, kwargs):
+    return recon_app(y, mps, *args, show_pbar=False, **kwargs).run()
+
+
+class _SliceAlg(sp.alg.Alg):
+
+    def __init__(self, update_batch, num_batches):
+        self.update_batch = update_batch
+        super().__init__(num_batches, sp.util.cpu_device)
+
+    def _update(self):
+        self.update_batch(self.iter)
+
+
+class SliceRecon(sp.app.App):
+    r"""Slice-by-slice reconstruction for Cartesian data with fully sampled readout.
+
+    Inverse Fourier transforms k-space along the readout axis,
+    which decouples the problem into independent problems of one less
+    dimension, one for each readout position. These are solved with
+    recon_app in batches of num_workers slices in parallel,
+    and reassembled into the volume.
+
+    Args:
+        recon_app (class): Reconstruction App taking y and mps as its first
+            two arguments, such as SenseRecon or L1WaveletRecon.
+        y (array): Cartesian k-space measurements.
+        mps (array): sensitivity maps.
+        *args: Other positional arguments of recon_app, such as lamda.
+        axis (int): readout axis of y and mps.
+        num_workers (int): Number of slices solved in parallel.
+        use_processes (bool): Solve slices in a process pool instead
+            of a thread pool.
+        mp_context (None or multiprocessing context): Context used to start
+            worker processes. Default: the spawn context, as forked workers
+            inherit the thread pools of parallel numba kernels.
+        show_pbar (bool): toggle whether show progress bar.
+        **kwargs: Other keyword arguments of recon_app. Arrays spanning
+            the readout axis, aligned to the trailing axes of y,
+            are sliced along it. weights must be constant along
+            the readout axis, as it is applied before the inverse
+            Fourier transform.
+
+    """
+    def __init__(self, recon_app, y, mps, *args, axis=-1, num_workers=1,
+                 use_processes=False, mp_context=None, show_pbar=True, **kwargs):
+        self.recon_app = recon_app
+        self.mps = mps
+        self.args = args
+        self.axis = axis % y.ndim
+        self.num_workers = num_workers
+        self.use_processes = use_processes
+        if mp_context is None:
+            mp_context = multiprocessing.get_context('spawn')
+
+        self.mp_context = mp_context
+        self.kwargs = kwargs
+        self.executor = None
+        if self.axis == 0:
+            raise ValueError('axis cannot be the coil axis.')
+
+        self.kwargs_axis = self.axis - y.ndim
+        weights = kwargs.get('weights')
+        if np.ndim(weights) >= -self.kwargs_axis:
+            xp = sp.util.get_xp(weights)
+            if not xp.all(weights == weights.take([0], axis=self.kwargs_axis)):
+                raise ValueError('weights must be constant along the readout axis.')
+
+        device = sp.util.get_device(y)
+        with device:
+            self.y = sp.fft.ifft(y, axes=[self.axis])
+
+        self.img_shape = mps.shape[1:]
+        self.num_slices = self.img_shape[self.axis - 1]
+        self.x = sp.util.empty(self.img_shape, dtype=y.dtype, device=device)
+
+        num_batches = (self.num_slices + num_workers - 1) // num_workers
+        alg = _SliceAlg(self._update_batch, num_batches)
+        super().__init__(alg, show_pbar=show_pbar)
+
+    def _init(self):
+        if self.num_workers > 1:
+            if self.use_processes:
+                self.executor = futures.ProcessPoolExecutor(
+                    self.num_workers, mp_context=self.mp_context)
+            else:
+                self.executor = futures.ThreadPoolExecutor(self.num_workers)
+
+    def _get_slice(self, input, i):
+        device = sp.util.get_device(input)
+        with device:
+            return device.xp.ascontiguousarray(input.take(i, axis=self.axis))
+
+    def _get_kwargs_slice(self, i):
+        kwargs = {}
+        for key, value in self.kwargs.items():
+            if np.ndim(value) >= -self.kwargs_axis:
+                if value.shape[self.kwargs_axis] == 1:
+                    value = value.take(0, axis=self.kwargs_axis)
+                else:
+                    value = value.take(i, axis=self.kwargs_axis)
+
+            kwargs[key] = value
+
+        return kwargs
+
+    def _update_batch(self, b):
+        slices = range(b * self.num_workers,
+                       min((b + 1) * self.num_workers, self.num_slices))
+        jobs = [(self.recon_app, self._get_slice(self.y, i), self._get_slice(self.mps, i),
+                 self.args, self._get_kwargs_slice(i)) for i in slices]
+
+        if self.num_workers > 1:
+            results = [self.executor.submit(_slice_recon, *job) for job in jobs]
+            results = [result.result() for result in results]
+        else:
+            results = [_slice_recon(*job) for job in jobs]
+
+        device = sp.util.get_device(self.x)
+        with device:
+            for i, x_i in zip(slices, results):
+                idx = (slice(None), ) * (self.axis - 1) + (i, )
+                self.x[idx] = sp.util.move(x_i, device)
+
+    def run(self):
+        try:
+            return super().run()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+    def _output(self):
+        return self.x
+
+
 class JsenseRecon(sp.app.App):
     r"""JSENSE reconstruction.
 
@@ -306,6 +555,11 @@ class JsenseRecon(sp.app.App):
         coord (None or array): coordinates.
         max_iter (int): Maximum number of iterations.
         max_inner_iter (int): Maximum number of inner iterations.
+        num_virtual_coils (None or int): If specified, calibration data are
+            compressed to num_virtual_coils virtual coils with SVD coil compression.
+            The compression matrix is stored as the cc_mat attribute,
+            and the estimated maps correspond to the virtual coils.
+            Weights of shape y.shape must then be the same for all coils.
 
     References:
         Ying, L., & Sheng, J. (2007).
@@ -322,7 +576,7 @@ class JsenseRecon(sp.app.App):
                  mps_ker_width=16, ksp_calib_width=24,
                  lamda=0, device=sp.util.cpu_device,
                  weights=None, coord=None, max_iter=10,
-                 max_inner_iter=10, show_pbar=True):
+                 max_inner_iter=10, num_virtual_coils=None, show_pbar=True):
         self.y = y
         self.mps_ker_width = mps_ker_width
         self.ksp_calib_width = ksp_calib_width
@@ -331,6 +585,7 @@ class JsenseRecon(sp.app.App):
         self.coord = coord
         self.max_iter = max_iter
         self.max_inner_iter = max_inner_iter
+        self.num_virtual_coils = num_virtual_coils
 
         self.device = sp.util.Device(device)
         self.dtype = y.dtype
@@ -342,6 +597,9 @@ class JsenseRecon(sp.app.App):
         super().__init__(self.alg, show_pbar=show_pbar)
 
     def _get_data(self):
+        if self.num_virtual_coils is not None:
+            self.weights = _compress_weights(self.y, self.weights)
+
         if self.coord is None:
             self.img_shape = self.y.shape[1:]
             ndim = len(self.img_shape)
@@ -362,6 +620,13 @@ class JsenseRecon(sp.app.App):
             if self.weights is not None:
                 self.weights = self.weights[calib_idx]
 
+        if self.num_virtual_coils is None:
+            self.cc_mat = None
+        else:
+            self.cc_mat = util.get_cc_mat(self.y, self.num_virtual_coils)
+            self.y = util.coil_compress(self.y, self.cc_mat)
+            self.num_coils = self.num_virtual_coils
+
         self.y = self.y / np.abs(self.y).max()
         self.y = sp.util.move(self.y, self.device)
         if self.coord is not None:
@@ -1,14 +1,48 @@
+import multiprocessing
 import unittest
 import numpy as np
 import sigpy as sp
 import numpy.testing as npt
 
-from sigpy.mri import app, sim
+from sigpy.mri import app, linop, samp, sim, util
 
 if __name__ == '__main__':
     unittest.main()
 
 
+def _distributed_SenseRecon_worker(comm, ksp, mps, coord, split, alg_names, queue):
+    ksp, mps, coord, _ = app.partition(comm, ksp, mps, coord=coord, split=split)
+    img_recs = [app.SenseRecon(ksp, mps, coord=coord, alg_name=alg_name, max_iter=1000,
+                               comm=comm, show_pbar=False).run()
+                for alg_name in alg_names]
+
+    queue.put((comm.rank, img_recs))
+    comm.close()
+
+
+def _run_distributed_SenseRecon(ksp, mps, coord, split, alg_names, size=2):
+    # Forking after numba kernels have run is unsafe, so workers are spawned.
+    ctx = multiprocessing.get_context('spawn')
+    comms = sp.comm.SharedMemoryCommunicator.create(size, context=ctx)
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=_distributed_SenseRecon_worker,
+                         args=(comm, ksp, mps, coord, split, alg_names, queue))
+             for comm in comms]
+    try:
+        for p in procs:
+            p.start()
+
+        results = [queue.get(timeout=300) for _ in range(size)]
+    finally:
+        for p in procs:
+            p.terminate()
+            p.join()
+
+        comms[0].unlink()
+
+    return [img_recs for rank, img_recs in sorted(results, key=lambda r: r[0])]
+
+
 class TestApp(unittest.TestCase):
 
     def shepp_logan_setup(self):
@@ -40,6 +74,100 @@ class TestApp(unittest.TestCase):
             ksp, mps, lamda, alg_name='PrimalDualHybridGradient', max_iter=1000).run()
         npt.assert_allclose(img, img_rec, atol=1e-3, rtol=1e-3)
 
+    def test_shepp_logan_SenseRecon_num_virtual_coils(self):
+        img, mps, ksp = self.shepp_logan_setup()
+        lamda = 0
+
+        img_rec = app.SenseRecon(
+            ksp, mps, lamda, num_virtual_coils=len(mps),
+            alg_name='ConjugateGradient').run()
+        npt.assert_allclose(img, img_rec, atol=1e-3, rtol=1e-3)
+
+        weights = np.broadcast_to(abs(ksp[0]) > 0, ksp.shape).astype(np.float)
+        for recon_app in [app.SenseRecon, app.L1WaveletRecon, app.TotalVariationRecon]:
+            with self.subTest(recon_app=recon_app):
+                img_rec = recon_app(
+                    ksp, mps, lamda, weights=weights,
+                    num_virtual_coils=len(mps), max_iter=500).run()
+                npt.assert_allclose(img, img_rec, atol=1e-2, rtol=1e-2)
+
+                weights_coil = weights.copy()
+                weights_coil[0] *= 2
+                with self.assertRaises(ValueError):
+                    recon_app(ksp, mps, lamda, weights=weights_coil,
+                              num_virtual_coils=len(mps))
+
+        mps_rec = app.JsenseRecon(ksp, weights=weights, ksp_calib_width=6,
+                                  num_virtual_coils=len(mps)).run()
+        self.assertEqual(mps_rec.shape, mps.shape)
+
+    def test_shepp_logan_SenseRecon_comm(self):
+        img, mps, ksp = self.shepp_logan_setup()
+        alg_names = ['ConjugateGradient', 'GradientMethod', 'PrimalDualHybridGradient']
+        results = _run_distributed_SenseRecon(ksp, mps, None, 'coils', alg_names)
+        for img_recs in results:
+            for img_rec in img_recs:
+                npt.assert_allclose(img, img_rec, atol=1e-3, rtol=1e-3)
+
+        npt.assert_allclose(results[0], results[1])
+
+    def test_SenseRecon_comm_readouts(self):
+        img_shape = [6, 6]
+        mps = sim.birdcage_maps([4] + img_shape)
+        img = sim.shepp_logan(img_shape)
+        coord = samp.radial([12, 8, 2], img_shape)
+        ksp = linop.Sense(mps, coord=coord)(img)
+
+        img_rec = app.SenseRecon(ksp, mps, coord=coord, alg_name='ConjugateGradient',
+                                 max_iter=1000, show_pbar=False).run()
+        results = _run_distributed_SenseRecon(ksp, mps, coord, 'readouts',
+                                              ['ConjugateGradient'])
+        for img_recs in results:
+            npt.assert_allclose(img_recs[0], img_rec, atol=1e-6, rtol=1e-6)
+
+    def test_shepp_logan_SliceRecon(self):
+        img_shape = [6, 6, 6]
+        mps_shape = [4, 6, 6, 6]
+
+        img = sim.shepp_logan(img_shape)
+        mps = sim.birdcage_maps(mps_shape)
+
+        mask = np.zeros(img_shape)
+        mask[:, ::2, :] = 1
+
+        ksp = mask * sp.fft.fft(mps * img, axes=[-3, -2, -1])
+        lamda = 0
+
+        for axis, num_workers in [(-1, 1), (1, 4)]:
+            img_rec = app.SliceRecon(
+                app.SenseRecon, ksp, mps, lamda, axis=axis, num_workers=num_workers,
+                alg_name='ConjugateGradient').run()
+            npt.assert_allclose(img, img_rec, atol=1e-3, rtol=1e-3)
+
+            img_rec = app.SliceRecon(
+                app.SenseRecon, ksp, mps, lamda, axis=axis, num_workers=num_workers,
+                weights=mask, alg_name='ConjugateGradient').run()
+            npt.assert_allclose(img, img_rec, atol=1e-3, rtol=1e-3)
+
+        img_rec = app.SliceRecon(
+            app.SenseRecon, ksp, mps, lamda, num_workers=2, use_processes=True,
+            alg_name='ConjugateGradient', show_pbar=False).run()
+        npt.assert_allclose(img, img_rec, atol=1e-3, rtol=1e-3)
+
+        weights = np.ones(img_shape)
+        weights[..., 0] = 2
+        with self.assertRaises(ValueError):
+            app.SliceRecon(app.SenseRecon, ksp, mps, lamda, weights=weights)
+
+        def failing_app(y, mps, show_pbar=True):
+            raise RuntimeError
+
+        slice_app = app.SliceRecon(failing_app, ksp, mps, num_workers=2, show_pbar=False)
+        with self.assertRaises(RuntimeError):
+            slice_app.run()
+
+        self.assertIsNone(slice_app.executor)
+
     def test_shepp_logan_SenseConstrainedRecon(self):
         img, mps, ksp = self.shepp_logan_setup()
         std = 0
@@ -73,6 +201,10 @@ class TestApp(unittest.TestCase):
 
         npt.assert_allclose(img, img_rec, atol=1e-3, rtol=1e-3)
 
+        img_rec = app.TotalVariationRecon(ksp, mps, lamda, alg_name='GradientMethod',
+                                          max_iter=1000).run()
+        npt.assert_allclose(img, img_rec, atol=1e-3, rtol=1e-3)
+
     def test_shepp_logan_TotalVariationConstrainedRecon(self):
         img, mps, ksp = self.shepp_logan_setup()
         std = 0
@@ -92,3 +224,10 @@ class TestApp(unittest.TestCase):
         mps_rec = _app.run()
 
         npt.assert_allclose(mps, mps_rec, atol=1e-3, rtol=1e-3)
+
+        _app = app.JsenseRecon(ksp, mps_ker_width=6, ksp_calib_width=6,
+                               num_virtual_coils=len(mps))
+        mps_rec = _app.run()
+
+        mps_cc = util.coil_compress(mps, _app.cc_mat, kspace=False)
+        npt.assert_allclose(mps_cc, mps_rec, atol=1e-3, rtol=1e-3)
@@ -1,30 +1,32 @@
 # -*- coding: utf-8 -*-
 """MRI linear operators.
 """
+import numpy as np
 import sigpy as sp
 
 
-def Sense(mps, coord=None, ishape=None, coil_batch_size=None):
+def Sense(mps, coord=None, ishape=None, coil_batch_size=None, max_memory=None):
     """Sense linear operator.
     
     Args:
         mps (array): sensitivity maps of length = number of channels.
         coord (None or array): coordinates.
+        ishape (None or tuple of ints): Input shape. Default: mps.shape[1:].
+        coil_batch_size (None or int): If specified, coils are processed
+            in batches of coil_batch_size with SenseChunked.
+        max_memory (None or int): If specified, coils are processed
+            in batches with SenseChunked, such that temporary arrays
+            use about max_memory bytes.
+
     """
+    if coil_batch_size is not None or max_memory is not None:
+        return SenseChunked(mps, coord=coord, ishape=ishape,
+                            coil_batch_size=coil_batch_size, max_memory=max_memory)
 
     img_ndim = mps.ndim - 1
     if ishape is None:
         ishape = mps.shape[1:]
 
-    num_coils = len(mps)
-    if coil_batch_size is None:
-        coil_batch_size = num_coils
-
-    if coil_batch_size < len(mps):
-        num_coil_batches = (num_coils + coil_batch_size - 1) // coil_batch_size
-        return sp.linop.Vstack([Sense(mps[c::num_coil_batches], coord=coord, ishape=ishape)
-                                for c in range(num_coil_batches)], axis=0)
-
     S = sp.linop.Multiply(ishape, mps)
     if coord is None:
         F = sp.linop.FFT(S.oshape, axes=range(-img_ndim, 0))
@@ -37,6 +39,174 @@ def Sense(mps, coord=None, ishape=None, coil_batch_size=None):
     return A
 
 
+def _get_coil_batch_size(mps, coord=None, max_memory=None):
+    """Number of coils whose temporaries fit in max_memory bytes.
+
+    Uses the workspace estimates of the Sense operator and its adjoint
+    for a single coil.
+    """
+    num_coils = len(mps)
+    if max_memory is None:
+        return num_coils
+
+    A = Sense(mps[:1], coord=coord)
+    dtype = np.result_type(mps.dtype, np.complex64)
+    coil_bytes = max(A.workspace_bytes(dtype), A.H.workspace_bytes(dtype))
+    coil_batch_size = int(max_memory // coil_bytes)
+
+    return min(max(coil_batch_size, 1), num_coils)
+
+
+class SenseChunked(sp.linop.Linop):
+    """Sense linear operator that processes coils in batches.
+
+    Multiplication by sensitivity maps and Fourier transform are fused for
+    each batch of coils, so that only batch-sized temporaries are created.
+
+    Args:
+        mps (array): sensitivity maps of length = number of channels.
+        coord (None or array): coordinates.
+        ishape (None or tuple of ints): Input shape. Must have the same
+            size as mps.shape[1:]. Default: mps.shape[1:].
+        coil_batch_size (None or int): Number of coils per batch.
+        max_memory (None or int): Approximate memory in bytes for
+            temporary arrays. Used if coil_batch_size is None.
+
+    """
+    def __init__(self, mps, coord=None, ishape=None,
+                 coil_batch_size=None, max_memory=None):
+        self.mps = mps
+        self.coord = coord
+        self.img_shape = list(mps.shape[1:])
+        if ishape is None:
+            ishape = self.img_shape
+
+        if sp.util.prod(ishape) != sp.util.prod(self.img_shape):
+            raise ValueError('ishape must have the same size as mps.shape[1:], '
+                             'got {ishape}.'.format(ishape=ishape))
+
+        if coil_batch_size is None:
+            coil_batch_size = _get_coil_batch_size(mps, coord=coord, max_memory=max_memory)
+
+        self.coil_batch_size = coil_batch_size
+
+        num_coils = len(mps)
+        if coord is None:
+            oshape = [num_coils] + self.img_shape
+        else:
+            oshape = [num_coils] + list(coord.shape[:-1])
+
+        super().__init__(oshape, ishape, repr_str='Sense')
+
+    def _apply(self, input):
+        device = sp.util.get_device(input)
+        xp = device.xp
+        img_ndim = len(self.img_shape)
+        num_coils = len(self.mps)
+        with device:
+            input = input.reshape(self.img_shape)
+            output = xp.empty(self.oshape,
+                              dtype=np.result_type(input.dtype, self.mps.dtype))
+            for c in range(0, num_coils, self.coil_batch_size):
+                mps_c = sp.util.move(self.mps[c:c + self.coil_batch_size], device)
+                img_c = mps_c * input
+                if self.coord is None:
+                    output[c:c + self.coil_batch_size] = sp.fft.fft(
+                        img_c, axes=range(-img_ndim, 0))
+                else:
+                    coord = sp.util.move(self.coord, device)
+                    output[c:c + self.coil_batch_size] = sp.nufft.nufft(img_c, coord)
+
+            return output
+
+    def _adjoint_linop(self):
+        return SenseChunkedAdjoint(self.mps, coord=self.coord, oshape=self.ishape,
+                                   coil_batch_size=self.coil_batch_size)
+
+    def _flops(self):
+        return Sense(self.mps, coord=self.coord)._flops()
+
+    def _workspace_size(self):
+        A = Sense(self.mps[:self.coil_batch_size], coord=self.coord)
+        return sp.util.prod(self.oshape) + A._workspace_size()
+
+
+class SenseChunkedAdjoint(sp.linop.Linop):
+    """Sense adjoint linear operator that processes coils in batches.
+
+    Inverse Fourier transform and multiplication by conjugated sensitivity
+    maps are fused for each batch of coils, and accumulated to the output.
+
+    Args:
+        mps (array): sensitivity maps of length = number of channels.
+        coord (None or array): coordinates.
+        oshape (None or tuple of ints): Output shape. Must have the same
+            size as mps.shape[1:]. Default: mps.shape[1:].
+        coil_batch_size (None or int): Number of coils per batch.
+        max_memory (None or int): Approximate memory in bytes for
+            temporary arrays. Used if coil_batch_size is None.
+
+    """
+    def __init__(self, mps, coord=None, oshape=None,
+                 coil_batch_size=None, max_memory=None):
+        self.mps = mps
+        self.coord = coord
+        self.img_shape = list(mps.shape[1:])
+        if oshape is None:
+            oshape = self.img_shape
+
+        if sp.util.prod(oshape) != sp.util.prod(self.img_shape):
+            raise ValueError('oshape must have the same size as mps.shape[1:], '
+                             'got {oshape}.'.format(oshape=oshape))
+
+        if coil_batch_size is None:
+            coil_batch_size = _get_coil_batch_size(mps, coord=coord, max_memory=max_memory)
+
+        self.coil_batch_size = coil_batch_size
+
+        num_coils = len(mps)
+        if coord is None:
+            ishape = [num_coils] + self.img_shape
+        else:
+            ishape = [num_coils] + list(coord.shape[:-1])
+
+        super().__init__(oshape, ishape, repr_str='SenseAdjoint')
+
+    def _apply(self, input):
+        device = sp.util.get_device(input)
+        xp = device.xp
+        img_ndim = len(self.img_shape)
+        num_coils = len(self.mps)
+        with device:
+            output = xp.zeros(self.img_shape,
+                              dtype=np.result_type(input.dtype, self.mps.dtype))
+            for c in range(0, num_coils, self.coil_batch_size):
+                input_c = input[c:c + self.coil_batch_size]
+                if self.coord is None:
+                    img_c = sp.fft.ifft(input_c, axes=range(-img_ndim, 0))
+                else:
+                    coord = sp.util.move(self.coord, device)
+                    img_c = sp.nufft.nufft_adjoint(
+                        input_c, coord, oshape=[len(input_c)] + self.img_shape)
+
+                mps_c = sp.util.move(self.mps[c:c + self.coil_batch_size], device)
+                img_c *= xp.conj(mps_c)
+                output += xp.sum(img_c, axis=0)
+
+            return output.reshape(self.oshape)
+
+    def _adjoint_linop(self):
+        return SenseChunked(self.mps, coord=self.coord, ishape=self.oshape,
+                            coil_batch_size=self.coil_batch_size)
+
+    def _flops(self):
+        return Sense(self.mps, coord=self.coord).H._flops()
+
+    def _workspace_size(self):
+        A = Sense(self.mps[:self.coil_batch_size], coord=self.coord)
+        return sp.util.prod(self.oshape) + A.H._workspace_size()
+
+
 def ConvSense(img_ker_shape, mps_ker, coord=None):
     """Convolution linear operator with sensitivity maps kernel in k-space.
     
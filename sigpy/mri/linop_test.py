@@ -43,3 +43,39 @@ class TestLinop(unittest.TestCase):
         check_linop_adjoint(A)
         npt.assert_allclose(sp.fft.fft(img * mps, axes=[-1, -2]).ravel(),
                             (A * img).ravel(), atol=2, rtol=2)
+
+    def test_sense_chunked_model(self):
+        img_shape = [16, 16]
+        mps_shape = [8, 16, 16]
+
+        img = sp.util.randn(img_shape)
+        mps = sp.util.randn(mps_shape)
+
+        y, x = np.mgrid[:16, :16]
+        coord = np.stack([np.ravel(y - 8), np.ravel(x - 8)], axis=1).astype(np.float)
+
+        for c in [None, coord]:
+            A = linop.Sense(mps, coord=c)
+            ksp = sp.util.randn(A.oshape)
+            for kwargs in [{'coil_batch_size': 3}, {'max_memory': 2**14}]:
+                A_chunked = linop.Sense(mps, coord=c, **kwargs)
+                check_linop_adjoint(A_chunked)
+                npt.assert_allclose(A_chunked * img, A * img)
+                npt.assert_allclose(A_chunked.H * ksp, A.H * ksp)
+
+    def test_sense_chunked_model_real_input(self):
+        img_shape = [16, 16]
+        mps_shape = [8, 16, 16]
+
+        img = sp.util.randn(img_shape, dtype=np.float)
+        mps = sp.util.randn(mps_shape)
+
+        y, x = np.mgrid[:16, :16]
+        coord = np.stack([np.ravel(y - 8), np.ravel(x - 8)], axis=1).astype(np.float)
+
+        for c in [None, coord]:
+            A = linop.Sense(mps, coord=c)
+            ksp = sp.util.randn(A.oshape, dtype=np.float)
+            A_chunked = linop.Sense(mps, coord=c, coil_batch_size=3)
+            npt.assert_allclose(A_chunked * img, A * img.astype(np.complex))
+            npt.assert_allclose(A_chunked.H * ksp, A.H * ksp)
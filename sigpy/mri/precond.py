@@ -1,12 +1,78 @@
 # -*- coding: utf-8 -*-
 """MRI preconditioners.
 """
-
+import collections
+import hashlib
+import os
+import tempfile
 import numpy as np
 import sigpy as sp
 
 
-def kspace_precond(mps, weights=None, coord=None, lamda=0, device=sp.util.cpu_device):
+_cache = collections.OrderedDict()
+_cache_size = 4
+
+
+def _hash(*inputs):
+    h = hashlib.sha1()
+    for input in inputs:
+        if input is None or np.isscalar(input):
+            h.update(repr(input).encode())
+        else:
+            input = np.ascontiguousarray(sp.util.move(input))
+            h.update(repr((input.shape, input.dtype.str)).encode())
+            h.update(input.view(np.uint8))
+
+    return h.hexdigest()
+
+
+def _cached(func, mps, weights, coord, lamda, device, cache, cache_dir):
+    """Calls func, with results optionally cached in memory and on disk.
+
+    Results are keyed by hashes of mps, weights, coord and lamda.
+    If cache is True, the most recent _cache_size results are kept in memory.
+
+    """
+    device = sp.util.Device(device)
+    if not cache and cache_dir is None:
+        return func(mps, weights=weights, coord=coord, lamda=lamda, device=device)
+
+    key = func.__name__.lstrip('_') + '_' + _hash(mps, weights, coord, lamda)
+    path = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, key + '.npy')
+
+    if cache and (key, device.id) in _cache:
+        _cache.move_to_end((key, device.id))
+        p = _cache[key, device.id]
+    else:
+        if path is not None and os.path.exists(path):
+            p = sp.util.move(np.load(path), device)
+        else:
+            p = func(mps, weights=weights, coord=coord, lamda=lamda, device=device)
+
+        if cache:
+            _cache[key, device.id] = p
+            if len(_cache) > _cache_size:
+                _cache.popitem(last=False)
+
+    if path is not None and not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.npy',
+                                         delete=False) as f:
+            np.save(f, sp.util.move(p))
+
+        os.replace(f.name, path)
+
+    if not cache:
+        return p
+
+    with device:
+        return p.copy()
+
+
+def kspace_precond(mps, weights=None, coord=None, lamda=0,
+                   device=sp.util.cpu_device, cache=False, cache_dir=None):
     """Compute a diagonal preconditioner in k-space.
 
     Considers the optimization problem:
@@ -18,10 +84,20 @@ def kspace_precond(mps, weights=None, coord=None, lamda=0, device=sp.util.cpu_de
         weights (array): k-space weights.
         coord (array): k-space coordinates of shape [...] + [ndim].
         lamda (float): regularization.
+        device (Device): device to compute preconditioner.
+        cache (bool): Toggle whether to cache preconditioners in memory,
+            keyed by hashes of the inputs.
+        cache_dir (None or str): If specified, preconditioners are also
+            cached on disk in this directory.
 
     Returns:
         array: k-space preconditioner of same shape as k-space.
     """
+    return _cached(_kspace_precond, mps, weights, coord, lamda, device,
+                   cache, cache_dir)
+
+
+def _kspace_precond(mps, weights=None, coord=None, lamda=0, device=sp.util.cpu_device):
     dtype = mps.dtype
 
     if weights is not None:
@@ -57,8 +133,7 @@ def kspace_precond(mps, weights=None, coord=None, lamda=0, device=sp.util.cpu_de
             psf = sp.nufft.nufft_adjoint(ones, coord2, img2_shape)
 
         mps = sp.util.move(mps, device)
-        mps_ij = mps * xp.conj(mps.reshape([num_coils, 1] + img_shape))
-        xcorr_fourier = xp.sum(xp.abs(sp.fft.fft(mps_ij, [num_coils, num_coils] + img2_shape, axes=range(-ndim, 0)))**2, axis=0)
+        xcorr_fourier = _get_xcorr_fourier(mps, img2_shape)
         xcorr = sp.fft.ifft(xcorr_fourier, axes=range(-ndim, 0))
         xcorr *= psf
         
@@ -80,7 +155,8 @@ def kspace_precond(mps, weights=None, coord=None, lamda=0, device=sp.util.cpu_de
         return p.astype(dtype)
 
 
-def circulant_precond(mps, weights=None, coord=None, lamda=0, device=sp.util.cpu_device):
+def circulant_precond(mps, weights=None, coord=None, lamda=0,
+                      device=sp.util.cpu_device, cache=False, cache_dir=None):
     """Compute circulant preconditioner.
 
     Considers the optimization problem:
@@ -92,11 +168,78 @@ def circulant_precond(mps, weights=None, coord=None, lamda=0, device=sp.util.cpu
         weights (array): k-space weights.
         coord (array): k-space coordinates of shape [...] + [ndim].
         lamda (float): regularization.
+        device (Device): device to compute preconditioner.
+        cache (bool): Toggle whether to cache preconditioners in memory,
+            keyed by hashes of the inputs.
+        cache_dir (None or str): If specified, preconditioners are also
+            cached on disk in this directory.
 
     Returns:
         array: circulant preconditioner of image shape.
 
     """
+    return _cached(_circulant_precond, mps, weights, coord, lamda, device,
+                   cache, cache_dir)
+
+
+def _reflect(input, axes):
+    """Returns input[-k] for each index k along axes, modulo the axis length."""
+    xp = sp.util.get_xp(input)
+    for a in axes:
+        input = xp.roll(xp.flip(input, axis=a), 1, axis=a)
+
+    return input
+
+
+def _power_spectrum(input, shape, real=False):
+    """Computes abs(fftn(input))**2 zero-padded to shape over the last axes.
+
+    If real is True, input is assumed real, and the spectrum is computed with
+    a real FFT, then extended by its Hermitian symmetry.
+
+    """
+    ndim = len(shape)
+    xp = sp.util.get_xp(input)
+    axes = range(-ndim, 0)
+    if not real:
+        return xp.abs(xp.fft.fftn(input, s=shape, axes=axes, norm='ortho'))**2
+
+    half = xp.abs(xp.fft.rfftn(xp.real(input), s=shape, axes=axes, norm='ortho'))**2
+    n = shape[-1]
+    output = xp.empty(input.shape[:-ndim] + tuple(shape), dtype=half.dtype)
+    output[..., :n // 2 + 1] = half
+    output[..., n // 2 + 1:] = _reflect(
+        half[..., 1:(n + 1) // 2], range(-ndim, -1))[..., ::-1]
+    return output
+
+
+def _get_xcorr_fourier(mps, img2_shape):
+    """Computes sum_i abs(fft(mps_j * conj(mps_i)))**2 for each coil j.
+
+    Only pairs with i <= j are transformed, as the spectrum of pair (j, i)
+    is that of pair (i, j) reflected. Contributions to coil i from pairs
+    (i, j) are accumulated, and reflected once at the end.
+    Diagonal pairs are real, and use real FFTs.
+
+    """
+    ndim = len(img2_shape)
+    num_coils = len(mps)
+    xp = sp.util.get_xp(mps)
+    real = np.issubdtype(mps.dtype, np.floating)
+
+    xcorr_fourier = _power_spectrum(xp.abs(mps)**2, img2_shape, real=True)
+    xcorr_fourier_t = xp.zeros_like(xcorr_fourier)
+    for i in range(num_coils - 1):
+        mps_ij = mps[i + 1:] * xp.conj(mps[i])
+        mps_ij = _power_spectrum(mps_ij, img2_shape, real=real)
+        xcorr_fourier[i + 1:] += mps_ij
+        xcorr_fourier_t[i] += xp.sum(mps_ij, axis=0)
+
+    xcorr_fourier += _reflect(xcorr_fourier_t, range(-ndim, 0))
+    return xp.fft.fftshift(xcorr_fourier, axes=range(-ndim, 0))
+
+
+def _circulant_precond(mps, weights=None, coord=None, lamda=0, device=sp.util.cpu_device):
     if coord is not None:
         coord = sp.util.move(coord, device)
 
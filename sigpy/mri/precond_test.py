@@ -1,3 +1,5 @@
+import os
+import tempfile
 import unittest
 import numpy as np
 import sigpy as sp
@@ -121,6 +123,19 @@ class TestPrecond(unittest.TestCase):
         p = precond.kspace_precond(mps, coord=coord)
         npt.assert_allclose(p, [[1.0, 1.0, 1.0]], atol=1, rtol=1e-1)
 
+    def test_xcorr_fourier(self):
+        for shape in [[3, 5], [4, 3, 6]]:
+            for dtype in [np.float, np.complex]:
+                mps = sp.util.randn(shape, dtype=dtype)
+                img2_shape = [2 * i for i in shape[1:]]
+                ndim = len(img2_shape)
+
+                mps_ij = mps * np.conj(mps.reshape([shape[0], 1] + shape[1:]))
+                xcorr_fourier = np.sum(np.abs(sp.fft.fft(
+                    mps_ij, [shape[0]] * 2 + img2_shape, axes=range(-ndim, 0)))**2, axis=0)
+                npt.assert_allclose(precond._get_xcorr_fourier(mps, img2_shape),
+                                    xcorr_fourier, atol=1e-10, rtol=1e-10)
+
     def test_circulant_precond_cart(self):
         nc = 4
         n = 10
@@ -161,3 +176,27 @@ class TestPrecond(unittest.TestCase):
 
         p = precond.circulant_precond(mps, coord=coord)
         npt.assert_allclose(p, p_expected, atol=1e-1, rtol=1e-1)
+
+    def test_precond_cache(self):
+        nc = 4
+        n = 10
+        mps = sp.util.randn([nc, n])
+        weights = sp.util.randn([n]) >= 0
+
+        for func in [precond.kspace_precond, precond.circulant_precond]:
+            precond._cache.clear()
+            func(mps, weights=weights)
+            assert len(precond._cache) == 0
+
+            p = func(mps, weights=weights, cache=True)
+            p[:] = 0
+            npt.assert_allclose(func(mps, weights=weights, cache=True),
+                                func(mps * 1, weights=weights))
+            assert np.all(func(mps, weights=weights, cache=True) != 0)
+
+            with tempfile.TemporaryDirectory() as cache_dir:
+                p = func(mps, weights=weights, cache_dir=cache_dir)
+                assert len(os.listdir(cache_dir)) == 1
+
+                precond._cache.clear()
+                npt.assert_allclose(func(mps, weights=weights, cache_dir=cache_dir), p)
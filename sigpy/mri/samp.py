@@ -6,18 +6,33 @@ import numba as nb
 
 
 def poisson(img_shape, accel, K=30, calib=[0, 0], dtype=np.complex,
-            crop_corner=True, return_density=False, seed=0):
-    """Generate Poisson-disc sampling pattern
+            crop_corner=True, return_density=False, seed=0,
+            tol=0.1, max_iter=30):
+    """Generate variable-density Poisson-disc sampling pattern.
+
+    Supports 2D (ky, kx) and 3D (kz, ky, kx or t, ky, kx) patterns.
+    Existing points are rasterized onto a background grid of excluded
+    cells, so that each candidate is checked in constant time.
+    The density slope is searched with the Illinois variant of regula falsi.
 
     Args:
-        img_shape (tuple of ints): length-2 image shape.
+        img_shape (tuple of ints): length-2 or length-3 image shape.
         accel (float): Target acceleration factor. Greater than 1.
         K (float): maximum number of samples to reject.
-        calib (tuple of ints): length-2 calibration shape.
+        calib (tuple of ints): calibration shape.
+            If shorter than img_shape, the calibration region and
+            density are broadcast along the leading axes, as for (t, ky, kx).
         dtype (Dtype): data type.
         crop_corner (bool): Toggle whether to crop sampling corners.
         return_density (bool): Toggle whether to return sampling density.
-        seed (int): Random seed.
+        seed (int or list of ints): Random seed. If a list is given,
+            one mask is generated per seed in parallel,
+            and the masks are stacked along the first axis.
+            Parallel generation starts numba worker threads, after which
+            forking the process is unsafe with the TBB threading layer.
+            Use the spawn start method of multiprocessing instead.
+        tol (float): Tolerance on the acceleration factor.
+        max_iter (int): Maximum number of search iterations.
 
     Returns:
         array: Poisson-disc sampling mask.
@@ -27,36 +42,88 @@ def poisson(img_shape, accel, K=30, calib=[0, 0], dtype=np.complex,
         SIGGRAPH sketches. 2007.
 
     """
-    y, x = np.mgrid[:img_shape[-2], :img_shape[-1]]
-    x = np.maximum(abs(x - img_shape[-1] / 2) - calib[-1] / 2, 0)
-    x /= x.max()
-    y = np.maximum(abs(y - img_shape[-2] / 2) - calib[-2] / 2, 0)
-    y /= y.max()
-    r = np.sqrt(x ** 2 + y ** 2)
-
-    slope_max = 40
-    slope_min = 0
-    while slope_min < slope_max:
-        slope = (slope_max + slope_min) / 2.0
-        R = (1.0 + r * slope)
-        mask = _poisson(img_shape[-1], img_shape[-2], K, R, calib, seed)
-        if crop_corner:
-            mask *= r < 1
-
-        est_accel = img_shape[-1] * img_shape[-2] / np.sum(mask[:])
-
-        if abs(est_accel - accel) < 0.1:
+    img_shape = tuple(img_shape)
+    ndim = len(img_shape)
+    if ndim not in [2, 3]:
+        raise ValueError('Only 2D and 3D sampling is supported, '
+                         'got img_shape={}.'.format(img_shape))
+
+    if calib is None:
+        calib = []
+
+    calib = list(img_shape[:ndim - len(calib)]) + list(calib)
+
+    batch = not np.isscalar(seed) and seed is not None
+    if seed is None:
+        seeds = np.random.randint(2**31, size=1)
+    else:
+        seeds = np.array(seed, dtype=np.int64).ravel()
+
+    r = _poisson_density(img_shape, calib)
+
+    num = len(seeds)
+    lo = np.zeros(num)
+    hi = np.full(num, 40.0)
+    masks_lo, g_lo = _poisson_masks(img_shape, K, r, lo, seeds, calib,
+                                    crop_corner, accel)
+    masks_hi, g_hi = _poisson_masks(img_shape, K, r, hi, seeds, calib,
+                                    crop_corner, accel)
+
+    # Extend upper bound until the target acceleration is bracketed.
+    slope_max = 2 * max(img_shape)
+    while True:
+        extend = (g_hi < 0) & (hi < slope_max)
+        if not np.any(extend):
+            break
+
+        lo[extend] = hi[extend]
+        g_lo[extend] = g_hi[extend]
+        masks_lo[extend] = masks_hi[extend]
+        hi[extend] *= 2
+        masks_hi[extend], g_hi[extend] = _poisson_masks(
+            img_shape, K, r, hi[extend], seeds[extend], calib,
+            crop_corner, accel)
+
+    use_hi = abs(g_hi) < abs(g_lo)
+    masks = np.where(use_hi.reshape((-1, ) + (1, ) * ndim),
+                     masks_hi, masks_lo)
+    g_best = np.where(use_hi, g_hi, g_lo)
+    side = np.zeros(num, dtype=np.int64)
+    for it in range(max_iter):
+        active = (abs(g_best) >= tol) & (g_lo < 0) & (g_hi > 0)
+        if not np.any(active):
             break
-        if est_accel < accel:
-            slope_min = slope
-        else:
-            slope_max = slope
 
-    mask = mask.reshape(img_shape).astype(dtype)
+        a_lo, a_hi = lo[active], hi[active]
+        a_g_lo, a_g_hi = g_lo[active], g_hi[active]
+        slope = a_hi - a_g_hi * (a_hi - a_lo) / (a_g_hi - a_g_lo)
+        masks_a, g = _poisson_masks(img_shape, K, r, slope, seeds[active],
+                                    calib, crop_corner, accel)
+
+        # Illinois update: halve the stale end to avoid one-sided stalls.
+        is_hi = g > 0
+        a_side = side[active]
+        a_g_lo = np.where(is_hi & (a_side == 1), a_g_lo / 2, a_g_lo)
+        a_g_hi = np.where(~is_hi & (a_side == -1), a_g_hi / 2, a_g_hi)
+        hi[active] = np.where(is_hi, slope, a_hi)
+        g_hi[active] = np.where(is_hi, g, a_g_hi)
+        lo[active] = np.where(is_hi, a_lo, slope)
+        g_lo[active] = np.where(is_hi, a_g_lo, g)
+        side[active] = np.where(is_hi, 1, -1)
+
+        better = abs(g) < abs(g_best[active])
+        idx = np.flatnonzero(active)[better]
+        masks[idx] = masks_a[better]
+        g_best[idx] = g[better]
+
+    if not batch:
+        masks = masks[0]
+
+    masks = masks.astype(dtype)
     if return_density:
-        return mask, r
+        return masks, r
     else:
-        return mask
+        return masks
 
 
 def radial(coord_shape, img_shape, golden=True, dtype=np.float):
@@ -112,73 +179,144 @@ def radial(coord_shape, img_shape, golden=True, dtype=np.float):
     return (coord * img_shape[-ndim:]).astype(dtype)
 
 
+def _poisson_density(img_shape, calib):
+    r2 = np.zeros(img_shape)
+    for a, (n, c) in enumerate(zip(img_shape, calib)):
+        d = np.maximum(abs(np.arange(n) - n / 2) - c / 2, 0)
+        if d.max() > 0:
+            d /= d.max()
+
+        r2 += d.reshape([n] + [1] * (len(img_shape) - a - 1))**2
+
+    return r2**0.5
+
+
+def _poisson_masks(img_shape, K, r, slopes, seeds, calib, crop_corner, accel):
+    masks = np.zeros((len(seeds), ) + img_shape, dtype=np.bool_)
+    r = r.reshape((-1, ) + img_shape[-2:])
+    slopes = np.asarray(slopes, dtype=np.float64)
+    masks_r = masks.reshape((len(seeds), ) + r.shape)
+    if len(seeds) == 1:
+        _poisson(masks_r[0], K, r, slopes[0], seeds[0])
+    else:
+        _poisson_batch(masks_r, K, r, slopes, seeds)
+
+    calib_slc = tuple(slice(int(n / 2 - c / 2), int(n / 2 + c / 2))
+                      for n, c in zip(img_shape, calib))
+    masks[(slice(None), ) + calib_slc] = True
+    if crop_corner:
+        masks &= r.reshape(img_shape) < 1
+
+    axes = tuple(range(1, len(img_shape) + 1))
+    est_accel = r.size / np.maximum(np.sum(masks, axis=axes), 1)
+    return masks, est_accel - accel
+
+
 @nb.jit(nopython=True, cache=True)
-def _poisson(nx, ny, K, R, calib, seed):
-    
-    mask = np.zeros((ny, nx))
-    f = ny / nx
+def _poisson_cover(covered, pz, py, px, rad, fz, fy):
+    nz, ny, nx = covered.shape
+    if nz == 1:
+        startz = endz = pz
+    else:
+        startz = max(int(pz - rad * fz), 0)
+        endz = min(int(pz + rad * fz), nz - 1)
+
+    for z in range(startz, endz + 1):
+        dz = 0.0
+        if nz > 1:
+            dz = (z - pz) / (rad * fz)
+
+        ry = rad * fy * max(1 - dz**2, 0)**0.5
+        starty = max(int(py - ry), 0)
+        endy = min(int(py + ry), ny - 1)
+        for y in range(starty, endy + 1):
+            dy = (y - py) / (rad * fy)
+            rem = 1 - dz**2 - dy**2
+            if rem <= 0:
+                continue
+
+            rx2 = rad**2 * rem
+            rx = rx2**0.5
+            startx = max(int(px - rx), 0)
+            endx = min(int(px + rx), nx - 1)
+            for x in range(startx, endx + 1):
+                if (x - px)**2 < rx2:
+                    covered[z, y, x] = True
 
-    if seed is not None:
-        np.random.seed(int(seed))
 
-    pxs = np.empty(nx * ny, np.int32)
-    pys = np.empty(nx * ny, np.int32)
-    pxs[0] = np.random.randint(0, nx)
+@nb.jit(nopython=True, cache=True)
+def _poisson(mask, K, r, slope, seed):
+    nz, ny, nx = mask.shape
+    fy = ny / nx
+    fz = nz / nx
+    np.random.seed(seed)
+
+    # Background grid of cells excluded by the disc of an accepted point.
+    covered = np.zeros((nz, ny, nx), dtype=np.bool_)
+    pzs = np.empty(nz * ny * nx, np.int64)
+    pys = np.empty(nz * ny * nx, np.int64)
+    pxs = np.empty(nz * ny * nx, np.int64)
+    pzs[0] = np.random.randint(0, nz)
     pys[0] = np.random.randint(0, ny)
+    pxs[0] = np.random.randint(0, nx)
+    mask[pzs[0], pys[0], pxs[0]] = True
+    _poisson_cover(covered, pzs[0], pys[0], pxs[0],
+                   1 + r[pzs[0], pys[0], pxs[0]] * slope, fz, fy)
     m = 1
-    while (m > 0):
-
+    while m > 0:
         i = np.random.randint(0, m)
-        px = pxs[i]
+        pz = pzs[i]
         py = pys[i]
-        rad = R[py, px]
+        px = pxs[i]
+        rad = 1 + r[pz, py, px] * slope
 
         # Attempt to generate point
         done = False
         k = 0
         while not done and k < K:
-
-            # Generate point randomly from R and 2R
-            rd = rad * (np.random.random() * 3 + 1)**0.5
+            # Generate point uniformly between R and 2R
             t = 2 * np.pi * np.random.random()
-            qx = px + rd * np.cos(t)
-            qy = py + rd * f * np.sin(t)
+            if nz == 1:
+                rd = rad * (np.random.random() * 3 + 1)**0.5
+                qz = 0.0
+                qy = py + rd * fy * np.sin(t)
+                qx = px + rd * np.cos(t)
+            else:
+                rd = rad * (np.random.random() * 7 + 1)**(1 / 3)
+                cz = 2 * np.random.random() - 1
+                sz = (1 - cz**2)**0.5
+                qz = pz + rd * fz * cz
+                qy = py + rd * fy * sz * np.sin(t)
+                qx = px + rd * sz * np.cos(t)
 
             # Reject if outside grid or close to other points
-            if qx >= 0 and qx < nx and qy >= 0 and qy < ny:
-
-                startx = max(int(qx - rad), 0)
-                endx = min(int(qx + rad + 1), nx)
-                starty = max(int(qy - rad * f), 0)
-                endy = min(int(qy + rad * f + 1), ny)
-
-                done = True
-                for x in range(startx, endx):
-                    for y in range(starty, endy):
-                        if (mask[y, x] == 1 and
-                            (((qx - x) / R[y, x]) ** 2 +
-                             ((qy - y) / (R[y, x] * f)) ** 2 < 1)):
-                            done = False
-                            break
-
-                    if not done:
-                        break
+            if (qz >= 0 and qz < nz and qy >= 0 and qy < ny and
+                qx >= 0 and qx < nx):
+                done = not covered[int(qz), int(qy), int(qx)]
 
             k += 1
 
         # Add point if done else remove active
         if done:
-            pxs[m] = qx
-            pys[m] = qy
-            mask[int(qy), int(qx)] = 1
+            pz = int(qz)
+            py = int(qy)
+            px = int(qx)
+            pzs[m] = pz
+            pys[m] = py
+            pxs[m] = px
+            mask[pz, py, px] = True
+            _poisson_cover(covered, pz, py, px, 1 + r[pz, py, px] * slope,
+                           fz, fy)
             m += 1
         else:
-            pxs[i] = pxs[m - 1]
+            pzs[i] = pzs[m - 1]
             pys[i] = pys[m - 1]
+            pxs[i] = pxs[m - 1]
             m -= 1
 
-    # Add calibration region
-    mask[int(ny / 2 - calib[-2] / 2):int(ny / 2 + calib[-2] / 2),
-         int(nx / 2 - calib[-1] / 2):int(nx / 2 + calib[-1] / 2)] = 1
 
-    return mask
+# Only used for several seeds, as fork is unsafe once its threads have started.
+@nb.jit(nopython=True, cache=True, parallel=True)
+def _poisson_batch(masks, K, r, slopes, seeds):
+    for i in nb.prange(len(masks)):
+        _poisson(masks[i], K, r, slopes[i], seeds[i])
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+import unittest
+import numpy as np
+import numpy.testing as npt
+
+from sigpy.mri import samp
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestSamp(unittest.TestCase):
+
+    def test_poisson(self):
+        for img_shape, accel, calib, calib_slc in [
+                ([64, 64], 4, [8, 8], np.s_[28:36, 28:36]),
+                ([8, 32, 32], 6, [4, 8, 8], np.s_[2:6, 12:20, 12:20]),
+                ([8, 32, 32], 6, [8, 8], np.s_[:, 12:20, 12:20])]:
+            with self.subTest(img_shape=img_shape, calib=calib):
+                mask = samp.poisson(img_shape, accel, calib=calib)
+
+                self.assertEqual(mask.shape, tuple(img_shape))
+                self.assertLess(abs(mask.size / np.sum(abs(mask)) - accel),
+                                0.1)
+                npt.assert_allclose(mask[calib_slc], 1)
+
+    def test_poisson_seeds(self):
+        img_shape = [32, 32]
+        accel = 3
+        masks = samp.poisson(img_shape, accel, seed=[0, 1, 2])
+
+        self.assertEqual(masks.shape, (3, ) + tuple(img_shape))
+        for i in range(3):
+            npt.assert_allclose(
+                masks[i], samp.poisson(img_shape, accel, seed=i))
+
+    def test_poisson_fork(self):
+        code = ('import multiprocessing; from sigpy.mri import samp; '
+                'samp.poisson([32, 32], 3); '
+                'p = multiprocessing.get_context("fork").Process(target=print); '
+                'p.start(); p.join(); assert p.exitcode == 0')
+        subprocess.check_call([sys.executable, '-c', code], cwd=_root, timeout=60)
@@ -1,73 +1,138 @@
 # -*- coding: utf-8 -*-
 """MRI simulation functions.
 """
+import functools
 import numpy as np
+import numba as nb
+import sigpy as sp
 
 
-def shepp_logan(shape, dtype=np.complex):
+def shepp_logan(shape, dtype=np.complex, cache=False):
     """Generates a Shepp Logan phantom with a given shape and dtype.
 
     Args:
         shape (tuple of ints): shape, can be of length 2 or 3.
         dtype (Dtype): data type.
+        cache (bool): Toggle whether to cache the result for repeated
+            requests. Cached results are returned as read-only arrays.
 
     Returns:
         array.
 
     """
-    return phantom(shape, sl_amps, sl_scales, sl_offsets, sl_angles, dtype)
+    if cache:
+        return _cached_shepp_logan(tuple(shape), np.dtype(dtype))
+
+    return _shepp_logan(shape, dtype)
 
 
-def birdcage_maps(shape, r=1.5, nzz=8, dtype=np.complex):
+def birdcage_maps(shape, r=1.5, nzz=8, dtype=np.complex,
+                  device=sp.util.cpu_device, cache=False):
     """Simulates birdcage coil sensitivies.
 
+    Maps are generated one coil at a time directly on the given device,
+    in the precision of dtype.
+
     Args:
         shape (tuple of ints): sensitivity maps shape, can be of length 3, and 4.
         r (float): relative radius of birdcage.
         nzz (int): number of coils per ring.
         dtype (Dtype): data type.
+        device (Device): output device.
+        cache (bool): Toggle whether to cache the result for repeated
+            requests. Results are cached on CPU, and returned as read-only
+            arrays on CPU, or moved to other devices on each request.
 
     Returns:
         array.
     """
+    device = sp.util.Device(device)
+    if cache:
+        output = _cached_birdcage_maps(tuple(shape), r, nzz, np.dtype(dtype))
+        if device == sp.util.cpu_device:
+            return output
 
-    if len(shape) == 3:
+        return sp.util.move(output, device)
+
+    with device:
+        return _birdcage_maps(shape, r, nzz, dtype, device.id)
+
+
+def clear_cache():
+    """Clears cached phantoms and sensitivity maps."""
+    _cached_shepp_logan.cache_clear()
+    _cached_birdcage_maps.cache_clear()
+
+
+def _shepp_logan(shape, dtype):
+    return phantom(shape, sl_amps, sl_scales, sl_offsets, sl_angles, dtype)
 
-        nc, ny, nx = shape
-        c, y, x = np.mgrid[:nc, :ny, :nx]
 
-        coilx = r * np.cos(c * (2 * np.pi / nc))
-        coily = r * np.sin(c * (2 * np.pi / nc))
-        coil_phs = -c * (2 * np.pi / nc)
+@functools.lru_cache(maxsize=4)
+def _cached_shepp_logan(shape, dtype):
+    output = _shepp_logan(shape, dtype)
+    output.flags.writeable = False
+    return output
+
+
+@functools.lru_cache(maxsize=4)
+def _cached_birdcage_maps(shape, r, nzz, dtype):
+    output = _birdcage_maps(shape, r, nzz, dtype, sp.util.cpu_device.id)
+    output.flags.writeable = False
+    return output
 
-        x_co = (x - nx / 2.0) / (nx / 2.0) - coilx
-        y_co = (y - ny / 2.0) / (ny / 2.0) - coily
-        rr = np.sqrt(x_co ** 2 + y_co ** 2)
-        phi = np.arctan2(x_co, -y_co) + coil_phs
-        out = (1.0 / rr) * np.exp(1j * phi)
 
+def _birdcage_maps(shape, r, nzz, dtype, device_id):
+    if len(shape) == 3:
+        nc, ny, nx = shape
+        nz = 1
     elif len(shape) == 4:
         nc, nz, ny, nx = shape
-        c, z, y, x = np.mgrid[:nc, :nz, :ny, :nx]
-
-        coilx = r * np.cos(c * (2 * np.pi / nzz))
-        coily = r * np.sin(c * (2 * np.pi / nzz))
-        coilz = np.floor(c / nzz) - 0.5 * (np.ceil(nc / nzz) - 1)
-        coil_phs = -(c + np.floor(c / nzz)) * (2 * np.pi / nzz)
-
-        x_co = (x - nx / 2.0) / (nx / 2.0) - coilx
-        y_co = (y - ny / 2.0) / (ny / 2.0) - coily
-        z_co = (z - nz / 2.0) / (nz / 2.0) - coilz
-        rr = (x_co**2 + y_co**2 + z_co**2)**0.5
-        phi = np.arctan2(x_co, -y_co) + coil_phs
-        out = (1 / rr) * np.exp(1j * phi)
     else:
         raise ValueError('Can only generate shape with length 3 or 4')
 
-    rss = sum(abs(out) ** 2, 0)**0.5
-    out /= rss
+    device = sp.util.Device(device_id)
+    xp = device.xp
+    real_dtype = np.empty(0, dtype=dtype).real.dtype
+    with device:
+        output = xp.empty(shape, dtype=dtype)
+        x = (xp.arange(nx, dtype=real_dtype) - nx / 2.0) / (nx / 2.0)
+        y = (xp.arange(ny, dtype=real_dtype).reshape([ny, 1]) -
+             ny / 2.0) / (ny / 2.0)
+        z = (xp.arange(nz, dtype=real_dtype).reshape([nz, 1, 1]) -
+             nz / 2.0) / (nz / 2.0)
+
+        # exp(1j * arctan2(x, -y)) = (-y + 1j * x) / |(x, y)|
+        rss = xp.zeros(shape[1:], dtype=real_dtype)
+        for c in range(nc):
+            if len(shape) == 3:
+                coilx = r * np.cos(c * (2 * np.pi / nc))
+                coily = r * np.sin(c * (2 * np.pi / nc))
+                coilz = 0
+                coil_phs = -c * (2 * np.pi / nc)
+            else:
+                coilx = r * np.cos(c * (2 * np.pi / nzz))
+                coily = r * np.sin(c * (2 * np.pi / nzz))
+                coilz = np.floor(c / nzz) - 0.5 * (np.ceil(nc / nzz) - 1)
+                coil_phs = -(c + np.floor(c / nzz)) * (2 * np.pi / nzz)
+
+            rxy2 = (x - coilx)**2 + (y - coily)**2
+            if len(shape) == 3:
+                weight = 1 / rxy2
+            else:
+                weight = 1 / (rxy2 + (z - coilz)**2)
+
+            rss += weight
+            out_c = (weight / rxy2)**0.5 * np.exp(1j * coil_phs)
+            out_c *= (coily - y) + 1j * (x - coilx)
+            if np.issubdtype(dtype, np.complexfloating):
+                output[c] = out_c
+            else:
+                output[c] = out_c.real
+
+        output /= rss**0.5
 
-    return out.astype(dtype)
+    return output
 
 
 sl_amps = [1, -0.8, -0.2, -0.2, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1]
@@ -151,6 +216,9 @@ def phantom(shape, amps, scales, offsets, angles, dtype):
     """
     Generate a cube of given shape using a list of ellipsoid
     parameters.
+
+    All ellipsoids are evaluated per voxel, one row at a time,
+    skipping ellipsoids whose bounding box does not intersect the row.
     """
 
     if len(shape) == 2:
@@ -168,17 +236,17 @@ def phantom(shape, amps, scales, offsets, angles, dtype):
 
     out = np.zeros(shape, dtype=dtype)
 
-    z, y, x = np.mgrid[-(shape[-3] // 2):((shape[-3] + 1) // 2),
-                       -(shape[-2] // 2):((shape[-2] + 1) // 2),
-                       -(shape[-1] // 2):((shape[-1] + 1) // 2)]
-
-    coords = np.stack((x.ravel() / shape[-1] * 2,
-                       y.ravel() / shape[-2] * 2,
-                       z.ravel() / shape[-3] * 2))
+    scales = np.asarray(scales, dtype=np.float64).reshape([-1, 3])
+    offsets = np.asarray(offsets, dtype=np.float64).reshape([-1, 3])
+    rotations = np.stack([rotation_matrix(angle) for angle in angles])
 
-    for amp, scale, offset, angle in zip(amps, scales, offsets, angles):
+    # Bounding box of each ellipsoid in image coordinates.
+    centers = np.einsum('eji,ej->ei', rotations, offsets)
+    widths = np.einsum('eji,ej->ei', rotations**2, scales**2)**0.5
+    widths *= 1 + 1e-6
 
-        ellipsoid(amp, scale, offset, angle, coords, out)
+    _phantom(out, np.asarray(amps, dtype=dtype), scales, offsets,
+             rotations, centers, widths)
 
     if ndim == 2:
 
@@ -221,3 +289,32 @@ def rotation_matrix(angle):
               -stheta * cphi,
               ctheta]]
     return np.array(alpha)
+
+
+@nb.jit(nopython=True, cache=True)
+def _phantom(output, amps, scales, offsets, rotations, centers, widths):
+    nz, ny, nx = output.shape
+    for iz in range(nz):
+        z = (iz - nz // 2) / nz * 2
+        for iy in range(ny):
+            y = (iy - ny // 2) / ny * 2
+            for e in range(len(amps)):
+                if (abs(z - centers[e, 2]) > widths[e, 2] or
+                    abs(y - centers[e, 1]) > widths[e, 1]):
+                    continue
+
+                R = rotations[e]
+                startx = max(int(np.floor(
+                    (centers[e, 0] - widths[e, 0]) * nx / 2)) + nx // 2, 0)
+                endx = min(int(np.ceil(
+                    (centers[e, 0] + widths[e, 0]) * nx / 2)) + nx // 2 + 1, nx)
+                for ix in range(startx, endx):
+                    x = (ix - nx // 2) / nx * 2
+                    u0 = ((R[0, 0] * x + R[0, 1] * y + R[0, 2] * z - offsets[e, 0]) /
+                          scales[e, 0])
+                    u1 = ((R[1, 0] * x + R[1, 1] * y + R[1, 2] * z - offsets[e, 1]) /
+                          scales[e, 1])
+                    u2 = ((R[2, 0] * x + R[2, 1] * y + R[2, 2] * z - offsets[e, 2]) /
+                          scales[e, 2])
+                    if u0**2 + u1**2 + u2**2 <= 1:
+                        output[iz, iy, ix] += amps[e]
@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+import unittest
+import numpy as np
+import numpy.testing as npt
+
+from sigpy.mri import sim
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestSim(unittest.TestCase):
+
+    def test_phantom(self):
+        shape = [6, 8, 10]
+        amps = [1, 0.5]
+        scales = [[0.8, 0.6, 0.7], [0.3, 0.4, 0.2]]
+        offsets = [[0, 0, 0], [0.2, -0.1, 0]]
+        angles = [[0, 0, 0], [30, 20, 10]]
+        output = sim.phantom(shape, amps, scales, offsets, angles, np.float)
+
+        z, y, x = np.mgrid[-3:3, -4:4, -5:5]
+        coords = np.stack((x.ravel() / 10 * 2,
+                           y.ravel() / 8 * 2,
+                           z.ravel() / 6 * 2))
+        expected = np.zeros(shape)
+        for amp, scale, offset, angle in zip(amps, scales, offsets, angles):
+            sim.ellipsoid(amp, scale, offset, angle, coords, expected)
+
+        npt.assert_allclose(output, expected)
+
+    def test_shepp_logan_cache(self):
+        img = sim.shepp_logan([8, 8])
+        img[:] = 0
+        self.assertGreater(np.sum(abs(sim.shepp_logan([8, 8]))), 0)
+
+        img = sim.shepp_logan([8, 8], cache=True)
+        self.assertIs(sim.shepp_logan([8, 8], cache=True), img)
+        with self.assertRaises(ValueError):
+            img[:] = 0
+
+        sim.clear_cache()
+        self.assertIsNot(sim.shepp_logan([8, 8], cache=True), img)
+
+    def test_birdcage_maps(self):
+        for shape in [[4, 6, 8], [8, 3, 6, 8]]:
+            with self.subTest(shape=shape):
+                mps = sim.birdcage_maps(shape)
+                mps_single = sim.birdcage_maps(shape, dtype=np.complex64)
+
+                self.assertEqual(mps_single.dtype, np.complex64)
+                npt.assert_allclose(np.sum(abs(mps)**2, axis=0), 1)
+                npt.assert_allclose(mps_single, mps, atol=1e-6)
+
+                mps_cached = sim.birdcage_maps(shape, cache=True)
+                self.assertIs(sim.birdcage_maps(shape, cache=True), mps_cached)
+                self.assertFalse(mps_cached.flags.writeable)
+                npt.assert_allclose(mps_cached, mps)
+
+    def test_shepp_logan_fork(self):
+        code = ('import multiprocessing; from sigpy.mri import sim; '
+                'sim.shepp_logan([32, 32]); '
+                'p = multiprocessing.get_context("fork").Process(target=print); '
+                'p.start(); p.join(); assert p.exitcode == 0')
+        subprocess.check_call([sys.executable, '-c', code], cwd=_root, timeout=60)
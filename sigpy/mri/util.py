@@ -2,44 +2,239 @@
 """MRI utilities.
 """
 import numpy as np
+import sigpy as sp
 from scipy.linalg import solve_triangular
 
 
-def get_cov(noise):
+def get_cov(noise, chunk_size=2**16):
     """Get covariance matrix from noise measurements.
-    
+
+    Noise is read in chunks of samples and accumulated with
+    CovarianceAccumulator, so memory-mapped noise scans can be used directly.
+    The input is not modified.
+
     Args:
         noise (array): Noise measurements of shape [num_coils, ...]
-    
+        chunk_size (int): Number of samples per chunk.
+
     Returns:
         array: num_coils x num_coils covariance matrix.
 
     """
     num_coils = noise.shape[0]
     X = noise.reshape([num_coils, -1])
-    X -= np.mean(X, axis=-1, keepdims=True)
-    cov = np.matmul(X, X.T.conjugate())
+    acc = CovarianceAccumulator(num_coils)
+    for start in range(0, X.shape[1], chunk_size):
+        acc.update(X[:, start:start + chunk_size])
+
+    cov = acc.cov
+    if not np.iscomplexobj(noise):
+        cov = cov.real
+
+    return cov.astype(np.result_type(noise.dtype, np.float32), copy=False)
+
+
+class CovarianceAccumulator(object):
+    """Streaming noise covariance accumulator.
+
+    Chunks of noise samples are merged with the parallel form of
+    Welford's algorithm, so the mean is removed exactly without
+    a second pass over the data.
+
+    Args:
+        num_coils (int): Number of coils.
+
+    Attributes:
+        num_samples (int): Number of samples accumulated.
+        mean (array): Sample mean of shape [num_coils].
+        cov (array): Centered sum of outer products,
+            of shape [num_coils, num_coils].
+
+    References:
+        Chan, T. F., Golub, G. H., & LeVeque, R. J. (1979).
+        Updating formulae and a pairwise algorithm for computing
+        sample variances.
+
+    """
+    def __init__(self, num_coils):
+        self.num_coils = num_coils
+        self.num_samples = 0
+        self.mean = np.zeros(num_coils, dtype=np.complex128)
+        self.cov = np.zeros([num_coils, num_coils], dtype=np.complex128)
 
-    return cov
+    def update(self, noise):
+        """Accumulates noise measurements.
 
+        Args:
+            noise (array): Noise measurements of shape [num_coils, ...].
 
-def whiten(ksp, cov):
+        """
+        X = sp.util.move(noise).reshape([self.num_coils, -1])
+        num_samples = X.shape[1]
+        if num_samples == 0:
+            return
+
+        mean = np.mean(X, axis=-1, dtype=np.complex128)
+        X = X - mean[:, None]
+        cov = np.matmul(X, X.T.conjugate())
+
+        total = self.num_samples + num_samples
+        delta = mean - self.mean
+        self.cov += cov
+        self.cov += (np.outer(delta, delta.conjugate()) *
+                     (self.num_samples * num_samples / total))
+        self.mean += delta * (num_samples / total)
+        self.num_samples = total
+
+
+def whiten(ksp, cov, chunk_size=2**16, inplace=False):
     """Whitens k-space measurements.
-    
+
+    The inverse Cholesky factor of cov is applied to chunks of samples.
+    With inplace=True, ksp is overwritten chunk by chunk,
+    which also works for writable memory-mapped arrays.
+
     Args:
         ksp (array): k-space measurements of shape [num_coils, ...]
         cov (array): num_coils x num_coils covariance matrix.
-    
+        chunk_size (int): Number of samples per chunk.
+        inplace (bool): Toggle whether to overwrite ksp.
+
     Returns:
         array: whitened k-space array.
 
     """
     num_coils = ksp.shape[0]
 
+    L = np.linalg.cholesky(cov)
+    L_inv = solve_triangular(L, np.eye(num_coils), lower=True)
+
     x = ksp.reshape([num_coils, -1])
+    if inplace:
+        if not np.may_share_memory(x, ksp):
+            raise ValueError('inplace whitening requires a contiguous ksp.')
 
-    L = np.linalg.cholesky(cov)
-    x_w = solve_triangular(L, x, lower=True)
-    ksp_w = x_w.reshape(ksp.shape)
+        ksp_w = ksp
+        x_w = x
+    else:
+        ksp_w = np.empty(ksp.shape, dtype=np.result_type(ksp.dtype, L_inv.dtype))
+        x_w = ksp_w.reshape([num_coils, -1])
+
+    L_inv = L_inv.astype(x_w.dtype, copy=False)
+    for start in range(0, x.shape[1], chunk_size):
+        end = start + chunk_size
+        x_w[:, start:end] = np.matmul(L_inv, x[:, start:end])
 
     return ksp_w
+
+
+def get_cc_mat(calib, num_virtual_coils, method='svd', axis=-1):
+    """Get coil compression matrix from calibration data.
+
+    For method='svd', a single matrix is computed from the dominant
+    left singular vectors of calib, reshaped as num_coils x num_points.
+    For method='geometric', calib must be fully sampled along axis,
+    which is inverse Fourier transformed. A matrix is then computed for
+    each position along axis, and aligned with its neighbor so that
+    virtual coils vary smoothly.
+
+    Args:
+        calib (array): Calibration k-space data of shape [num_coils, ...].
+        num_virtual_coils (int): Number of virtual coils.
+        method (str): {'svd', 'geometric'}.
+        axis (int): Fully sampled axis for method='geometric'.
+
+    Returns:
+        array: compression matrix of shape [num_virtual_coils, num_coils]
+            if method='svd',
+            or [calib.shape[axis], num_virtual_coils, num_coils]
+            if method='geometric'.
+
+    References:
+        Huang, F., Vijayakumar, S., Li, Y., Hertel, S., & Duensing, G. R. (2008).
+        A software channel compression technique for faster reconstruction
+        with many channels.
+        Magnetic Resonance Imaging, 26(1), 133-141.
+
+        Zhang, T., Pauly, J. M., Vasanawala, S. S., & Lustig, M. (2013).
+        Coil compression for accelerated imaging with Cartesian sampling.
+        Magnetic Resonance in Medicine, 69(2), 571-582.
+
+    """
+    num_coils = calib.shape[0]
+    if num_virtual_coils > num_coils:
+        raise ValueError('num_virtual_coils cannot be larger than number of coils, '
+                         'got {num_virtual_coils} > {num_coils}.'.format(
+                             num_virtual_coils=num_virtual_coils, num_coils=num_coils))
+
+    device = sp.util.get_device(calib)
+    xp = device.xp
+    with device:
+        if method == 'svd':
+            X = calib.reshape([num_coils, -1])
+            U, _, _ = xp.linalg.svd(X, full_matrices=False)
+            return U[:, :num_virtual_coils].conjugate().T
+
+        elif method == 'geometric':
+            axis = axis % calib.ndim
+            if axis == 0:
+                raise ValueError('axis cannot be the coil axis.')
+
+            X = sp.fft.ifft(calib, axes=[axis])
+            X = xp.moveaxis(X, axis, 0).reshape([calib.shape[axis], num_coils, -1])
+            U, _, _ = xp.linalg.svd(X, full_matrices=False)
+            cc_mat = U[:, :, :num_virtual_coils].conjugate().swapaxes(-1, -2)
+
+            # Align each matrix to its neighbor by orthogonal Procrustes.
+            cc_mat = xp.ascontiguousarray(cc_mat)
+            for i in range(1, len(cc_mat)):
+                M = xp.matmul(cc_mat[i - 1], cc_mat[i].conjugate().T)
+                U, _, Vh = xp.linalg.svd(M)
+                cc_mat[i] = xp.matmul(xp.matmul(U, Vh), cc_mat[i])
+
+            return cc_mat
+
+        else:
+            raise ValueError('Invalid method: {method}.'.format(method=method))
+
+
+def coil_compress(input, cc_mat, axis=-1, kspace=True):
+    """Compresses k-space data or sensitivity maps to virtual coils.
+
+    Args:
+        input (array): Input array of shape [num_coils, ...].
+            For geometric compression, input must be Cartesian.
+        cc_mat (array): Compression matrix from get_cc_mat.
+        axis (int): Fully sampled axis for geometric compression.
+        kspace (bool): Specify whether input is in k-space,
+            or in image space, such as sensitivity maps.
+            Only used for geometric compression.
+
+    Returns:
+        array: compressed array of shape [num_virtual_coils, ...].
+
+    """
+    num_coils = input.shape[0]
+    device = sp.util.get_device(input)
+    xp = device.xp
+    with device:
+        cc_mat = sp.util.move(cc_mat, device)
+        num_virtual_coils = cc_mat.shape[-2]
+        if cc_mat.ndim == 2:
+            output = xp.matmul(cc_mat, input.reshape([num_coils, -1]))
+            return output.reshape([num_virtual_coils] + list(input.shape[1:]))
+
+        axis = axis % input.ndim
+        if kspace:
+            input = sp.fft.ifft(input, axes=[axis])
+
+        shape = input.shape
+        input = xp.moveaxis(input, axis, 0).reshape([shape[axis], num_coils, -1])
+        output = xp.matmul(cc_mat, input)
+        output = output.reshape([shape[axis], num_virtual_coils] +
+                                [s for i, s in enumerate(shape) if i not in (0, axis)])
+        output = xp.moveaxis(output, 0, axis)
+        if kspace:
+            output = sp.fft.fft(output, axes=[axis])
+
+        return output
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import sigpy as sp
+import numpy.testing as npt
+
+from sigpy.mri import util, sim
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class TestUtil(unittest.TestCase):
+
+    def test_coil_compress(self):
+        img_shape = [8, 8]
+        num_coils = 6
+        num_virtual_coils = 3
+
+        img = sim.shepp_logan(img_shape)
+        mps = sim.birdcage_maps([num_virtual_coils] + img_shape)
+        mix = sp.util.randn([num_coils, num_virtual_coils])
+        mps = np.tensordot(mix, mps, axes=1)
+        ksp = sp.fft.fft(mps * img, axes=[-2, -1])
+
+        for method in ['svd', 'geometric']:
+            cc_mat = util.get_cc_mat(ksp, num_virtual_coils, method=method)
+            ksp_cc = util.coil_compress(ksp, cc_mat)
+            mps_cc = util.coil_compress(mps, cc_mat, kspace=False)
+
+            assert ksp_cc.shape == (num_virtual_coils, ) + tuple(img_shape)
+            npt.assert_allclose(sp.util.norm(ksp_cc), sp.util.norm(ksp))
+            npt.assert_allclose(ksp_cc, sp.fft.fft(mps_cc * img, axes=[-2, -1]),
+                                atol=1e-6, rtol=1e-6)
+
+    def test_get_cov(self):
+        num_coils = 4
+        noise = sp.util.randn([num_coils, 10, 9])
+        noise += sp.util.randn([num_coils, 1, 1])
+        noise_copy = noise.copy()
+
+        X = noise.reshape([num_coils, -1])
+        X = X - np.mean(X, axis=-1, keepdims=True)
+        cov = util.get_cov(noise, chunk_size=7)
+
+        npt.assert_allclose(noise, noise_copy)
+        npt.assert_allclose(cov, np.matmul(X, X.T.conjugate()))
+
+    def test_whiten(self):
+        num_coils = 4
+        mix = np.eye(num_coils) + 0.2 * sp.util.randn([num_coils, num_coils])
+        noise = np.tensordot(mix, sp.util.randn([num_coils, 1000]), axes=1)
+        cov = util.get_cov(noise) / noise.shape[-1]
+
+        with tempfile.TemporaryDirectory() as dirpath:
+            path = os.path.join(dirpath, 'noise.npy')
+            np.save(path, noise)
+            noise_w = np.load(path, mmap_mode='r+')
+            util.whiten(noise_w, cov, chunk_size=300, inplace=True)
+            noise_w.flush()
+            del noise_w
+
+            cov_w = util.get_cov(np.load(path)) / noise.shape[-1]
+
+        npt.assert_allclose(cov_w, np.eye(num_coils), atol=1e-10)
+        L = np.linalg.cholesky(cov)
+        npt.assert_allclose(util.whiten(noise, cov, chunk_size=300),
+                            np.linalg.solve(L, noise), atol=1e-10)
@@ -1,3 +1,23 @@
-from .image import Image
-from .line import Line
-from .scatter import Scatter
+import importlib
+
+__all__ = [
+    'Image',
+    'Line',
+    'Scatter',
+]
+
+_modules = {'Image': 'image', 'Line': 'line', 'Scatter': 'scatter'}
+
+
+def __getattr__(name):
+    # Plots are imported on first access, as they require matplotlib.
+    if name in _modules:
+        module = importlib.import_module('sigpy.plot.' + _modules[name])
+        return getattr(module, name)
+
+    raise AttributeError(
+        "module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""Profiling of Linop, Prox and Alg calls.
+
+Profiling is opt-in. Within a Profiler context, every Linop application,
+Prox call and Alg update records its call count, wall time,
+output bytes and array shapes, aggregated over a call tree
+that mirrors the composition of operators.
+
+Example:
+    >>> with sigpy.profiler.Profiler() as prof:
+    ...     app.run()
+    >>> print(prof.report())
+    >>> prof.export_chrome_trace('trace.json')
+
+"""
+import json
+import os
+import threading
+import time
+
+from sigpy import config, util
+
+if config.cupy_enabled:
+    import cupy as cp
+
+
+_current = None
+
+
+def record(obj, kind, input=None):
+    """Records a call of obj in the active Profiler.
+
+    Args:
+        obj (object): Linop, Prox or Alg being called.
+        kind (str): Kind of call, such as 'apply', 'prox' or 'update'.
+        input (None or array): Input array.
+
+    Returns:
+        context manager: a record on which set_output can be called.
+            If no Profiler is active, a no-op record is returned.
+
+    """
+    profiler = _current
+    if profiler is None:
+        return _null_record
+
+    return _Record(profiler, obj, kind, input)
+
+
+class Node(object):
+    """Aggregated statistics of one call site in the call tree.
+
+    Calls of objects with the same name and kind from the same parent node
+    are aggregated in one node.
+
+    Attributes:
+        name (str): repr of the called Linop or Prox,
+            or class name of other objects.
+        kind (str): Kind of call.
+        count (int): Number of calls.
+        time (float): Cumulative wall time in seconds.
+        nbytes (int): Cumulative bytes of outputs not aliasing inputs.
+        ishape (None or tuple of ints): Input shape of the last call.
+        oshape (None or tuple of ints): Output shape of the last call.
+        children (list of Nodes): Nodes called from this node.
+
+    """
+    def __init__(self, name, kind):
+        self.name = name
+        self.kind = kind
+        self.count = 0
+        self.time = 0.0
+        self.nbytes = 0
+        self.ishape = None
+        self.oshape = None
+        self.children = []
+        self._children = {}
+
+    @property
+    def self_time(self):
+        return self.time - sum(child.time for child in self.children)
+
+    def _get_child(self, obj, kind):
+        # Keyed by name, as ids of temporary objects are reused.
+        if hasattr(obj, 'repr_str'):
+            name = repr(obj)
+        else:
+            name = obj.__class__.__name__
+
+        key = (name, kind)
+        if key not in self._children:
+            child = Node(name, kind)
+            self._children[key] = child
+            self.children.append(child)
+
+        return self._children[key]
+
+
+class Profiler(object):
+    """Collects a timing tree and trace events of sigpy calls.
+
+    Args:
+        synchronize (bool): Toggle whether to synchronize GPU devices
+            before and after each call, so that wall times
+            include asynchronous kernels.
+        trace (bool): Toggle whether to keep individual events
+            for export_chrome_trace.
+
+    Attributes:
+        root (Node): Root of the call tree.
+        events (list of dicts): Chrome trace events.
+
+    """
+    def __init__(self, synchronize=True, trace=True):
+        self.synchronize = synchronize
+        self.trace = trace
+        self.root = Node('', 'root')
+        self.events = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._previous = None
+
+    def __enter__(self):
+        global _current
+        self._previous = _current
+        _current = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _current
+        _current = self._previous
+        self._previous = None
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = [self.root]
+
+        return self._local.stack
+
+    def report(self, min_time=0):
+        """Formats the call tree as a table.
+
+        Nodes are indented under their callers, following
+        the composition shown by Linop.__repr__.
+
+        Args:
+            min_time (float): Nodes with less cumulative time
+                in seconds are omitted.
+
+        Returns:
+            str: Report.
+
+        """
+        lines = ['{:>8} {:>10} {:>10} {:>10}  {}'.format(
+            'calls', 'total(s)', 'self(s)', 'MB', 'name')]
+
+        def add_lines(node, depth):
+            for child in node.children:
+                if child.time < min_time:
+                    continue
+
+                lines.append('{:>8} {:>10.4f} {:>10.4f} {:>10.2f}  {}{}'.format(
+                    child.count, child.time, child.self_time,
+                    child.nbytes / 2**20, '  ' * depth, child.name))
+                add_lines(child, depth + 1)
+
+        add_lines(self.root, 0)
+        return '\n'.join(lines)
+
+    def export_chrome_trace(self, path):
+        """Writes recorded events in Chrome trace JSON format.
+
+        The file can be opened in chrome://tracing or Perfetto.
+
+        Args:
+            path (str): Output file path.
+
+        """
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.events,
+                       'displayTimeUnit': 'ms'}, f)
+
+
+class _Record(object):
+
+    def __init__(self, profiler, obj, kind, input):
+        self.profiler = profiler
+        self.obj = obj
+        self.kind = kind
+        self.input = input
+        self.output = None
+
+    def set_output(self, output):
+        self.output = output
+
+    def _synchronize(self):
+        if (self.profiler.synchronize and config.cupy_enabled and
+            self.input is not None and
+            util.get_device(self.input) != util.cpu_device):
+            cp.cuda.Device().synchronize()
+
+    def __enter__(self):
+        stack = self.profiler._stack()
+        with self.profiler._lock:
+            self.node = stack[-1]._get_child(self.obj, self.kind)
+
+        stack.append(self.node)
+        self._synchronize()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._synchronize()
+        end = time.perf_counter()
+        self.profiler._stack().pop()
+
+        node = self.node
+        input, output = self.input, self.output
+        with self.profiler._lock:
+            node.count += 1
+            node.time += end - self.start
+            if input is not None:
+                node.ishape = tuple(input.shape)
+
+            if output is not None:
+                node.oshape = tuple(output.shape)
+                if output is not input:
+                    node.nbytes += output.nbytes
+
+            if self.profiler.trace:
+                self.profiler.events.append({
+                    'name': getattr(self.obj, 'repr_str',
+                                    self.obj.__class__.__name__),
+                    'cat': self.kind,
+                    'ph': 'X',
+                    'ts': (self.start - self.profiler._start) * 1e6,
+                    'dur': (end - self.start) * 1e6,
+                    'pid': os.getpid(),
+                    'tid': threading.get_ident(),
+                    'args': {'ishape': node.ishape, 'oshape': node.oshape}})
+
+        self.input = None
+        self.output = None
+
+
+class _NullRecord(object):
+
+    def set_output(self, output):
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return
+
+
+_null_record = _NullRecord()
@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+import numpy.testing as npt
+
+from sigpy import alg, linop, profiler, prox, util
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_Profiler(self):
+        shape = [5]
+        A = linop.Multiply(shape, 2) * linop.Resize(shape, [3])
+        x = util.randn([3])
+
+        with profiler.Profiler() as prof:
+            for _ in range(2):
+                y = A(x)
+
+        npt.assert_allclose(A(x), y)
+        self.assertEqual(len(prof.root.children), 1)
+        node = prof.root.children[0]
+        self.assertEqual(node.name, repr(A))
+        self.assertEqual(node.count, 2)
+        self.assertEqual(node.ishape, (3, ))
+        self.assertEqual(node.oshape, (5, ))
+        self.assertEqual([child.name for child in node.children],
+                         [repr(op) for op in A.linops[::-1]])
+        self.assertGreaterEqual(node.time, sum(c.time for c in node.children))
+        self.assertIn(repr(A.linops[0]), prof.report())
+
+        with tempfile.TemporaryDirectory() as dirpath:
+            path = os.path.join(dirpath, 'trace.json')
+            prof.export_chrome_trace(path)
+            with open(path) as f:
+                events = json.load(f)['traceEvents']
+
+        self.assertEqual(len(events), 6)
+        self.assertTrue(all(e['ph'] == 'X' for e in events))
+
+    def test_Profiler_temporaries(self):
+        shape = [3]
+        x = util.randn(shape)
+
+        with profiler.Profiler(trace=False) as prof:
+            for _ in range(3):
+                linop.Multiply(shape, 2)(x)
+                linop.Identity(shape)(x)
+                linop.Reshape(shape, shape)(x)
+
+        self.assertEqual(
+            [(child.name, child.count) for child in prof.root.children],
+            [(repr(linop.Multiply(shape, 2)), 3),
+             (repr(linop.Identity(shape)), 3),
+             (repr(linop.Reshape(shape, shape)), 3)])
+
+    def test_Profiler_alg(self):
+        shape = [4]
+        A = linop.Multiply(shape, 2)
+        x = util.zeros(shape)
+        b = util.ones(shape)
+        gradf = lambda x: A.H(A(x) - b)
+        proxg = prox.L1Reg(shape, 0.1)
+        alg_ = alg.GradientMethod(gradf, x, 0.1, proxg=proxg, max_iter=3)
+
+        with profiler.Profiler(trace=False) as prof:
+            alg_.init()
+            while not alg_.done():
+                alg_.update()
+
+        node = prof.root.children[0]
+        self.assertEqual(node.name, 'GradientMethod')
+        self.assertEqual(node.count, 3)
+        self.assertIn(repr(proxg), [child.name for child in node.children])
+        self.assertEqual(prof.events, [])
+        self.assertIsNone(profiler._current)
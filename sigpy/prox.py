@@ -2,7 +2,7 @@
 """Proximal operators.
 """
 import numpy as np
-from sigpy import config, util, thresh
+from sigpy import config, profiler, util, thresh
 
 if config.cupy_enabled:
     import cupy as cp
@@ -45,7 +45,10 @@ class Prox(object):
 
     def __call__(self, alpha, input):
         self._check_input(input)
-        output = self._prox(alpha, input)
+        with profiler.record(self, 'prox', input) as record:
+            output = self._prox(alpha, input)
+            record.set_output(output)
+
         self._check_output(output)
         return output
 
@@ -207,17 +210,19 @@ class L1Proj(Prox):
     Args:
         shape (tuple of ints): input shape.
         epsilon (float): regularization parameter.
+        axes (None or tuple of ints): axes over which l1 norm is applied.
 
     """
-    def __init__(self, shape, epsilon):
+    def __init__(self, shape, epsilon, axes=None):
 
         self.epsilon = epsilon
+        self.axes = axes
 
         super().__init__(shape)
 
     def _prox(self, alpha, input):
 
-        return thresh.l1_proj(self.epsilon, input)
+        return thresh.l1_proj(self.epsilon, input, axes=self.axes)
 
 
 class L1L2Reg(Prox):
@@ -238,3 +243,96 @@ class L1L2Reg(Prox):
     
     def _prox(self, alpha, input):
         return thresh.elitist_thresh(self.lamda * alpha, input, axes=self.axes)
+
+
+class TotalVariation(Prox):
+    r"""Proximal operator for total variation, lamda * || G x ||_1.
+
+    G is the finite difference operator, as in linop.FiniteDifference.
+    For real inputs on CPU with one axis and Neumann boundaries,
+    the proximal operator is computed exactly with the taut string algorithm.
+    Otherwise, the dual problem is solved with the fast gradient projection
+    method for max_iter iterations, warm started from the dual solution
+    of the previous call.
+
+    Args:
+        shape (tuple of ints): Input shape.
+        lamda (float): Regularization parameter.
+        axes (None or tuple of ints): Axes of finite differences.
+        isotropic (bool): If True, uses the l2 norm of differences over axes
+            at each point. Otherwise, uses the l1 norm.
+        boundary (str): {'neumann', 'periodic'}.
+        max_iter (int): Maximum number of iterations of the dual solver.
+
+    References:
+        A. Beck and M. Teboulle, "Fast gradient-based algorithms for
+        constrained total variation image denoising and deblurring problems"
+        IEEE Transactions on Image Processing, 18(11), 2419-2434, 2009.
+
+        L. Condat, "A direct algorithm for 1D total variation denoising"
+        IEEE Signal Processing Letters, 20(11), 1054-1057, 2013.
+
+    """
+    def __init__(self, shape, lamda, axes=None, isotropic=False,
+                 boundary='neumann', max_iter=20):
+        self.lamda = lamda
+        self.axes = util._normalize_axes(axes, len(shape))
+        self.isotropic = isotropic
+        self.boundary = boundary
+        self.max_iter = max_iter
+        self.p = None
+
+        super().__init__(shape)
+
+    def _prox(self, alpha, input):
+        t = self.lamda * alpha
+        device = util.get_device(input)
+        if t == 0:
+            with device:
+                return input.copy()
+
+        if (len(self.axes) == 1 and self.boundary == 'neumann' and
+            device == util.cpu_device and not np.iscomplexobj(input)):
+            a = self.axes[0]
+            output = thresh.tv1d_denoise(t, np.moveaxis(input, a, -1))
+            return np.moveaxis(output, -1, a)
+
+        return self._prox_dual(t, input)
+
+    def _prox_dual(self, t, input):
+        device = util.get_device(input)
+        xp = device.xp
+        with device:
+            oshape = (len(self.axes), ) + input.shape
+            if (self.p is None or self.p.shape != oshape or
+                self.p.dtype != input.dtype or util.get_device(self.p) != device):
+                self.p = xp.zeros(oshape, dtype=input.dtype)
+
+            p = self.p
+            r = p.copy()
+            s = 1
+            step = 1 / (4 * len(self.axes) * t)
+            for it in range(self.max_iter):
+                z = input - t * util.finite_difference_adjoint(
+                    r, axes=self.axes, boundary=self.boundary)
+                p_old = p
+                p = r + step * util.finite_difference(
+                    z, axes=self.axes, boundary=self.boundary)
+                self._project(p)
+
+                s_new = (1 + (1 + 4 * s**2)**0.5) / 2
+                r = p + ((s - 1) / s_new) * (p - p_old)
+                s = s_new
+
+            self.p = p
+            return input - t * util.finite_difference_adjoint(
+                p, axes=self.axes, boundary=self.boundary)
+
+    def _project(self, p):
+        xp = util.get_xp(p)
+        if self.isotropic:
+            norm = xp.sum(xp.abs(p)**2, axis=0, keepdims=True)**0.5
+        else:
+            norm = xp.abs(p)
+
+        p /= xp.maximum(norm, 1)
@@ -57,3 +57,21 @@ class TestProx(unittest.TestCase):
         x = util.randn(shape)
         y = P(1.0, x)
         npt.assert_allclose(y, x / np.linalg.norm(x.ravel()))
+
+    def test_TotalVariation(self):
+        shape = [3, 20]
+        lamda = 0.5
+        x = np.random.randn(*shape)
+        y = prox.TotalVariation(shape, lamda, axes=[-1])(1.0, x)
+
+        P = prox.TotalVariation(shape, lamda, axes=[-1], max_iter=5000)
+        y_dual = P._prox_dual(lamda, x)
+        npt.assert_allclose(y, y_dual, atol=1e-4)
+
+        for isotropic in [False, True]:
+            for boundary in ['neumann', 'periodic']:
+                shape = [4, 5]
+                x = util.randn(shape)
+                P = prox.TotalVariation(shape, 1e3, isotropic=isotropic,
+                                        boundary=boundary, max_iter=1000)
+                npt.assert_allclose(P(1.0, x), np.full(shape, np.mean(x)), atol=1e-3)
@@ -65,12 +65,17 @@ def hard_thresh(lamda, input):
             return _hard_thresh_cuda(lamda, input)
 
 
-def l1_proj(eps, input):
+def l1_proj(eps, input, axes=None):
     """Projection onto L1 ball.
 
+    On CPU, the threshold is found in expected linear time with Condat's
+    algorithm. On GPU, a sort-based search is used.
+
     Args:
-        eps (float, or array): L1 ball scaling.
+        eps (float): L1 ball scaling.
         input (array)
+        axes (None or tuple of ints): Axes to perform projection over.
+            Remaining axes are projected independently.
 
     Returns:
         array: Result.
@@ -79,22 +84,27 @@ def l1_proj(eps, input):
         J. Duchi, S. Shalev-Shwartz, and Y. Singer, "Efficient projections onto
         the l1-ball for learning in high dimensions" 2008.
 
+        L. Condat, "Fast projection onto the simplex and the l1 ball"
+        Mathematical Programming, 158(1-2), 575-585, 2016.
+
     """
-    device = util.get_device(input)
-    xp = device.xp
+    shape = input.shape
+    axes = util._normalize_axes(axes, input.ndim)
+    remain_axes = tuple(set(range(input.ndim)) - set(axes))
 
-    with device:
-        shape = input.shape
-        input = input.ravel()
+    length = util.prod([shape[a] for a in axes])
+    batch = input.size // length
 
-        if xp.linalg.norm(input, 1) < eps:
-            return input
-        else:
-            shape = len(input)
-            s = xp.sort(xp.abs(input))[::-1]
-            st = (xp.cumsum(s) - eps) / (xp.arange(shape) + 1)
-            idx = xp.flatnonzero((s - st) > 0).max()
-            return soft_thresh(st[idx], input.reshape(shape))
+    input = input.transpose(remain_axes + axes)
+    input = input.reshape([batch, length])
+
+    thresh = find_l1_proj_thresh(eps, input)
+    output = soft_thresh(thresh, input)
+
+    output = output.reshape([shape[a] for a in remain_axes + axes])
+    output = output.transpose(np.argsort(remain_axes + axes))
+
+    return output
 
 
 def l2_proj(eps, input, axes=None):
@@ -154,6 +164,39 @@ def elitist_thresh(lamda, input, axes=None):
     return output
 
 
+def tv1d_denoise(lamda, input):
+    r"""1D total variation denoising along the last axis.
+
+    Solves for each row
+
+    .. math:: \min_z \frac{1}{2} \|x - z\|_2^2 + \lambda \sum_n |z_{n+1} - z_n|
+
+    exactly, in linear time, with Condat's direct algorithm.
+    Only real inputs on CPU are supported.
+
+    Args:
+        lamda (float): Regularization parameter.
+        input (array): Real input array.
+
+    Returns:
+        array: Result.
+
+    References:
+        L. Condat, "A direct algorithm for 1D total variation denoising"
+        IEEE Signal Processing Letters, 20(11), 1054-1057, 2013.
+
+    """
+    if np.iscomplexobj(input):
+        raise TypeError('tv1d_denoise only supports real inputs.')
+
+    shape = input.shape
+    input = np.ascontiguousarray(input).reshape([-1, shape[-1]])
+    output = np.empty_like(input)
+    _tv1d_denoise(output, lamda, input)
+
+    return output.reshape(shape)
+
+
 def find_elitist_thresh(lamda, input):
     device = util.get_device(input)
     xp = device.xp
@@ -171,7 +214,33 @@ def find_elitist_thresh(lamda, input):
     return thresh
 
 
-@nb.vectorize
+def find_l1_proj_thresh(eps, input):
+    device = util.get_device(input)
+    xp = device.xp
+
+    with device:
+        abs_input = xp.abs(input)
+
+    batch = len(input)
+    if device == util.cpu_device:
+        thresh = util.empty([batch, 1], dtype=abs_input.dtype, device=device)
+        _find_l1_proj_thresh(thresh, eps, abs_input)
+    else:
+        with device:
+            length = abs_input.shape[-1]
+            sorted_input = xp.sort(abs_input, axis=-1)[:, ::-1]
+            st = (xp.cumsum(sorted_input, axis=-1) - eps) / (xp.arange(length) + 1)
+            idx = xp.sum((sorted_input - st) > 0, axis=-1) - 1
+            idx = xp.maximum(idx, 0)
+            thresh = st[xp.arange(batch), idx].reshape([batch, 1])
+            thresh = xp.maximum(thresh, 0)
+
+    return thresh
+
+
+@nb.vectorize(['float32(float32, float32)', 'float64(float64, float64)',
+              'complex64(float32, complex64)', 'complex128(float64, complex128)'],
+             nopython=True, cache=True)
 def _soft_thresh(lamda, input):
     abs_input = abs(input)
     if (abs_input == 0):
@@ -185,7 +254,10 @@ def _soft_thresh(lamda, input):
     return mag * sign
 
 
-@nb.vectorize
+@nb.vectorize(['int32(float64, int32)', 'int64(float64, int64)',
+              'float32(float32, float32)', 'float64(float64, float64)',
+              'complex64(float32, complex64)', 'complex128(float64, complex128)'],
+             nopython=True, cache=True)
 def _hard_thresh(lamda, input):
     abs_input = abs(input)
     if abs_input > lamda:
@@ -210,6 +282,153 @@ def _find_elitist_thresh(thresh, lamda, input):
                 break
 
 
+@nb.jit(nopython=True, cache=True)
+def _find_l1_proj_thresh(thresh, eps, input):
+    batch, length = input.shape
+    v = np.empty(length, dtype=input.dtype)
+    v_tilde = np.empty(length, dtype=input.dtype)
+    for i in range(batch):
+        v[0] = input[i, 0]
+        num_v = 1
+        num_v_tilde = 0
+        rho = input[i, 0] - eps
+        for j in range(1, length):
+            y = input[i, j]
+            if y > rho:
+                rho += (y - rho) / (num_v + 1)
+                if rho > y - eps:
+                    v[num_v] = y
+                    num_v += 1
+                else:
+                    for k in range(num_v):
+                        v_tilde[num_v_tilde + k] = v[k]
+
+                    num_v_tilde += num_v
+                    v[0] = y
+                    num_v = 1
+                    rho = y - eps
+
+        for k in range(num_v_tilde):
+            y = v_tilde[k]
+            if y > rho:
+                v[num_v] = y
+                num_v += 1
+                rho += (y - rho) / num_v
+
+        changed = True
+        while changed:
+            changed = False
+            k = 0
+            while k < num_v:
+                y = v[k]
+                if y <= rho and num_v > 1:
+                    num_v -= 1
+                    v[k] = v[num_v]
+                    rho += (rho - y) / num_v
+                    changed = True
+                else:
+                    k += 1
+
+        thresh[i, 0] = max(rho, 0)
+
+
+@nb.jit(nopython=True, cache=True)
+def _tv1d_denoise(output, lamda, input):
+    batch, n = input.shape
+    for b in range(batch):
+        x = input[b]
+        z = output[b]
+        k = 0
+        k0 = 0
+        kplus = 0
+        kminus = 0
+        umin = lamda
+        umax = -lamda
+        vmin = x[0] - lamda
+        vmax = x[0] + lamda
+        while True:
+            done = False
+            while k == n - 1:
+                if umin < 0:
+                    while True:
+                        z[k0] = vmin
+                        k0 += 1
+                        if k0 > kminus:
+                            break
+
+                    k = k0
+                    kminus = k
+                    vmin = x[k]
+                    umin = lamda
+                    umax = vmin + umin - vmax
+                elif umax > 0:
+                    while True:
+                        z[k0] = vmax
+                        k0 += 1
+                        if k0 > kplus:
+                            break
+
+                    k = k0
+                    kplus = k
+                    vmax = x[k]
+                    umax = -lamda
+                    umin = vmax + umax - vmin
+                else:
+                    vmin += umin / (k - k0 + 1)
+                    while k0 <= k:
+                        z[k0] = vmin
+                        k0 += 1
+
+                    done = True
+                    break
+
+            if done:
+                break
+
+            umin += x[k + 1] - vmin
+            if umin < -lamda:
+                while True:
+                    z[k0] = vmin
+                    k0 += 1
+                    if k0 > kminus:
+                        break
+
+                k = k0
+                kminus = k
+                kplus = k
+                vmin = x[k]
+                vmax = vmin + 2 * lamda
+                umin = lamda
+                umax = -lamda
+            else:
+                umax += x[k + 1] - vmax
+                if umax > lamda:
+                    while True:
+                        z[k0] = vmax
+                        k0 += 1
+                        if k0 > kplus:
+                            break
+
+                    k = k0
+                    kminus = k
+                    kplus = k
+                    vmax = x[k]
+                    vmin = vmax - 2 * lamda
+                    umin = lamda
+                    umax = -lamda
+                else:
+                    k += 1
+                    if umin >= lamda:
+                        kminus = k
+                        vmin += (umin - lamda) / (kminus - k0 + 1)
+                        umin = lamda
+
+                    if umax <= -lamda:
+                        kplus = k
+                        vmax += (umax + lamda) / (kplus - k0 + 1)
+                        umax = -lamda
+
+
 if config.cupy_enabled:
 
     _soft_thresh_cuda = cp.ElementwiseKernel(
@@ -24,6 +24,43 @@ class TestThresh(unittest.TestCase):
 
         npt.assert_allclose(thresh.hard_thresh(1, x), y)
 
+    def test_thresh_dtype(self):
+        x = np.array([-2, -1, 0, 1, 2])
+        for dtype in [np.int32, np.int64, np.float32, np.float64,
+                      np.complex64, np.complex128]:
+            with self.subTest(dtype=dtype):
+                x_d = x.astype(dtype)
+                y = thresh.hard_thresh(1, x_d)
+                self.assertEqual(y.dtype, dtype)
+                npt.assert_allclose(y, [-2, 0, 0, 0, 2])
+
+                if not np.issubdtype(dtype, np.integer):
+                    y = thresh.soft_thresh(1, x_d)
+                    self.assertEqual(y.dtype, dtype)
+                    npt.assert_allclose(y, [-1, 0, 0, 0, 1])
+
+    def test_l1_proj(self):
+        x = np.array([-2, -1.5, -1, 0.5, 0, 0.5, 1, 1.5, 2])
+
+        npt.assert_allclose(thresh.l1_proj(0, x), np.zeros(len(x)))
+        for eps in [1e-3, 1, 5, 9, 100]:
+            # Sort-based projection
+            s = np.sort(np.abs(x))[::-1]
+            st = (np.cumsum(s) - eps) / (np.arange(len(x)) + 1)
+            t = max(st[np.flatnonzero((s - st) > 0).max()], 0)
+            y = np.sign(x) * np.maximum(np.abs(x) - t, 0)
+
+            npt.assert_allclose(thresh.l1_proj(eps, x), y, atol=1e-10)
+
+    def test_l1_proj_axes(self):
+        x = np.random.randn(3, 4, 5) + 1j * np.random.randn(3, 4, 5)
+        eps = 1.0
+
+        y = thresh.l1_proj(eps, x, axes=(0, 2))
+        for j in range(4):
+            npt.assert_allclose(y[:, j, :], thresh.l1_proj(eps, x[:, j, :]))
+            npt.assert_allclose(np.sum(np.abs(y[:, j, :])), eps)
+
     def test_elitist_thresh(self):
         x = np.array([-2, -1.5, -1, 0.5, 0, 0.5, 1, 1.5, 2])
 
@@ -73,6 +110,14 @@ class TestThresh(unittest.TestCase):
 
             cp.testing.assert_allclose(thresh.hard_thresh(lamda, x), y)
 
+        def test_l1_proj_cuda(self):
+            x = np.random.randn(3, 4, 5) + 1j * np.random.randn(3, 4, 5)
+            eps = 1.0
+
+            y = thresh.l1_proj(eps, x, axes=(0, 2))
+            y_cuda = thresh.l1_proj(eps, cp.array(x), axes=(0, 2))
+            cp.testing.assert_allclose(y, y_cuda, atol=1e-7, rtol=1e-7)
+
     if config.cupy_enabled:
 
         def test_elitist_thresh_cuda(self):
@@ -8,12 +8,6 @@ from sigpy import config
 if config.cupy_enabled:
     import cupy as cp
 
-if config.mpi4py_enabled:
-    from mpi4py import MPI
-
-    if config.nccl_enabled:
-        from cupy.cuda import nccl
-
 
 class Device(object):
     """Device class.
@@ -377,6 +371,116 @@ def circshift(input, shifts, axes=None):
         return input
 
 
+def finite_difference(input, axes=None, boundary='periodic'):
+    """Backward finite difference along axes, stacked along a new first axis.
+
+    Computes input[n] - input[n - 1] along each axis. The first element
+    wraps around for periodic boundaries, and is zero for Neumann boundaries.
+
+    Args:
+        input (array): Input array.
+        axes (None or tuple of ints): Axes to take differences along.
+        boundary (str): {'periodic', 'neumann'}.
+
+    Returns:
+        array: Result of shape [len(axes)] + input.shape.
+
+    """
+    axes = _normalize_axes(axes, input.ndim)
+    periodic = _check_boundary(boundary)
+    device = get_device(input)
+    xp = device.xp
+
+    with device:
+        output = xp.empty((len(axes), ) + input.shape, dtype=input.dtype)
+        if device == cpu_device:
+            input = np.ascontiguousarray(input)
+            for output_a, a in zip(output, axes):
+                shape = _get_axis_shape(input.shape, a)
+                _finite_difference(output_a.reshape(shape), input.reshape(shape), periodic)
+        else:
+            for output_a, a in zip(output, axes):
+                _finite_difference_xp(output_a, input, a, periodic)
+
+        return output
+
+
+def finite_difference_adjoint(input, axes=None, boundary='periodic'):
+    """Adjoint of finite_difference, which is a negative divergence.
+
+    Args:
+        input (array): Input array of shape [len(axes)] + oshape.
+        axes (None or tuple of ints): Axes to take differences along.
+        boundary (str): {'periodic', 'neumann'}.
+
+    Returns:
+        array: Result of shape input.shape[1:].
+
+    """
+    axes = _normalize_axes(axes, input.ndim - 1)
+    periodic = _check_boundary(boundary)
+    device = get_device(input)
+    xp = device.xp
+
+    with device:
+        output = xp.zeros(input.shape[1:], dtype=input.dtype)
+        if device == cpu_device:
+            input = np.ascontiguousarray(input)
+            for input_a, a in zip(input, axes):
+                shape = _get_axis_shape(output.shape, a)
+                _finite_difference_adjoint(output.reshape(shape), input_a.reshape(shape),
+                                           periodic)
+        else:
+            for input_a, a in zip(input, axes):
+                _finite_difference_adjoint_xp(output, input_a, a, periodic)
+
+        return output
+
+
+def _check_boundary(boundary):
+    if boundary == 'periodic':
+        return True
+    elif boundary == 'neumann':
+        return False
+    else:
+        raise ValueError('Invalid boundary: {boundary}.'.format(boundary=boundary))
+
+
+def _get_axis_shape(shape, axis):
+    return (prod(shape[:axis]), shape[axis], prod(shape[axis + 1:]))
+
+
+def _axis_slice(ndim, axis, index):
+    return (slice(None), ) * axis + (index, ) + (slice(None), ) * (ndim - axis - 1)
+
+
+def _finite_difference_xp(output, input, axis, periodic):
+    xp = get_xp(input)
+    ndim = input.ndim
+    xp.subtract(input[_axis_slice(ndim, axis, slice(1, None))],
+                input[_axis_slice(ndim, axis, slice(None, -1))],
+                out=output[_axis_slice(ndim, axis, slice(1, None))])
+    if periodic:
+        xp.subtract(input[_axis_slice(ndim, axis, slice(0, 1))],
+                    input[_axis_slice(ndim, axis, slice(-1, None))],
+                    out=output[_axis_slice(ndim, axis, slice(0, 1))])
+    else:
+        output[_axis_slice(ndim, axis, slice(0, 1))] = 0
+
+
+def _finite_difference_adjoint_xp(output, input, axis, periodic):
+    ndim = input.ndim
+    output[_axis_slice(ndim, axis, slice(None, -1))] -= \
+        input[_axis_slice(ndim, axis, slice(1, None))]
+    if periodic:
+        output += input
+        output[_axis_slice(ndim, axis, slice(-1, None))] -= \
+            input[_axis_slice(ndim, axis, slice(0, 1))]
+    else:
+        output[_axis_slice(ndim, axis, slice(1, None))] += \
+            input[_axis_slice(ndim, axis, slice(1, None))]
+
+
 def downsample(input, factors, shift=None):
     """Downsample input.
 
@@ -749,12 +853,58 @@ def xpay(y, a, x):
             _xpay_cuda(y, a, x)
 
 
-@nb.vectorize(nopython=True, cache=True)
+@nb.jit(nopython=True, cache=True)
+def _finite_difference(output, input, periodic):
+    batch, n, inner = input.shape
+    for b in range(batch):
+        for k in range(inner):
+            if periodic:
+                output[b, 0, k] = input[b, 0, k] - input[b, n - 1, k]
+            else:
+                output[b, 0, k] = 0
+
+        for i in range(1, n):
+            for k in range(inner):
+                output[b, i, k] = input[b, i, k] - input[b, i - 1, k]
+
+
+@nb.jit(nopython=True, cache=True)
+def _finite_difference_adjoint(output, input, periodic):
+    batch, n, inner = input.shape
+    for b in range(batch):
+        if periodic:
+            for i in range(n - 1):
+                for k in range(inner):
+                    output[b, i, k] += input[b, i, k] - input[b, i + 1, k]
+
+            for k in range(inner):
+                output[b, n - 1, k] += input[b, n - 1, k] - input[b, 0, k]
+        elif n > 1:
+            for k in range(inner):
+                output[b, 0, k] -= input[b, 1, k]
+
+            for i in range(1, n - 1):
+                for k in range(inner):
+                    output[b, i, k] += input[b, i, k] - input[b, i + 1, k]
+
+            for k in range(inner):
+                output[b, n - 1, k] += input[b, n - 1, k]
+
+
+@nb.vectorize(['int32(int32, int32, int32)', 'int64(int64, int64, int64)',
+              'float32(float32, float32, float32)', 'float64(float64, float64, float64)',
+              'complex64(complex64, complex64, complex64)',
+              'complex128(complex128, complex128, complex128)'],
+             nopython=True, cache=True)
 def _axpy(y, a, x):
     return a * x + y
 
 
-@nb.vectorize(nopython=True, cache=True)
+@nb.vectorize(['int32(int32, int32, int32)', 'int64(int64, int64, int64)',
+              'float32(float32, float32, float32)', 'float64(float64, float64, float64)',
+              'complex64(complex64, complex64, complex64)',
+              'complex128(complex128, complex128, complex128)'],
+             nopython=True, cache=True)
 def _xpay(y, a, x):
     return x + a * y
 
@@ -145,6 +145,35 @@ class TestUtil(unittest.TestCase):
                             [[3, 4, 5],
                              [0, 1, 2]])
 
+    def test_finite_difference(self):
+        x = np.array([[0, 1, 3],
+                      [6, 10, 15]], dtype=np.float)
+        npt.assert_allclose(util.finite_difference(x, axes=[-1]),
+                            [[[-3, 1, 2],
+                              [-9, 4, 5]]])
+        npt.assert_allclose(util.finite_difference(x, boundary='neumann'),
+                            [[[0, 0, 0],
+                              [6, 9, 12]],
+                             [[0, 1, 2],
+                              [0, 4, 5]]])
+
+        x = util.randn([4, 1, 5, 3])
+        for boundary in ['periodic', 'neumann']:
+            for axes in [None, [0, 2], [1]]:
+                y = util.finite_difference(x, axes=axes, boundary=boundary)
+                y_xp = np.empty_like(y)
+                for y_a, a in zip(y_xp, util._normalize_axes(axes, x.ndim)):
+                    util._finite_difference_xp(y_a, x, a, boundary == 'periodic')
+
+                npt.assert_allclose(y, y_xp)
+
+                z = util.finite_difference_adjoint(y, axes=axes, boundary=boundary)
+                z_xp = np.zeros_like(z)
+                for y_a, a in zip(y, util._normalize_axes(axes, x.ndim)):
+                    util._finite_difference_adjoint_xp(z_xp, y_a, a, boundary == 'periodic')
+
+                npt.assert_allclose(z, z_xp)
+
     def test_monte_carlo_sure(self):
 
         x = np.ones([100000], dtype=np.float)
@@ -157,3 +186,18 @@ class TestUtil(unittest.TestCase):
 
         npt.assert_allclose(
             sigma**2, util.monte_carlo_sure(f, y, sigma), atol=1e-3)
+
+    def test_axpy_xpay(self):
+        for dtype in [np.int32, np.int64, np.float32, np.float64,
+                      np.complex64, np.complex128]:
+            with self.subTest(dtype=dtype):
+                x = np.arange(5).astype(dtype)
+                y = np.ones(5, dtype=dtype)
+                util.axpy(y, 2, x)
+                self.assertEqual(y.dtype, dtype)
+                npt.assert_allclose(y, 2 * np.arange(5) + 1)
+
+                y = np.ones(5, dtype=dtype)
+                util.xpay(y, 2, x)
+                self.assertEqual(y.dtype, dtype)
+                npt.assert_allclose(y, np.arange(5) + 2)
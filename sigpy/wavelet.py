@@ -2,11 +2,11 @@
 """Wavelet transform functions.
 """
 import numpy as np
-import pywt
 from sigpy import util
 
 
 def get_wavelet_shape(shape, wave_name, axes, level):
+    import pywt
     zshape = [((i + 1) // 2) * 2 for i in shape]
 
     tmp = pywt.wavedecn(
@@ -26,6 +26,7 @@ def fwt(input, wave_name='db4', axes=None, level=None):
         wave_name (str): Wavelet name.
         level (None or int): Number of wavelet levels.
     """
+    import pywt
     device = util.get_device(input)
     input = util.move(input)
 
@@ -50,6 +51,7 @@ def iwt(input, oshape, coeff_slices, wave_name='db4', axes=None, level=None):
         wave_name (str): Wavelet name.
         level (None or int): Number of wavelet levels.
     """
+    import pywt
     device = util.get_device(input)
     input = util.move(input)
 